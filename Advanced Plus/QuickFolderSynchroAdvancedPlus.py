@@ -27,6 +27,10 @@ import psutil
 import atexit
 from pathlib import Path
 
+# The copy methods of the files are shared with QuickFolderSynchro.py, CopyBackends.py is imported from the parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CopyBackends import copy_file
+
 # The module with the C++ class is imported
 import LogFileWriter
 
@@ -324,14 +328,16 @@ try :
 
                                 # The file exists in the destination directory but has a different size or modification date...
                                 LogFileWriter.Writer.LOG_INFO(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory but with different size or modification time, it is copied", 'QuickFolderSynchroAdvanced.py', 319, True)
-                                shutil.copy2(sourcePath, targetPath)
+                                copyDescription = copy_file(sourcePath, targetPath)
+                                LogFileWriter.Writer.LOG_INFO(f"File {targetPath} : {copyDescription}", 'QuickFolderSynchroAdvancedPlus.py', sys._getframe().f_lineno, False)
                                 copiedFoundFiles += 1
 
                         else :
 
                             # The file does not exist in the destination directory, it is copied, and a message is printed indicating that it does not exist in the destination directory, so it is copied. 
                             LogFileWriter.Writer.LOG_INFO(f"{sourceDirectory.upper()} : File {sourcePath} does not exist in the destination directory, it is copied", 'QuickFolderSynchroAdvanced.py', 326, True)
-                            shutil.copy2(sourcePath, targetPath)
+                            copyDescription = copy_file(sourcePath, targetPath)
+                            LogFileWriter.Writer.LOG_INFO(f"File {targetPath} : {copyDescription}", 'QuickFolderSynchroAdvancedPlus.py', sys._getframe().f_lineno, False)
                             copiedNotFoundFiles += 1
                     
                     # Incrementing the number of directories found in the source directory, excluding files, this variable is used for statistics at the end of the script.
@@ -26,6 +26,10 @@ import signal
 import psutil
 from pathlib import Path
 
+# The copy methods of the files are shared with QuickFolderSynchro.py, CopyBackends.py is imported from the parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CopyBackends import copy_file
+
 import LogFileWriter
 
 
@@ -362,7 +366,8 @@ try :
                                 # The file exists in the destination directory but has a different size or modification date...
                                 print(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory but with different size or modification time, it is copied")
                                 logger.write_line(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory but with different size or modification time, it is copied")
-                                shutil.copy2(sourcePath, targetPath)
+                                copyDescription = copy_file(sourcePath, targetPath)
+                                logger.write_line(f"File {targetPath} : {copyDescription}")
                                 copiedFoundFiles += 1
 
                         else :
@@ -370,7 +375,8 @@ try :
                             # The file does not exist in the destination directory, it is copied, and a message is printed indicating that it does not exist in the destination directory, so it is copied. 
                             print(f"{sourceDirectory.upper()} : File {sourcePath} does not exist in the destination directory, it is copied")
                             logger.write_line(f"{sourceDirectory.upper()} : File {sourcePath} does not exist in the destination directory, it is copied")
-                            shutil.copy2(sourcePath, targetPath)
+                            copyDescription = copy_file(sourcePath, targetPath)
+                            logger.write_line(f"File {targetPath} : {copyDescription}")
                             copiedNotFoundFiles += 1
                     
                     # Incrementing the number of directories found in the source directory, excluding files, this variable is used for statistics at the end of the script.
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+""" CopyBackendBenchmark.py
+This script measures the copy methods of QuickFolderSynchro (reflink, copy_file_range, sendfile and the buffered copy) and shutil.copy2 in one or more directories.
+Each directory should be in a different filesystem, for example a tmpfs and an ext4 loop device, so the methods can be compared on each of them. """
+
+# CopyBackendBenchmark.py
+# This script measures the copy methods of QuickFolderSynchro (reflink, copy_file_range, sendfile and the buffered copy) and shutil.copy2 in one or more directories.
+# Each directory should be in a different filesystem, for example a tmpfs and an ext4 loop device, so the methods can be compared on each of them.
+# The files are copied inside the same directory, a method that is not supported by the filesystem is shown as unsupported.
+# Example, as root, with a tmpfs and an ext4 loop device of 4 GB:
+#   mkdir -p /mnt/tmpfs /mnt/ext4
+#   mount -t tmpfs -o size=4G tmpfs /mnt/tmpfs
+#   truncate -s 4G /tmp/ext4.img && mkfs.ext4 -q /tmp/ext4.img && mount -o loop /tmp/ext4.img /mnt/ext4
+#   python3 Benchmarks/CopyBackendBenchmark.py /mnt/tmpfs /mnt/ext4
+
+# Imports...  psutil must be installed by pip install psutil
+import sys
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import psutil
+
+# The copy methods are imported from the module of the parent folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CopyBackends import COPY_METHODS, CopyMethodUnavailable, copy_file
+
+
+# Function that returns the type of the filesystem of a directory, the one of the longest mount point that contains it
+def filesystem_type(directory) :
+    """ Returns the type of the filesystem of a directory """
+
+    directory = os.path.realpath(directory)
+    mountPoints = [ partition for partition in psutil.disk_partitions(all=True) if directory == partition.mountpoint or directory.startswith(partition.mountpoint.rstrip(os.sep) + os.sep) ]
+    if not mountPoints : return "unknown"
+    return max(mountPoints, key=lambda partition : len(partition.mountpoint)).fstype
+
+
+# Function that copies the files with a copy method and returns the seconds it took, or None if the method is not supported by the filesystem
+# With isSynced, the data written is flushed to the disk before stopping the clock, otherwise the methods that share the blocks are not compared fairly with the ones that write them
+def time_copies(copyFunction, paths, targetDirectory, isSynced) :
+    """ Copies the files with a copy method and returns the seconds it took """
+
+    os.makedirs(targetDirectory)
+
+    try :
+        startTime = time.perf_counter()
+        for path in paths : copyFunction(path, os.path.join(targetDirectory, os.path.basename(path)))
+        if isSynced : os.sync()
+        return time.perf_counter() - startTime
+
+    except CopyMethodUnavailable :
+        return None
+
+    finally :
+        shutil.rmtree(targetDirectory)
+
+
+# Function that prints a row of the table of results
+def print_row(filesystem, method, seconds, totalBytes) :
+    """ Prints the result of a copy method """
+
+    if seconds is None : print(f"{filesystem:<30} {method:<20} {'unsupported':>12}")
+    else : print(f"{filesystem:<30} {method:<20} {seconds:>11.3f}s {totalBytes / seconds / 1024 / 1024:>10.1f} MB/s")
+
+
+
+if __name__ == "__main__" :
+
+    parser = argparse.ArgumentParser(description="Measures the copy methods of QuickFolderSynchro in one or more filesystems")
+    parser.add_argument("directories", nargs="+", help="directories where the files are generated and copied, one for each filesystem to compare")
+    parser.add_argument("--files", type=int, default=16, help="number of files (default 16)")
+    parser.add_argument("--size-mb", type=int, default=64, help="size of each file in megabytes (default 64)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of copies of the files with each method, the best time is shown (default 3)")
+    parser.add_argument("--no-sync", action="store_true", help="do not flush the data to the disk before stopping the clock")
+    arguments = parser.parse_args()
+
+    # Each copy method alone, so that it is not replaced by the next one, and shutil.copy2 as the reference
+    methods = [ (name, lambda sourcePath, targetPath, method=(name, method) : copy_file(sourcePath, targetPath, (method,))) for name, method in COPY_METHODS ]
+    methods.append(("shutil.copy2", shutil.copy2))
+
+    print(f"{'filesystem':<30} {'method':<20} {'time':>12} {'throughput':>15}")
+
+    for directory in arguments.directories :
+
+        filesystem = f"{directory} ({filesystem_type(directory)})"
+
+        with tempfile.TemporaryDirectory(dir=directory) as temporaryDirectory :
+
+            # The files are generated with random data, so no filesystem can compress them
+            paths = []
+            for index in range(arguments.files) :
+                path = os.path.join(temporaryDirectory, f"file{index:03d}.dat")
+                with open(path, 'wb') as file :
+                    for _ in range(arguments.size_mb) : file.write(os.urandom(1024 * 1024))
+                paths.append(path)
+            os.sync()
+
+            totalBytes = arguments.files * arguments.size_mb * 1024 * 1024
+
+            for name, copyFunction in methods :
+                times = [ time_copies(copyFunction, paths, os.path.join(temporaryDirectory, "copy"), not arguments.no_sync) for _ in range(arguments.repeat) ]
+                print_row(filesystem, name, None if None in times else min(times), totalBytes)
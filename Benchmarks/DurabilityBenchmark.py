@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+""" DurabilityBenchmark.py
+This script measures the cost of each level of the --durability option of QuickFolderSynchro (none, batch with one or more --sync-batch sizes, and strict) synchronizing a generated tree.
+For each level it shows the time of the run and the time of the sync executed after it, which is the data that the run left to be written by the operating system, so the levels are compared with the data on the disk in all of them. """
+
+# DurabilityBenchmark.py
+# This script measures the cost of each level of the --durability option of QuickFolderSynchro (none, batch with one or more --sync-batch sizes, and strict) synchronizing a generated tree.
+# For each level it shows the time of the run and the time of the sync executed after it, which is the data that the run left to be written by the operating system, so the levels are compared with the data on the disk in all of them.
+# The tree is generated and synchronized in the directory given, so the filesystem to measure can be chosen (the default is the temporary directory of the system, often a tmpfs, where the flushes cost nothing).
+# Example, with a tree of 100000 files on an ext4 filesystem mounted on /mnt/ext4:
+#   python3 Benchmarks/DurabilityBenchmark.py --files 100000 --sync-batch 100,1000,10000 --directory /mnt/ext4
+
+# Imports...
+import sys
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from TreeGenerator import generate_tree
+
+
+# Script measured, the one of the parent folder
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "QuickFolderSynchro.py")
+
+
+# Function that synchronizes sourceDirectory into an empty targetDirectory with the options of a level and returns the seconds of the run and of the sync executed after it
+# The script is copied with CopyBackends.py to a working directory, so that its log files are written there, and the confirmation is answered through the standard input
+def time_level(sourceDirectory, targetDirectory, workDirectory, levelArguments, extraArguments) :
+    """ Synchronizes the tree with the options of a level and returns (run seconds, sync seconds) """
+
+    scriptCopy = os.path.join(workDirectory, os.path.basename(SCRIPT))
+    shutil.copy2(SCRIPT, scriptCopy)
+    shutil.copy2(os.path.join(os.path.dirname(SCRIPT), "CopyBackends.py"), workDirectory)
+    os.makedirs(targetDirectory)
+
+    # The data of the previous levels is written before the clock starts
+    os.sync()
+
+    try :
+        command = [ sys.executable, scriptCopy, *levelArguments, *extraArguments, sourceDirectory, targetDirectory ]
+        startTime = time.perf_counter()
+        subprocess.run(command, input="Yes\n", text=True, stdout=subprocess.DEVNULL, cwd=workDirectory, check=True)
+        runSeconds = time.perf_counter() - startTime
+
+        startTime = time.perf_counter()
+        os.sync()
+        return runSeconds, time.perf_counter() - startTime
+
+    finally :
+        shutil.rmtree(targetDirectory)
+
+
+# Function that prints a row of the table of results
+def print_row(level, runSeconds, syncSeconds, files, totalBytes) :
+    """ Prints the result of a level """
+
+    totalSeconds = runSeconds + syncSeconds
+    print(f"{level:<28} {runSeconds:>10.3f}s {syncSeconds:>10.3f}s {totalSeconds:>10.3f}s {files / totalSeconds:>12.1f} {totalBytes / totalSeconds / 1024 / 1024:>10.1f}")
+
+
+
+if __name__ == "__main__" :
+
+    parser = argparse.ArgumentParser(description="Measures the levels of the --durability option of QuickFolderSynchro")
+    parser.add_argument("--files", type=int, default=20000, help="number of files of the generated tree (default 20000)")
+    parser.add_argument("--files-per-directory", type=int, default=100, help="files in each directory (default 100)")
+    parser.add_argument("--max-size", type=int, default=65536, help="maximum size of the files in bytes (default 65536)")
+    parser.add_argument("--sync-batch", default="1000", help="comma separated sizes of --sync-batch measured with the level batch (default 1000)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of each level, the best time is shown (default 3)")
+    parser.add_argument("--directory", help="directory where the tree is generated and synchronized (default the temporary directory of the system)")
+    parser.add_argument("--script-arguments", default="", help="options passed to every run, for example \"--copy-threads 4\"")
+    arguments = parser.parse_args()
+
+    levels = [ ("none", [ "--durability", "none" ]) ]
+    levels += [ (f"batch (--sync-batch {size})", [ "--durability", "batch", "--sync-batch", size ]) for size in arguments.sync_batch.split(",") ]
+    levels.append(("strict", [ "--durability", "strict" ]))
+
+    with tempfile.TemporaryDirectory(dir=arguments.directory) as temporaryDirectory :
+
+        sourceDirectory = os.path.join(temporaryDirectory, "source")
+        generatedFiles, generatedDirectories, generatedBytes = generate_tree(sourceDirectory, arguments.files, arguments.files_per_directory, maxSize=arguments.max_size)
+        print(f"Generated tree : {generatedFiles} files, {generatedDirectories} directories, {generatedBytes} bytes")
+
+        workDirectory = os.path.join(temporaryDirectory, "work")
+        os.makedirs(workDirectory)
+
+        print(f"{'level':<28} {'run':>11} {'sync':>11} {'total':>11} {'files/s':>12} {'MB/s':>10}")
+
+        for level, levelArguments in levels :
+            times = [ time_level(sourceDirectory, os.path.join(temporaryDirectory, "target"), workDirectory, levelArguments, arguments.script_arguments.split()) for _ in range(arguments.repeat) ]
+            runSeconds, syncSeconds = min(times, key=sum)
+            print_row(level, runSeconds, syncSeconds, generatedFiles, generatedBytes)
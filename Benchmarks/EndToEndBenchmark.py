@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+""" EndToEndBenchmark.py
+This script measures the four versions of QuickFolderSynchro (Python only, Basic, Advanced and Advanced Plus) synchronizing a generated tree from start to end, and writes the results to a JSON file.
+Each version synchronizes the tree into an empty target, into a target already synchronized and into a target synchronized with an older version of the tree, with the caches of the operating system cold and warm.
+For each run it records the wall time, the CPU time, the peak memory (RSS), the bytes read from and written to the storage and, if strace is installed, the system calls, so the gains of the versions described in the README can be reproduced. """
+
+# EndToEndBenchmark.py
+# This script measures the four versions of QuickFolderSynchro (Python only, Basic, Advanced and Advanced Plus) synchronizing a generated tree from start to end, and writes the results to a JSON file.
+# Each version synchronizes the tree into an empty target, into a target already synchronized and into a target synchronized with an older version of the tree, with the caches of the operating system cold and warm.
+# For each run it records the wall time, the CPU time, the peak memory (RSS), the bytes read from and written to the storage and, if strace is installed, the system calls, so the gains of the versions described in the README can be reproduced.
+# The versions Basic, Advanced and Advanced Plus need their LogFileWriter module compiled for the Python used (see the Readme.md of their folders), a version that cannot be executed is recorded with its error and the others are measured.
+# The caches are emptied with /proc/sys/vm/drop_caches when the script is executed by root on Linux, otherwise the pages of the files of the trees are discarded with posix_fadvise, which does not discard the cached metadata of the directories; the method used is written to the JSON file.
+# The memory and the bytes are those of the process of the version and all its children (the versions that synchronize each directory in a new process), the peak memory is the one of the largest process.
+# Example, with a tree of 100000 files with sizes distributed as in a real tree and 5% of the files changed:
+#   python3 Benchmarks/EndToEndBenchmark.py --files 100000 --size-distribution lognormal --max-size 16777216 --change-ratio 0.05 --output results.json
+
+# Imports...
+import sys
+import os
+import json
+import time
+import glob
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+from TreeGenerator import generate_tree, apply_changes, SIZE_DISTRIBUTIONS
+from SyscallBenchmark import count_syscalls, METADATA_SYSCALLS
+
+
+# Folder of the repository, the parent of this folder
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Versions measured, with the path of their script in the repository
+SCRIPTS = {
+    "python": "QuickFolderSynchro.py",
+    "basic": os.path.join("Basic", "QuickFolderSynchroBasic.py"),
+    "advanced": os.path.join("Advanced", "QuickFolderSynchroAdvanced.py"),
+    "advancedplus": os.path.join("Advanced Plus", "QuickFolderSynchroAdvancedPlus.py"),
+}
+
+# Scenarios of each run:
+#   initial    the target is empty, every file is copied
+#   unchanged  the target is already synchronized, nothing is copied, the run is dominated by the listing of the directories
+#   changed    the target is synchronized with the tree before the changes of --change-ratio, the files changed are copied or deleted
+SCENARIOS = ("initial", "unchanged", "changed")
+
+# States of the caches of the operating system at the start of each run
+CACHE_STATES = ("cold", "warm")
+
+# Size in bytes of the blocks counted by getrusage in ru_inblock and ru_oublock
+RUSAGE_BLOCK_SIZE = 512
+
+
+# Function that copies the script of a version, its LogFileWriter modules and CopyBackends.py to a working directory, so that its log files are written there
+# It returns the path of the copy of the script
+def prepare_script(script, workDirectory) :
+    """ Copies a version of the script and its modules to a working directory """
+
+    os.makedirs(workDirectory)
+    for path in [ script, os.path.join(REPOSITORY, "CopyBackends.py"), *glob.glob(os.path.join(glob.escape(os.path.dirname(script)), "LogFileWriter*")) ] :
+        if os.path.isfile(path) : shutil.copy2(path, workDirectory)
+
+    return os.path.join(workDirectory, os.path.basename(script))
+
+
+# Function that leaves the target directory of a scenario as it must be before the run, this time is not measured
+def prepare_target(targetDirectory, baseDirectory, scenario) :
+    """ Empties the target or copies the tree before the changes to it """
+
+    if os.path.exists(targetDirectory) : shutil.rmtree(targetDirectory)
+
+    # shutil.copytree copies the modification times, so the files copied are already synchronized for the versions
+    if scenario == "initial" : os.makedirs(targetDirectory)
+    else : shutil.copytree(baseDirectory, targetDirectory)
+
+
+# Function that empties the caches of the operating system before a cold run and returns the method used
+def drop_caches(directories) :
+    """ Discards the cached data of the trees and returns the method used """
+
+    # The data pending to be written is written first, dirty pages cannot be discarded
+    if hasattr(os, "sync") : os.sync()
+
+    try :
+        with open("/proc/sys/vm/drop_caches", "w") as file : file.write("3\n")
+        return "drop_caches"
+    except OSError :
+        pass
+
+    if not hasattr(os, "posix_fadvise") : return None
+
+    for directory in directories :
+        for parent, _, fileNames in os.walk(directory) :
+            for fileName in fileNames :
+                try :
+                    fileDescriptor = os.open(os.path.join(parent, fileName), os.O_RDONLY)
+                except OSError :
+                    continue
+                try :
+                    os.posix_fadvise(fileDescriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+                finally :
+                    os.close(fileDescriptor)
+
+    return "posix_fadvise"
+
+
+# Function that reads the trees before a warm run, so their directories, metadata and contents are in the caches of the operating system
+def warm_caches(directories) :
+    """ Reads the trees so that they are in the caches """
+
+    for directory in directories :
+        for parent, _, fileNames in os.walk(directory) :
+            for fileName in fileNames :
+                try :
+                    with open(os.path.join(parent, fileName), 'rb') as file :
+                        while file.read(1048576) : pass
+                except OSError :
+                    continue
+
+
+# Function that returns the relative path and the size of every file and directory of a tree, to check that the target has been synchronized
+def tree_contents(root) :
+    """ Returns {relative path: size or None for the directories} """
+
+    contents = {}
+    for parent, directories, fileNames in os.walk(root) :
+        for name in directories : contents[os.path.relpath(os.path.join(parent, name), root)] = None
+        for name in fileNames : contents[os.path.relpath(os.path.join(parent, name), root)] = os.lstat(os.path.join(parent, name)).st_size
+    return contents
+
+
+# Function that executes a version to synchronize sourceDirectory into targetDirectory and returns the measures of the run
+# The process is waited with os.wait4, which returns the resources used by the process and by all its children already finished
+def time_run(scriptCopy, sourceDirectory, targetDirectory, workDirectory, extraArguments) :
+    """ Executes a version of the script and returns a dictionary with its measures """
+
+    errorPath = os.path.join(workDirectory, "stderr.txt")
+    command = [ sys.executable, scriptCopy, *extraArguments, sourceDirectory, targetDirectory ]
+
+    with open(errorPath, "w") as errorFile :
+        startTime = time.perf_counter()
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=errorFile, cwd=workDirectory, text=True)
+        try :
+            process.stdin.write("Yes\n")
+            process.stdin.close()
+        except BrokenPipeError :
+            pass
+        _, status, usage = os.wait4(process.pid, 0)
+        wallSeconds = time.perf_counter() - startTime
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    measures = {
+        "exitCode": process.returncode,
+        "wallSeconds": round(wallSeconds, 6),
+        "userSeconds": round(usage.ru_utime, 6),
+        "systemSeconds": round(usage.ru_stime, 6),
+        # ru_maxrss is in kilobytes in Linux and in bytes in macOS
+        "peakRssBytes": usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024,
+        "bytesRead": usage.ru_inblock * RUSAGE_BLOCK_SIZE,
+        "bytesWritten": usage.ru_oublock * RUSAGE_BLOCK_SIZE,
+    }
+
+    if process.returncode != 0 :
+        with open(errorPath) as errorFile : measures["error"] = errorFile.read()[-2000:]
+
+    return measures
+
+
+# Function that prints the table with the median wall time of each version, scenario and cache state, and the gain of each version against the Python only version
+def print_report(results, versions) :
+    """ Prints a summary of the results """
+
+    print(f"{'version':<14} {'scenario':<10} {'cache':<6} {'wall':>10} {'user':>10} {'system':>10} {'peak RSS':>10} {'written':>10} {'syscalls':>10} {'gain':>8}")
+
+    # The medians of the runs that finished are computed first, the Python only version is the baseline of the gains
+    medians = {}
+    for run in results :
+        key = (run["version"], run["scenario"], run["cache"])
+        if key not in medians and all(other["exitCode"] == 0 for other in results if (other["version"], other["scenario"], other["cache"]) == key) :
+            medians[key] = statistics.median(other["wallSeconds"] for other in results if (other["version"], other["scenario"], other["cache"]) == key)
+
+    for version in versions :
+        for scenario in SCENARIOS :
+            for cacheState in CACHE_STATES :
+                runs = [ run for run in results if (run["version"], run["scenario"], run["cache"]) == (version, scenario, cacheState) ]
+                if not runs : continue
+
+                if any(run["exitCode"] != 0 for run in runs) :
+                    print(f"{version:<14} {scenario:<10} {cacheState:<6} failed with exit code {runs[0]['exitCode']}")
+                    continue
+
+                wallSeconds = medians[version, scenario, cacheState]
+
+                baseline = medians.get(("python", scenario, cacheState))
+                gain = f"{(baseline - wallSeconds) / baseline * 100:>7.2f}%" if baseline and version != "python" else ""
+                syscalls = runs[0].get("syscalls")
+                syscalls = f"{syscalls['total']:>10}" if syscalls else f"{'-':>10}"
+
+                print(f"{version:<14} {scenario:<10} {cacheState:<6} {wallSeconds:>9.3f}s {statistics.median(run['userSeconds'] for run in runs):>9.3f}s {statistics.median(run['systemSeconds'] for run in runs):>9.3f}s "
+                      f"{max(run['peakRssBytes'] for run in runs) / 1048576:>8.1f}MB {statistics.median(run['bytesWritten'] for run in runs) / 1048576:>8.1f}MB {syscalls} {gain:>8}")
+
+
+# Function that returns the commit of the repository measured, or None if it is not a git repository
+def git_revision() :
+    """ Returns the commit of the repository """
+
+    try :
+        return subprocess.run([ "git", "rev-parse", "HEAD" ], cwd=REPOSITORY, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError) :
+        return None
+
+
+
+if __name__ == "__main__" :
+
+    parser = argparse.ArgumentParser(description="Measures the versions of QuickFolderSynchro synchronizing a generated tree and writes the results to a JSON file")
+    parser.add_argument("--versions", default=",".join(SCRIPTS), help=f"comma separated versions measured (default {','.join(SCRIPTS)})")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated scenarios measured (default {','.join(SCENARIOS)})")
+    parser.add_argument("--caches", default=",".join(CACHE_STATES), help=f"comma separated states of the caches measured (default {','.join(CACHE_STATES)})")
+    parser.add_argument("--files", type=int, default=10000, help="number of files of the generated tree (default 10000)")
+    parser.add_argument("--files-per-directory", type=int, default=100, help="files in each directory (default 100)")
+    parser.add_argument("--directories-per-directory", type=int, default=10, help="subdirectories of each directory (default 10)")
+    parser.add_argument("--max-depth", type=int, help="maximum depth of the directories of the tree (default no limit)")
+    parser.add_argument("--min-size", type=int, default=0, help="minimum size of the files in bytes (default 0)")
+    parser.add_argument("--max-size", type=int, default=65536, help="maximum size of the files in bytes (default 65536)")
+    parser.add_argument("--size-distribution", choices=SIZE_DISTRIBUTIONS, default="uniform", help="distribution of the sizes of the files (default uniform)")
+    parser.add_argument("--change-ratio", type=float, default=0.05, help="fraction of the files modified, added or deleted in the scenario changed (default 0.05)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated tree, the changes use the next seed (default 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of each version, scenario and cache state (default 3)")
+    parser.add_argument("--directory", help="directory where the trees are generated and synchronized (default the temporary directory of the system)")
+    parser.add_argument("--script-arguments", default="", help="options passed to the runs of the Python only version, for example \"--jobs 4\" (the other versions have no options)")
+    parser.add_argument("--no-syscalls", action="store_true", help="do not count the system calls with strace")
+    parser.add_argument("--output", default="EndToEndBenchmark.json", help="JSON file where the results are written (default EndToEndBenchmark.json)")
+    arguments = parser.parse_args()
+
+    versions = arguments.versions.split(",")
+    scenarios = arguments.scenarios.split(",")
+    cacheStates = arguments.caches.split(",")
+    for name, values, choices in (("--versions", versions, SCRIPTS), ("--scenarios", scenarios, SCENARIOS), ("--caches", cacheStates, CACHE_STATES)) :
+        for value in values :
+            if value not in choices : parser.error(f"{name}: unknown value {value}, the values are {','.join(choices)}")
+    if arguments.repeat < 1 : parser.error("--repeat must be at least 1")
+
+    isStraceAvailable = not arguments.no_syscalls and shutil.which("strace") is not None
+    if not arguments.no_syscalls and not isStraceAvailable : print("strace is not installed, the system calls are not counted")
+
+    with tempfile.TemporaryDirectory(dir=arguments.directory) as temporaryDirectory :
+
+        # The tree before the changes is the source of the scenarios initial and unchanged, and the target of the scenario changed
+        baseDirectory = os.path.join(temporaryDirectory, "base")
+        generatedFiles, generatedDirectories, generatedBytes = generate_tree(baseDirectory, arguments.files, arguments.files_per_directory, arguments.directories_per_directory, arguments.min_size, arguments.max_size, arguments.seed, arguments.max_depth, arguments.size_distribution)
+        print(f"Generated tree : {generatedFiles} files, {generatedDirectories} directories, {generatedBytes} bytes")
+
+        changedDirectory = os.path.join(temporaryDirectory, "changed")
+        shutil.copytree(baseDirectory, changedDirectory)
+        modifiedFiles, addedFiles, deletedFiles = apply_changes(changedDirectory, arguments.change_ratio, arguments.seed + 1, arguments.min_size, arguments.max_size, arguments.size_distribution)
+        print(f"Changed tree : {modifiedFiles} files modified, {addedFiles} files added, {deletedFiles} files deleted")
+
+        targetDirectory = os.path.join(temporaryDirectory, "target")
+        results = []
+        cacheMethods = set()
+
+        for version in versions :
+
+            workDirectory = os.path.join(temporaryDirectory, f"work-{version}")
+            scriptCopy = prepare_script(os.path.join(REPOSITORY, SCRIPTS[version]), workDirectory)
+            extraArguments = arguments.script_arguments.split() if version == "python" else []
+
+            for scenario in scenarios :
+
+                sourceDirectory = changedDirectory if scenario == "changed" else baseDirectory
+                expectedContents = tree_contents(sourceDirectory)
+
+                for cacheState in cacheStates :
+                    for repetition in range(arguments.repeat) :
+
+                        prepare_target(targetDirectory, baseDirectory, scenario)
+                        if cacheState == "cold" : cacheMethods.add(drop_caches([ sourceDirectory, targetDirectory ]))
+                        else : warm_caches([ sourceDirectory, targetDirectory ])
+
+                        measures = time_run(scriptCopy, sourceDirectory, targetDirectory, workDirectory, extraArguments)
+                        measures["synchronized"] = measures["exitCode"] == 0 and tree_contents(targetDirectory) == expectedContents
+                        results.append({ "version": version, "scenario": scenario, "cache": cacheState, "repetition": repetition, **measures })
+                        print(f"{version} {scenario} {cacheState} {repetition + 1}/{arguments.repeat} : {measures['wallSeconds']:.3f}s" + ("" if measures["exitCode"] == 0 else f" (exit code {measures['exitCode']})"))
+
+                        # A version that cannot be executed is not executed again
+                        if measures["exitCode"] != 0 : break
+
+                # The system calls are counted in a separate run, strace slows down the process and its times are not valid
+                scenarioRuns = [ run for run in results if (run["version"], run["scenario"]) == (version, scenario) ]
+                if isStraceAvailable and all(run["exitCode"] == 0 for run in scenarioRuns) :
+                    prepare_target(targetDirectory, baseDirectory, scenario)
+                    try :
+                        calls = count_syscalls(scriptCopy, sourceDirectory, targetDirectory, workDirectory, extraArguments)
+                        syscalls = { "total": sum(calls.values()), "metadata": sum(calls.get(name, 0) for name in METADATA_SYSCALLS), "calls": calls }
+                    except subprocess.CalledProcessError :
+                        syscalls = None
+                    for run in scenarioRuns : run["syscalls"] = syscalls
+
+        report = {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(),
+            "system": { "platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count(), "cacheMethods": sorted(method for method in cacheMethods if method) },
+            "tree": {
+                "files": generatedFiles, "directories": generatedDirectories, "bytes": generatedBytes,
+                "filesPerDirectory": arguments.files_per_directory, "directoriesPerDirectory": arguments.directories_per_directory, "maxDepth": arguments.max_depth,
+                "minSize": arguments.min_size, "maxSize": arguments.max_size, "sizeDistribution": arguments.size_distribution, "seed": arguments.seed,
+                "changeRatio": arguments.change_ratio, "modifiedFiles": modifiedFiles, "addedFiles": addedFiles, "deletedFiles": deletedFiles,
+            },
+            "scriptArguments": arguments.script_arguments,
+            "results": results,
+        }
+
+    with open(arguments.output, "w") as file : json.dump(report, file, indent=2)
+
+    print()
+    print_report(results, versions)
+    print(f"Results written to {arguments.output}")
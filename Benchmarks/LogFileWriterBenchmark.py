@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+""" LogFileWriterBenchmark.py
+This script measures the three LogFileWriter modules written in C++ (Basic, Advanced and Advanced Plus) writing log lines from 1, 8 and 64 processes at the same time, at a controlled rate of lines per second.
+For each module, number of processes and rate it shows the percentiles of the latency of each call, the lines per second written, the calls that blocked the process more than --blocked-ms and the lines that were lost (calls that failed or lines that are not in the log file), so the logger can be chosen by measurement. """
+
+# LogFileWriterBenchmark.py
+# This script measures the three LogFileWriter modules written in C++ (Basic, Advanced and Advanced Plus) writing log lines from 1, 8 and 64 processes at the same time, at a controlled rate of lines per second.
+# For each module, number of processes and rate it shows the percentiles of the latency of each call, the lines per second written, the calls that blocked the process more than --blocked-ms and the lines that were lost (calls that failed or lines that are not in the log file), so the logger can be chosen by measurement.
+# The modules are used as the versions of the script use them:
+#   basic         each process has a Writer that opens, writes and closes the log file in each call of write_line
+#   advanced      each process has its own singleton with a queue and a thread that writes the lines to the log file, flushing it after each line
+#   advancedplus  the processes put the lines in a queue in a shared memory segment of 1 MB, and the thread of the main process writes them to the log file
+# Each run has a main process, which creates the log file as the main process of the script does (and with Advanced Plus writes the lines of all the processes), and the writer processes, which are started with spawn so that each one loads the module.
+# The modules must be compiled for the Python that executes this script (see the Readme.md of their folders), a module that cannot be loaded is shown with its error and the others are measured.
+# Advanced Plus uses a shared memory segment with a fixed name, so it cannot be measured while a synchronization of QuickFolderSynchroAdvancedPlus is running.
+# Example, at 1000 lines per second and as fast as possible, with 1, 8 and 64 processes:
+#   python3.12 Benchmarks/LogFileWriterBenchmark.py --rates 1000,0 --processes 1,8,64 --output logs.json
+
+# Imports...
+import sys
+import os
+import json
+import math
+import time
+import array
+import queue
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+
+# Folder of the repository, the parent of this folder
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules measured, with their folder in the repository and the name of the log file they write
+MODULES = {
+    "basic": ("Basic", "LogFileWriterBenchmark.log"),
+    "advanced": ("Advanced", "QuickFolderSynchroAdvanced.log"),
+    "advancedplus": ("Advanced Plus", "QuickFolderSynchroAdvancedPlus.log"),
+}
+
+# File of the shared memory segment of Advanced Plus in Linux
+ADVANCED_PLUS_SEGMENT = "/dev/shm/LogFileWriterShm"
+
+# Percentiles of the latency shown
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Seconds that the main process waits for the processes of a run to load the module and to finish
+PROCESS_TIMEOUT = 600
+
+
+# Function that loads the LogFileWriter module of a folder of the repository in the current process
+# The working directory is changed to the directory of the run first, because Advanced and Advanced Plus write their log file in the working directory
+def load_module(moduleName, workDirectory) :
+    """ Loads the LogFileWriter module of a version """
+
+    os.chdir(workDirectory)
+    sys.path.insert(0, os.path.join(REPOSITORY, MODULES[moduleName][0]))
+    import LogFileWriter
+    return LogFileWriter
+
+
+# Function executed by the main process of a run
+# It creates the log file as the main process of each version does, waits until the writers have finished and then closes the logger, which with Advanced Plus writes the lines still in the queue
+def main_process(moduleName, workDirectory, messages, stopEvent) :
+    """ Creates the log file, waits for the writers and closes the logger """
+
+    try :
+        LogFileWriter = load_module(moduleName, workDirectory)
+        if moduleName == "basic" : LogFileWriter.Writer(os.path.join(workDirectory, MODULES[moduleName][1]), True)
+        elif moduleName == "advanced" : LogFileWriter.Writer.get_instance().resetLogFile()
+        else : LogFileWriter.Writer.get_instance().start_worker()
+    except Exception as error :
+        messages.put(("error", "main", f"{type(error).__name__}: {error}"))
+        return
+
+    messages.put(("ready", "main", None))
+    stopEvent.wait(PROCESS_TIMEOUT)
+
+    if moduleName == "advancedplus" : LogFileWriter.Writer.get_instance().freeze()
+    messages.put(("closed", "main", None))
+
+
+# Function executed by each writer process of a run
+# The calls are done at the rate given (0 is as fast as possible): the call number i is done at start + i / rate, or at once if the previous calls have taken longer, so a slow logger cannot lower the rate measured
+# It sends to the main process the latency of each call in nanoseconds and the calls that failed
+def writer_process(moduleName, workDirectory, index, calls, rate, messageSize, tag, messages, startEvent) :
+    """ Writes log lines at a controlled rate and sends the latency of each call """
+
+    try :
+        LogFileWriter = load_module(moduleName, workDirectory)
+        if moduleName == "basic" :
+            logger = LogFileWriter.Writer(os.path.join(workDirectory, MODULES[moduleName][1]), False)
+            write = logger.write_line
+        else :
+            LogFileWriter.Writer.get_instance()
+            write = lambda text : LogFileWriter.Writer.LOG_INFO(text, "LogFileWriterBenchmark.py", index, False)
+    except Exception as error :
+        messages.put(("error", index, f"{type(error).__name__}: {error}"))
+        return
+
+    # The lines have the size given, and the tag and the number of the process and of the call to find them in the log file
+    padding = "x" * max(messageSize - len(tag) - 20, 0)
+    latencies = array.array('q')
+    failedCalls = 0
+    firstError = None
+
+    messages.put(("ready", index, None))
+    startEvent.wait(PROCESS_TIMEOUT)
+
+    interval = 1000000000 / rate if rate > 0 else 0
+    startTime = time.perf_counter_ns()
+
+    for call in range(calls) :
+
+        if interval :
+            delay = startTime + call * interval - time.perf_counter_ns()
+            if delay > 0 : time.sleep(delay / 1000000000)
+
+        text = f"{tag} {index:04d} {call:09d} {padding}"
+        callStart = time.perf_counter_ns()
+        try :
+            write(text)
+        except Exception as error :
+            failedCalls += 1
+            if firstError is None : firstError = f"{type(error).__name__}: {error}"
+        latencies.append(time.perf_counter_ns() - callStart)
+
+    callingSeconds = (time.perf_counter_ns() - startTime) / 1000000000
+
+    # Each process of Advanced Plus leaves the shared segment as the script does when it exits
+    if moduleName == "advancedplus" : LogFileWriter.Writer.get_instance().freeze()
+
+    messages.put(("done", index, (latencies.tobytes(), failedCalls, firstError, callingSeconds)))
+
+
+# Function that counts the lines of a run in the log file
+def count_logged_lines(path, tag) :
+    """ Returns the number of lines of the log file with the tag of the run """
+
+    if not os.path.exists(path) : return 0
+    with open(path, errors="replace") as file : return sum(1 for line in file if tag in line)
+
+
+# Function that returns the percentile of a list of sorted values, by the nearest rank method
+def percentile(sortedValues, percent) :
+    """ Returns a percentile of a sorted list """
+
+    if not sortedValues : return None
+    return sortedValues[min(len(sortedValues), max(1, math.ceil(percent / 100 * len(sortedValues)))) - 1]
+
+
+# Function that executes a run of a module with a number of writer processes at a rate, and returns its results
+def run_case(moduleName, processes, rate, calls, messageSize, blockedNanoseconds) :
+    """ Measures a module with a number of processes and a rate and returns a dictionary with the results """
+
+    context = multiprocessing.get_context("spawn")
+    messages = context.Queue()
+    startEvent = context.Event()
+    stopEvent = context.Event()
+    tag = f"LogFileWriterBenchmark-{os.getpid()}-{time.time_ns()}"
+    result = { "module": moduleName, "processes": processes, "rate": rate, "calls": processes * calls }
+
+    with tempfile.TemporaryDirectory() as workDirectory :
+
+        mainProcess = context.Process(target=main_process, args=(moduleName, workDirectory, messages, stopEvent))
+        mainProcess.start()
+        writers = []
+
+        try :
+            # The writers are started once the log file has been created by the main process
+            if not wait_for_ready(messages, 1, result) : return result
+
+            writers = [ context.Process(target=writer_process, args=(moduleName, workDirectory, index, calls, rate, messageSize, tag, messages, startEvent)) for index in range(processes) ]
+            for writer in writers : writer.start()
+            if not wait_for_ready(messages, processes, result) : return result
+
+            startTime = time.perf_counter()
+            startEvent.set()
+
+            latencies = []
+            failedCalls = 0
+            firstError = None
+            callingSeconds = []
+            for _ in range(processes) :
+                _, _, (latencyBytes, processFailedCalls, processError, processSeconds) = wait_for_message(messages, "done")
+                latencies.extend(array.array('q', latencyBytes))
+                failedCalls += processFailedCalls
+                firstError = firstError or processError
+                callingSeconds.append(processSeconds)
+
+            for writer in writers : writer.join(PROCESS_TIMEOUT)
+
+            # The lines are in the log file once the main process has closed the logger
+            stopEvent.set()
+            wait_for_message(messages, "closed")
+            mainProcess.join(PROCESS_TIMEOUT)
+            totalSeconds = time.perf_counter() - startTime
+
+        except queue.Empty :
+            result["error"] = "timeout waiting for the processes of the run"
+            return result
+
+        finally :
+            startEvent.set()
+            stopEvent.set()
+            for process in [ mainProcess, *writers ] :
+                process.join(10)
+                if process.is_alive() : process.kill()
+
+        loggedLines = count_logged_lines(os.path.join(workDirectory, MODULES[moduleName][1]), tag)
+
+    latencies.sort()
+    result.update({
+        "latencyNanoseconds": { f"p{percent:g}": percentile(latencies, percent) for percent in PERCENTILES },
+        "maxLatencyNanoseconds": latencies[-1] if latencies else None,
+        "meanLatencyNanoseconds": statistics.fmean(latencies) if latencies else None,
+        "callsPerSecond": len(latencies) / max(callingSeconds) if callingSeconds and max(callingSeconds) > 0 else None,
+        "linesPerSecond": loggedLines / totalSeconds if totalSeconds > 0 else None,
+        "totalSeconds": totalSeconds,
+        "blockedCalls": sum(1 for latency in latencies if latency >= blockedNanoseconds),
+        "failedCalls": failedCalls,
+        "loggedLines": loggedLines,
+        "droppedLines": processes * calls - loggedLines,
+    })
+    if firstError : result["firstError"] = firstError
+
+    return result
+
+
+# Function that waits for a message of a type from the processes of a run, an error of a process is raised as a RuntimeError
+def wait_for_message(messages, messageType) :
+    """ Returns the next message of the processes of the run """
+
+    message = messages.get(timeout=PROCESS_TIMEOUT)
+    if message[0] == "error" : raise RuntimeError(f"process {message[1]}: {message[2]}")
+    if message[0] != messageType : raise RuntimeError(f"unexpected message {message[0]} from process {message[1]}")
+    return message
+
+
+# Function that waits until a number of processes have loaded the module, and records the error in the result if one of them could not
+def wait_for_ready(messages, processes, result) :
+    """ Waits for the processes to be ready and returns False if one failed """
+
+    try :
+        for _ in range(processes) : wait_for_message(messages, "ready")
+    except RuntimeError as error :
+        result["error"] = str(error)
+        return False
+    return True
+
+
+# Function that prints a row of the table of results
+def print_row(result) :
+    """ Prints the result of a run """
+
+    rate = f"{result['rate']:g}" if result["rate"] else "max"
+    if "error" in result :
+        print(f"{result['module']:<13} {result['processes']:>9} {rate:>8} failed: {result['error']}")
+        return
+
+    latencies = " ".join(f"{(result['latencyNanoseconds'][f'p{percent:g}'] or 0) / 1000:>9.1f}" for percent in PERCENTILES)
+    print(f"{result['module']:<13} {result['processes']:>9} {rate:>8} {latencies} {result['maxLatencyNanoseconds'] / 1000:>10.1f} {result['callsPerSecond']:>11.0f} {result['linesPerSecond']:>11.0f} {result['blockedCalls']:>8} {result['droppedLines']:>8}")
+
+
+
+if __name__ == "__main__" :
+
+    parser = argparse.ArgumentParser(description="Measures the LogFileWriter modules writing log lines from several processes at a controlled rate")
+    parser.add_argument("--modules", default=",".join(MODULES), help=f"comma separated modules measured (default {','.join(MODULES)})")
+    parser.add_argument("--processes", default="1,8,64", help="comma separated numbers of writer processes (default 1,8,64)")
+    parser.add_argument("--rates", default="1000,0", help="comma separated lines per second of each writer process, 0 is as fast as possible (default 1000,0)")
+    parser.add_argument("--calls", type=int, default=5000, help="lines written by each writer process (default 5000)")
+    parser.add_argument("--message-size", type=int, default=120, help="size of the lines in characters (default 120)")
+    parser.add_argument("--blocked-ms", type=float, default=10, help="latency in milliseconds from which a call is counted as blocked (default 10)")
+    parser.add_argument("--output", help="JSON file where the results are written")
+    arguments = parser.parse_args()
+
+    moduleNames = arguments.modules.split(",")
+    for moduleName in moduleNames :
+        if moduleName not in MODULES : parser.error(f"--modules: unknown module {moduleName}, the modules are {','.join(MODULES)}")
+    try :
+        processCounts = [ int(value) for value in arguments.processes.split(",") ]
+        rates = [ float(value) for value in arguments.rates.split(",") ]
+    except ValueError :
+        parser.error("--processes and --rates must be comma separated numbers")
+    if min(processCounts) < 1 : parser.error("--processes must be at least 1")
+    if min(rates) < 0 : parser.error("--rates cannot be negative")
+    if arguments.calls < 1 : parser.error("--calls must be at least 1")
+
+    if "advancedplus" in moduleNames and os.path.exists(ADVANCED_PLUS_SEGMENT) :
+        parser.error(f"the shared memory segment {ADVANCED_PLUS_SEGMENT} exists: a synchronization of Advanced Plus is running or was killed, remove it if none is running")
+
+    print(f"{'module':<13} {'processes':>9} {'rate':>8} " + " ".join(f"{f'p{percent:g} us':>9}" for percent in PERCENTILES) + f" {'max us':>10} {'calls/s':>11} {'lines/s':>11} {'blocked':>8} {'dropped':>8}")
+
+    results = []
+    for moduleName in moduleNames :
+        for processes, rate in [ (processes, rate) for processes in processCounts for rate in rates ] :
+            result = run_case(moduleName, processes, rate, arguments.calls, arguments.message_size, arguments.blocked_ms * 1000000)
+            results.append(result)
+            print_row(result)
+
+            # A module that cannot be loaded or whose processes do not finish is not measured again
+            if "error" in result : break
+
+    if arguments.output :
+        with open(arguments.output, "w") as file : json.dump({ "python": sys.version, "calls": arguments.calls, "messageSize": arguments.message_size, "blockedMilliseconds": arguments.blocked_ms, "results": results }, file, indent=2)
+        print(f"Results written to {arguments.output}")
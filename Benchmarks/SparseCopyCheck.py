@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+""" SparseCopyCheck.py
+This script checks that QuickFolderSynchro keeps the holes of the sparse files: it generates sparse files, copies them with the copy of the script and with shutil.copy2, and compares the allocated blocks and the contents.
+It exits with 1 if a copy does not have the same contents or allocates more blocks than the source file. """
+
+# SparseCopyCheck.py
+# This script checks that QuickFolderSynchro keeps the holes of the sparse files: it generates sparse files, copies them with the copy of the script and with shutil.copy2, and compares the allocated blocks and the contents.
+# It exits with 1 if a copy does not have the same contents or allocates more blocks than the source file.
+# The directory should be in the filesystem to check, the holes are only kept by the filesystems that support them (ext4, XFS, btrfs, tmpfs...)
+# Example:
+#   python3 Benchmarks/SparseCopyCheck.py /mnt/ext4
+
+# Imports...
+import sys
+import os
+import shutil
+import argparse
+import tempfile
+
+# The copy of the files is imported from the module of the parent folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CopyBackends import copy_file
+
+
+# Sparse files generated, as (name, size in megabytes, [(offset in megabytes, bytes of data)])
+SPARSE_FILES = ( ( "disk.img", 256, [ (0, 4096), (64, 1024 * 1024), (255, 100) ] ),
+                 ( "holeAtTheEnd.db", 128, [ (0, 65536) ] ),
+                 ( "holeAtTheStart.db", 128, [ (127, 65536) ] ),
+                 ( "empty.img", 64, [] ) )
+
+
+# Function that generates a sparse file writing only its data, the rest of the file are holes
+def generate_sparse_file(path, sizeMb, extents) :
+    """ Generates a sparse file """
+
+    with open(path, 'wb') as file :
+        for offsetMb, length in extents :
+            file.seek(offsetMb * 1024 * 1024)
+            file.write(os.urandom(length))
+        file.truncate(sizeMb * 1024 * 1024)
+
+
+# Function that returns True if two files have the same contents
+def same_contents(path, otherPath) :
+    """ Compares the contents of two files """
+
+    with open(path, 'rb') as file, open(otherPath, 'rb') as otherFile :
+        while True :
+            block = file.read(1024 * 1024)
+            if block != otherFile.read(1024 * 1024) : return False
+            if not block : return True
+
+
+
+if __name__ == "__main__" :
+
+    parser = argparse.ArgumentParser(description="Checks that the copy of QuickFolderSynchro keeps the holes of the sparse files")
+    parser.add_argument("directory", nargs="?", default=tempfile.gettempdir(), help="directory where the files are generated and copied (default the temporary directory)")
+    arguments = parser.parse_args()
+
+    isCorrect = True
+
+    print(f"{'file':<20} {'source blocks':>14} {'copy blocks':>12} {'copy2 blocks':>13}  {'description'}")
+
+    with tempfile.TemporaryDirectory(dir=arguments.directory) as temporaryDirectory :
+
+        for name, sizeMb, extents in SPARSE_FILES :
+
+            sourcePath = os.path.join(temporaryDirectory, name)
+            targetPath = os.path.join(temporaryDirectory, f"{name}.copy")
+            referencePath = os.path.join(temporaryDirectory, f"{name}.copy2")
+
+            generate_sparse_file(sourcePath, sizeMb, extents)
+            description = copy_file(sourcePath, targetPath)
+            shutil.copy2(sourcePath, referencePath)
+
+            sourceBlocks = os.stat(sourcePath).st_blocks
+            targetBlocks = os.stat(targetPath).st_blocks
+            print(f"{name:<20} {sourceBlocks:>14} {targetBlocks:>12} {os.stat(referencePath).st_blocks:>13}  {description}")
+
+            if targetBlocks > sourceBlocks or not same_contents(sourcePath, targetPath) :
+                print(f"{name} : the copy is not correct")
+                isCorrect = False
+
+    sys.exit(0 if isCorrect else 1)
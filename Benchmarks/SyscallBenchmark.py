@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+""" SyscallBenchmark.py
+This script counts the system calls made by one or more versions of QuickFolderSynchro to synchronize a generated tree.
+Each script is executed under strace -f -c twice: first with an empty destination directory (every file is copied) and then again with the destination already synchronized (nothing is copied), which is the run dominated by the metadata system calls.
+strace must be installed, it is only available on Linux; without strace the system calls are counted with ptrace on Linux x86_64, which is slower but gives the same counts. """
+
+# SyscallBenchmark.py
+# This script counts the system calls made by one or more versions of QuickFolderSynchro to synchronize a generated tree.
+# Each script is executed under strace -f -c twice: first with an empty destination directory (every file is copied) and then again with the destination already synchronized (nothing is copied), which is the run dominated by the metadata system calls.
+# strace must be installed, it is only available on Linux; without strace the system calls are counted with ptrace on Linux x86_64, which is slower but gives the same counts.
+# Example, comparing the current script with the baseline version (1M files):
+#   git show 8cad83d:QuickFolderSynchro.py > /tmp/QuickFolderSynchroBaseline.py
+#   python3 Benchmarks/SyscallBenchmark.py --files 1000000 QuickFolderSynchro.py /tmp/QuickFolderSynchroBaseline.py
+
+# Imports...
+import sys
+import os
+import shutil
+import signal
+import ctypes
+import argparse
+import platform
+import tempfile
+import subprocess
+import collections
+
+from TreeGenerator import generate_tree
+
+
+# Module of the copy methods imported by the script, from the parent folder
+COPY_BACKENDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CopyBackends.py")
+
+# System calls that obtain the metadata of a file or list a directory, they are the ones reduced by scanning the directories with os.scandir
+METADATA_SYSCALLS = ( "stat", "lstat", "fstat", "newfstatat", "statx", "access", "getdents64", "openat" )
+
+# Numbers of the system calls of Linux x86_64 named in the counts of ptrace, the other system calls are counted by their number
+X86_64_SYSCALLS = { 0: "read", 1: "write", 2: "open", 3: "close", 4: "stat", 5: "fstat", 6: "lstat", 8: "lseek", 9: "mmap", 16: "ioctl", 21: "access", 40: "sendfile", 56: "clone", 57: "fork",
+                    58: "vfork", 59: "execve", 82: "rename", 83: "mkdir", 87: "unlink", 90: "chmod", 132: "utime", 217: "getdents64", 235: "utimes", 257: "openat", 262: "newfstatat",
+                    263: "unlinkat", 280: "utimensat", 326: "copy_file_range", 332: "statx", 435: "clone3" }
+
+# Requests and options of ptrace (linux/ptrace.h)
+PTRACE_TRACEME = 0
+PTRACE_PEEKUSER = 3
+PTRACE_SYSCALL = 24
+PTRACE_SETOPTIONS = 0x4200
+PTRACE_GETEVENTMSG = 0x4201
+PTRACE_OPTIONS = 0x1 | 0x2 | 0x4 | 0x8 | 0x10 | 0x100000     # TRACESYSGOOD, TRACEFORK, TRACEVFORK, TRACECLONE, TRACEEXEC, EXITKILL
+PTRACE_FORK_EVENTS = ( 1, 2, 3 )                            # PTRACE_EVENT_FORK, PTRACE_EVENT_VFORK, PTRACE_EVENT_CLONE
+
+# Offset of orig_rax, the number of the system call, in the registers of a process of Linux x86_64 (struct user_regs_struct)
+ORIG_RAX_OFFSET = 15 * 8
+
+
+# Function that executes a command under ptrace, following its children and threads as strace -f does, and returns the number of calls of each system call
+# Each system call stops the process twice, at its entry and at its exit, and it is counted at its entry
+def ptrace_syscalls(command, inputText, workDirectory) :
+    """ Executes a command under ptrace and returns {syscall: calls} """
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.ptrace.restype = ctypes.c_long
+    libc.ptrace.argtypes = [ ctypes.c_long, ctypes.c_long, ctypes.c_void_p, ctypes.c_void_p ]
+
+    inputRead, inputWrite = os.pipe()
+    pid = os.fork()
+
+    # The child asks to be traced, stops until the tracer has set the options and executes the command
+    if pid == 0 :
+        try :
+            os.dup2(inputRead, 0)
+            nullDescriptor = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(nullDescriptor, 1)
+            os.chdir(workDirectory)
+            libc.ptrace(PTRACE_TRACEME, 0, None, None)
+            os.kill(os.getpid(), signal.SIGSTOP)
+            os.execvp(command[0], command)
+        finally :
+            os._exit(127)
+
+    os.close(inputRead)
+    os.write(inputWrite, inputText.encode())
+    os.close(inputWrite)
+
+    calls = collections.Counter()
+    inSyscall = {}
+    tracedProcesses = { pid }
+    exitCode = None
+
+    os.waitpid(pid, 0)
+    libc.ptrace(PTRACE_SETOPTIONS, pid, None, PTRACE_OPTIONS)
+    libc.ptrace(PTRACE_SYSCALL, pid, None, None)
+
+    while tracedProcesses :
+
+        stoppedPid, status = os.waitpid(-1, 0x40000000)     # __WALL, the threads are waited too
+        if os.WIFEXITED(status) or os.WIFSIGNALED(status) :
+            tracedProcesses.discard(stoppedPid)
+            if stoppedPid == pid : exitCode = os.waitstatus_to_exitcode(status)
+            continue
+
+        stopSignal = os.WSTOPSIG(status)
+        event = status >> 16
+        deliveredSignal = 0
+
+        if stopSignal == signal.SIGTRAP | 0x80 :
+            if not inSyscall.get(stoppedPid) : calls[libc.ptrace(PTRACE_PEEKUSER, stoppedPid, ORIG_RAX_OFFSET, None)] += 1
+            inSyscall[stoppedPid] = not inSyscall.get(stoppedPid)
+        elif event in PTRACE_FORK_EVENTS :
+            newPid = ctypes.c_ulong()
+            libc.ptrace(PTRACE_GETEVENTMSG, stoppedPid, None, ctypes.byref(newPid))
+            tracedProcesses.add(newPid.value)
+        elif event == 0 and stopSignal != signal.SIGSTOP and stopSignal != signal.SIGTRAP :
+            deliveredSignal = stopSignal
+
+        # The first stop of each new process or thread is a SIGSTOP of ptrace, it is not delivered
+        libc.ptrace(PTRACE_SYSCALL, stoppedPid, None, deliveredSignal)
+
+    if exitCode != 0 : raise subprocess.CalledProcessError(exitCode, command)
+
+    return { X86_64_SYSCALLS.get(number, f"syscall {number}") : count for number, count in calls.items() }
+
+
+# Function that reads the summary written by strace -c and returns a dictionary with the number of calls of each system call
+def parse_strace_summary(path) :
+    """ Reads the summary of strace -c and returns {syscall: calls} """
+
+    calls = {}
+
+    with open(path) as file :
+
+        for line in file :
+
+            # The lines of the table are: % time, seconds, usecs/call, calls, [errors], syscall
+            fields = line.split()
+            if len(fields) < 5 or not fields[3].isdigit() or fields[-1] == "total" : continue
+            calls[fields[-1]] = calls.get(fields[-1], 0) + int(fields[3])
+
+    return calls
+
+
+# Function that executes a script under strace (or ptrace without strace) to synchronize sourceDirectory into targetDirectory and returns the number of calls of each system call
+# The script is copied with CopyBackends.py to a working directory, so that its log files are written there, and the confirmation is answered through the standard input
+def count_syscalls(script, sourceDirectory, targetDirectory, workDirectory, extraArguments) :
+    """ Executes a script under strace and returns {syscall: calls} """
+
+    scriptCopy = os.path.join(workDirectory, os.path.basename(script))
+    shutil.copy2(script, scriptCopy)
+    shutil.copy2(COPY_BACKENDS, workDirectory)
+    summaryPath = os.path.join(workDirectory, "strace.txt")
+
+    if shutil.which("strace") is None : return ptrace_syscalls([ sys.executable, scriptCopy, *extraArguments, sourceDirectory, targetDirectory ], "Yes\n", workDirectory)
+
+    command = [ "strace", "-f", "-c", "-o", summaryPath, sys.executable, scriptCopy, *extraArguments, sourceDirectory, targetDirectory ]
+    subprocess.run(command, input="Yes\n", text=True, stdout=subprocess.DEVNULL, cwd=workDirectory, check=True)
+
+    return parse_strace_summary(summaryPath)
+
+
+# Function that prints the number of calls of the metadata system calls and the total of each run
+def print_report(results) :
+    """ Prints a table with the metadata system calls of each run """
+
+    print(f"{'run':<60} {'total':>12} {'metadata':>12}  " + " ".join(f"{name:>11}" for name in METADATA_SYSCALLS))
+
+    for run, calls in results :
+        metadataCalls = sum(calls.get(name, 0) for name in METADATA_SYSCALLS)
+        print(f"{run:<60} {sum(calls.values()):>12} {metadataCalls:>12}  " + " ".join(f"{calls.get(name, 0):>11}" for name in METADATA_SYSCALLS))
+
+
+
+if __name__ == "__main__" :
+
+    parser = argparse.ArgumentParser(description="Counts the system calls made by versions of QuickFolderSynchro to synchronize a generated tree")
+    parser.add_argument("scripts", nargs="+", help="scripts to compare")
+    parser.add_argument("--files", type=int, default=1000000, help="number of files of the generated tree (default 1000000)")
+    parser.add_argument("--files-per-directory", type=int, default=100, help="files in each directory (default 100)")
+    parser.add_argument("--max-size", type=int, default=64, help="maximum size of the files in bytes (default 64, the copies are not measured)")
+    parser.add_argument("--tree", help="directory of a tree already generated with the same arguments, it is reused instead of generating it again")
+    parser.add_argument("--script-arguments", default="", help="options passed to every script, for example \"--jobs 4\"")
+    arguments = parser.parse_args()
+
+    if shutil.which("strace") is None and not (sys.platform.startswith("linux") and platform.machine() == "x86_64") :
+        print("strace is not installed, it is needed to count the system calls")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as temporaryDirectory :
+
+        sourceDirectory = arguments.tree
+        if sourceDirectory is None :
+            sourceDirectory = os.path.join(temporaryDirectory, "source")
+            generatedFiles, generatedDirectories, generatedBytes = generate_tree(sourceDirectory, arguments.files, arguments.files_per_directory, maxSize=arguments.max_size)
+            print(f"Generated tree : {generatedFiles} files, {generatedDirectories} directories, {generatedBytes} bytes")
+
+        results = []
+
+        for script in arguments.scripts :
+
+            workDirectory = os.path.join(temporaryDirectory, "work")
+            targetDirectory = os.path.join(temporaryDirectory, "target")
+            os.makedirs(workDirectory)
+            os.makedirs(targetDirectory)
+
+            # First run with an empty destination and second run with the destination already synchronized
+            results.append((f"{script} (empty target)", count_syscalls(script, sourceDirectory, targetDirectory, workDirectory, arguments.script_arguments.split())))
+            results.append((f"{script} (synchronized target)", count_syscalls(script, sourceDirectory, targetDirectory, workDirectory, arguments.script_arguments.split())))
+
+            shutil.rmtree(workDirectory)
+            shutil.rmtree(targetDirectory)
+
+        print_report(results)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+""" TreeGenerator.py
+This script generates a synthetic directory tree to benchmark QuickFolderSynchro.
+The tree is deterministic: the same arguments and the same seed always generate the same directories, names, sizes, contents and modification times, so the measures of different versions of the script can be compared. """
+
+# TreeGenerator.py
+# This script generates a synthetic directory tree to benchmark QuickFolderSynchro.
+# The tree is deterministic: the same arguments and the same seed always generate the same directories, names, sizes, contents and modification times, so the measures of different versions of the script can be compared.
+# It can be used from the command line or imported by the benchmark scripts of this folder.
+# A generated tree can also be changed in a deterministic way (files modified, added and deleted), to measure the synchronization of a target that is already almost synchronized.
+
+# Imports...
+import sys
+import os
+import math
+import random
+import argparse
+
+
+# Fixed modification time of the generated files (2024-01-01 00:00:00 UTC), so that two generated trees have the same modification times
+BASE_MODIFICATION_TIME = 1704067200
+
+# Modification time of the files changed by apply_changes, later than those of any generated tree
+CHANGE_MODIFICATION_TIME = BASE_MODIFICATION_TIME + 100000000
+
+# Distributions of the sizes of the files:
+#   uniform    every size between minSize and maxSize is equally probable
+#   lognormal  most of the files are small and a few are large, as in real trees, the median is the geometric mean of minSize and maxSize
+SIZE_DISTRIBUTIONS = ("uniform", "lognormal")
+
+
+# Function that chooses the size of a file with the distribution given
+def choose_size(randomGenerator, sizeDistribution, minSize, maxSize) :
+    """ Returns a random size between minSize and maxSize """
+
+    if sizeDistribution == "lognormal" :
+        median = math.sqrt(max(minSize, 1) * max(maxSize, 1))
+        return min(maxSize, max(minSize, int(randomGenerator.lognormvariate(math.log(median), 1.5))))
+
+    return randomGenerator.randint(minSize, maxSize)
+
+
+# Function that generates the tree in the directory root, which is created if it does not exist
+# The files are distributed in directories of filesPerDirectory files, each directory has up to directoriesPerDirectory subdirectories, so the depth of the tree grows with the number of files
+# With maxDepth the directories of that depth (the root has depth 0) have no subdirectories, and once all the directories have their files the rest of the files are added to them again in rounds of filesPerDirectory files
+# The size of each file is chosen at random between minSize and maxSize bytes with the distribution sizeDistribution
+# It returns the number of files, the number of directories and the number of bytes generated
+def generate_tree(root, files, filesPerDirectory=100, directoriesPerDirectory=10, minSize=0, maxSize=4096, seed=0, maxDepth=None, sizeDistribution="uniform") :
+    """ Generates a deterministic tree of files and directories and returns (files, directories, bytes) """
+
+    randomGenerator = random.Random(seed)
+
+    # Block of random data from which the contents of the files are taken, it is much faster than generating random data for each file
+    dataBlock = randomGenerator.randbytes(max(maxSize, 1) * 2)
+
+    generatedFiles = 0
+    generatedDirectories = 0
+    generatedBytes = 0
+
+    # The directories are created breadth first, so the tree is as shallow as possible for the number of files
+    # Each pending directory has its depth, and the number of files of each directory is kept for the rounds that add files to the directories already created
+    pendingDirectories = [(root, 0)]
+    createdDirectories = []
+    directoryFiles = {}
+    os.makedirs(root, exist_ok=True)
+
+    while generatedFiles < files :
+
+        if not pendingDirectories :
+            # There are no more directories to create (maxDepth or no subdirectories), a new round of files is added to the directories created
+            if filesPerDirectory < 1 : break
+            pendingDirectories = [ (directory, None) for directory in createdDirectories ]
+
+        directory, depth = pendingDirectories.pop(0)
+        firstIndex = directoryFiles.get(directory, 0)
+
+        for index in range(firstIndex, firstIndex + min(filesPerDirectory, files - generatedFiles)) :
+
+            size = choose_size(randomGenerator, sizeDistribution, minSize, maxSize)
+            offset = randomGenerator.randint(0, len(dataBlock) - size)
+            path = os.path.join(directory, f"file{index:05d}.dat")
+
+            with open(path, 'wb') as file : file.write(dataBlock[offset:offset + size])
+            os.utime(path, (BASE_MODIFICATION_TIME, BASE_MODIFICATION_TIME + generatedFiles))
+
+            generatedFiles += 1
+            generatedBytes += size
+
+        directoryFiles[directory] = firstIndex + filesPerDirectory
+
+        # The directories of a new round (depth None) already have their subdirectories
+        if depth is None : continue
+        createdDirectories.append(directory)
+        if maxDepth is not None and depth >= maxDepth : continue
+
+        for index in range(directoriesPerDirectory) :
+
+            subdirectory = os.path.join(directory, f"dir{index:03d}")
+            os.mkdir(subdirectory)
+            pendingDirectories.append((subdirectory, depth + 1))
+            generatedDirectories += 1
+
+    return generatedFiles, generatedDirectories, generatedBytes
+
+
+# Function that changes a fraction changeRatio of the files of the tree in the directory root, to generate the new version of a tree already synchronized
+# Each file chosen is modified (new contents, size and a later modification time), deleted, or gets a new file next to it, with the same probability
+# The files are visited in the order of their names and the changes only depend on the tree and the seed, so the same tree is always changed in the same way
+# It returns the number of files modified, added and deleted
+def apply_changes(root, changeRatio, seed=1, minSize=0, maxSize=4096, sizeDistribution="uniform") :
+    """ Changes a deterministic fraction of the files of a tree and returns (modified, added, deleted) """
+
+    randomGenerator = random.Random(seed)
+    dataBlock = randomGenerator.randbytes(max(maxSize, 1) * 2)
+
+    # The changes are chosen before they are applied, so the files added are never visited
+    changes = []
+    for directory, subdirectories, fileNames in os.walk(root) :
+        subdirectories.sort()
+        for fileName in sorted(fileNames) :
+            if randomGenerator.random() < changeRatio : changes.append((os.path.join(directory, fileName), randomGenerator.choice(("modify", "add", "delete"))))
+
+    counts = { "modify": 0, "add": 0, "delete": 0 }
+
+    for path, change in changes :
+
+        if change == "delete" :
+            os.remove(path)
+        else :
+            if change == "add" : path = os.path.join(os.path.dirname(path), f"new{counts['add']:05d}.dat")
+            size = choose_size(randomGenerator, sizeDistribution, minSize, maxSize)
+            offset = randomGenerator.randint(0, len(dataBlock) - size)
+            with open(path, 'wb') as file : file.write(dataBlock[offset:offset + size])
+            os.utime(path, (CHANGE_MODIFICATION_TIME, CHANGE_MODIFICATION_TIME + sum(counts.values())))
+
+        counts[change] += 1
+
+    return counts["modify"], counts["add"], counts["delete"]
+
+
+
+# When it is executed from the command line the tree is generated and its size is printed, or with --change-ratio the tree already generated is changed
+if __name__ == "__main__" :
+
+    parser = argparse.ArgumentParser(description="Generates a deterministic tree of files to benchmark QuickFolderSynchro")
+    parser.add_argument("root", help="directory where the tree is generated")
+    parser.add_argument("--files", type=int, default=10000, help="number of files (default 10000)")
+    parser.add_argument("--files-per-directory", type=int, default=100, help="files in each directory (default 100)")
+    parser.add_argument("--directories-per-directory", type=int, default=10, help="subdirectories of each directory (default 10)")
+    parser.add_argument("--min-size", type=int, default=0, help="minimum size of the files in bytes (default 0)")
+    parser.add_argument("--max-size", type=int, default=4096, help="maximum size of the files in bytes (default 4096)")
+    parser.add_argument("--max-depth", type=int, help="maximum depth of the directories, the root has depth 0 (default no limit)")
+    parser.add_argument("--size-distribution", choices=SIZE_DISTRIBUTIONS, default="uniform", help="distribution of the sizes of the files (default uniform)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator (default 0)")
+    parser.add_argument("--change-ratio", type=float, help="instead of generating the tree, changes this fraction of the files of the tree already generated in root (modified, added or deleted), with --seed as seed of the changes")
+    arguments = parser.parse_args()
+
+    if arguments.change_ratio is not None :
+        modifiedFiles, addedFiles, deletedFiles = apply_changes(arguments.root, arguments.change_ratio, arguments.seed, arguments.min_size, arguments.max_size, arguments.size_distribution)
+        print(f"{modifiedFiles} files modified, {addedFiles} files added, {deletedFiles} files deleted in {arguments.root}")
+        sys.exit(0)
+
+    generatedFiles, generatedDirectories, generatedBytes = generate_tree(arguments.root, arguments.files, arguments.files_per_directory, arguments.directories_per_directory, arguments.min_size, arguments.max_size, arguments.seed, arguments.max_depth, arguments.size_distribution)
+    print(f"{generatedFiles} files, {generatedDirectories} directories, {generatedBytes} bytes generated in {arguments.root}")
+    sys.exit(0)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+""" CopyBackends.py
+This module copies the files for QuickFolderSynchro and its Basic, Advanced and Advanced Plus versions, with the fastest method that the filesystems of each pair of files support.
+The methods are tried in order: reflink, sparse copy, copy_file_range, sendfile and a buffered copy. """
+
+# CopyBackends.py
+# This module copies the files for QuickFolderSynchro and its Basic, Advanced and Advanced Plus versions, with the fastest method that the filesystems of each pair of files support.
+# The methods are tried in order: reflink, sparse copy, copy_file_range, sendfile and a buffered copy.
+# The versions import it from the parent folder, QuickFolderSynchro.py from its own folder, so it must be kept next to QuickFolderSynchro.py
+
+# Imports...
+import sys
+import os
+import errno
+import shutil
+
+# fcntl only exists in Unix, without it the files are not cloned with reflinks
+try :
+    import fcntl
+except ImportError :
+    fcntl = None
+
+
+# Request code of the FICLONE ioctl of Linux, the destination file shares the blocks of the source file (reflink) in btrfs, XFS and the other copy-on-write filesystems
+FICLONE = 0x40049409
+
+# Errors that mean that a copy method is not supported by the pair of files, then the next method is tried
+UNSUPPORTED_COPY_ERRORS = { errno.EXDEV, errno.ENOSYS, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EINVAL, errno.EBADF, errno.ENOTTY, errno.ETXTBSY }
+
+# Size of the blocks of the kernel copies and of the buffered copy
+# With a throttle the kernel copies are done in blocks of the size of the buffered copy, so that the limit is applied while a big file is copied
+KERNEL_COPY_BLOCK_SIZE = 1024 * 1024 * 1024
+BUFFERED_COPY_BLOCK_SIZE = 1024 * 1024
+
+
+# Throttle of the copies of the process, an object with the methods operation() and transfer(size), None without limits
+# QuickFolderSynchro sets it with --bwlimit and --opslimit
+ioThrottle = None
+
+
+# Function that sets the throttle of the copies of the process
+def set_throttle(throttle) :
+    """ Sets the throttle of the copies """
+
+    global ioThrottle
+    ioThrottle = throttle
+
+
+# Function that returns the size of the blocks of the kernel copies
+def kernel_copy_block_size() :
+    """ Returns the size of the blocks of the kernel copies """
+    return KERNEL_COPY_BLOCK_SIZE if ioThrottle is None else BUFFERED_COPY_BLOCK_SIZE
+
+
+# Function that counts the data written by a copy in the throttle of the process
+def throttle_transfer(size) :
+    """ Counts the data written in the throttle """
+    if ioThrottle is not None : ioThrottle.transfer(size)
+
+
+# Exception raised by a copy method that is not supported by the pair of files before copying anything
+class CopyMethodUnavailable(Exception) :
+    """ A copy method is not supported by the pair of files """
+
+
+# Copy method that clones the source file with the FICLONE ioctl, no data is copied, the blocks are shared until one of the files is modified
+def copy_with_reflink(sourceFile, targetFile) :
+    """ Clones a file with the FICLONE ioctl """
+
+    try :
+        fcntl.ioctl(targetFile.fileno(), FICLONE, sourceFile.fileno())
+    except OSError as error :
+        if error.errno in UNSUPPORTED_COPY_ERRORS : raise CopyMethodUnavailable() from error
+        raise
+
+
+# Copy method for the sparse files, the disk images and the preallocated databases, only the extents with data are copied and the holes are left in the destination file
+# The extents are found with SEEK_DATA and SEEK_HOLE, the files without holes are copied by the next methods
+def copy_with_holes(sourceFile, targetFile) :
+    """ Copies the data extents of a sparse file, leaving the holes """
+
+    sourceStat = os.fstat(sourceFile.fileno())
+    if sourceStat.st_blocks * 512 >= sourceStat.st_size : raise CopyMethodUnavailable()
+
+    offset = 0
+    while True :
+
+        try :
+            dataStart = os.lseek(sourceFile.fileno(), offset, os.SEEK_DATA)
+        except OSError as error :
+            if error.errno == errno.ENXIO : break
+            if offset == 0 and error.errno in UNSUPPORTED_COPY_ERRORS : raise CopyMethodUnavailable() from error
+            raise
+        dataEnd = os.lseek(sourceFile.fileno(), dataStart, os.SEEK_HOLE)
+
+        # The extent is copied inside the kernel if it is possible, otherwise through a buffer
+        while dataStart < dataEnd :
+            try :
+                copiedBytes = os.copy_file_range(sourceFile.fileno(), targetFile.fileno(), min(dataEnd - dataStart, kernel_copy_block_size()), dataStart, dataStart)
+            except (AttributeError, OSError) as error :
+                if isinstance(error, OSError) and error.errno not in UNSUPPORTED_COPY_ERRORS : raise
+                copiedBytes = os.pwrite(targetFile.fileno(), os.pread(sourceFile.fileno(), min(dataEnd - dataStart, BUFFERED_COPY_BLOCK_SIZE), dataStart), dataStart)
+            if copiedBytes == 0 : break
+            dataStart += copiedBytes
+            throttle_transfer(copiedBytes)
+
+        offset = dataEnd
+
+    # The hole at the end of the file is created by setting its size
+    os.ftruncate(targetFile.fileno(), sourceStat.st_size)
+
+
+# Copy method that copies the data inside the kernel with copy_file_range, the filesystem can copy it without reading it (NFS, SMB) or share the blocks
+def copy_with_copy_file_range(sourceFile, targetFile) :
+    """ Copies a file with os.copy_file_range """
+
+    offset = 0
+    while True :
+        try :
+            copiedBytes = os.copy_file_range(sourceFile.fileno(), targetFile.fileno(), kernel_copy_block_size(), offset, offset)
+        except OSError as error :
+            if offset == 0 and error.errno in UNSUPPORTED_COPY_ERRORS : raise CopyMethodUnavailable() from error
+            raise
+        if copiedBytes == 0 : break
+        offset += copiedBytes
+        throttle_transfer(copiedBytes)
+
+
+# Copy method that copies the data inside the kernel with sendfile, without copying it to the memory of the process
+def copy_with_sendfile(sourceFile, targetFile) :
+    """ Copies a file with os.sendfile """
+
+    offset = 0
+    while True :
+        try :
+            copiedBytes = os.sendfile(targetFile.fileno(), sourceFile.fileno(), offset, kernel_copy_block_size())
+        except OSError as error :
+            if offset == 0 and error.errno in UNSUPPORTED_COPY_ERRORS : raise CopyMethodUnavailable() from error
+            raise
+        if copiedBytes == 0 : break
+        offset += copiedBytes
+        throttle_transfer(copiedBytes)
+
+
+# Copy method that reads and writes the data through a buffer of the process, it is supported everywhere
+def copy_with_buffer(sourceFile, targetFile) :
+    """ Copies a file through a buffer """
+
+    buffer = bytearray(BUFFERED_COPY_BLOCK_SIZE)
+    view = memoryview(buffer)
+    while True :
+        readBytes = sourceFile.readinto(buffer)
+        if not readBytes : break
+        targetFile.write(view[:readBytes])
+        throttle_transfer(readBytes)
+
+
+# Copy methods in the order they are tried, only the ones that exist in this platform
+# A reflink keeps the holes of the sparse files, the other methods would fill them with zeros
+COPY_METHODS = tuple((name, method) for name, method, isAvailable in (
+    ( "reflink", copy_with_reflink, fcntl is not None and sys.platform.startswith("linux") ),
+    ( "sparse copy", copy_with_holes, hasattr(os, "SEEK_DATA") ),
+    ( "copy_file_range", copy_with_copy_file_range, hasattr(os, "copy_file_range") ),
+    ( "sendfile", copy_with_sendfile, hasattr(os, "sendfile") and sys.platform.startswith("linux") ),
+    ( "buffered copy", copy_with_buffer, True ) ) if isAvailable)
+
+
+# Function that copies a file from the source directory to the destination directory, with its metadata
+# The copy methods are tried in order until one of them is supported by the pair of files, so the fastest method of each filesystem is used
+# It returns the description of the copy written in the log file, with the method used
+def copy_file(sourcePath, targetPath, methods=COPY_METHODS) :
+    """ Copies a file with its metadata and returns the description of the copy """
+
+    if ioThrottle is not None : ioThrottle.operation()
+
+    with open(sourcePath, 'rb') as sourceFile, open(targetPath, 'wb') as targetFile :
+
+        for name, method in methods :
+            try :
+                method(sourceFile, targetFile)
+                break
+            except CopyMethodUnavailable :
+                continue
+        else :
+            raise CopyMethodUnavailable(f"No copy method supports the copy of {sourcePath} to {targetPath}")
+
+    shutil.copystat(sourcePath, targetPath)
+
+    return f"copied with {name}"
@@ -20,12 +20,37 @@ The script is designed to be run on Windows and Linux, and it uses the same code
 # Imports...  psutil must be installed by pip install psutil
 import sys
 import os
+import io
+import time
+import errno
+import ctypes
+import ctypes.util
+import zlib
+import mmap
+import struct
+import select
+import hashlib
+import json
+import functools
+import contextlib
 import shutil
-import subprocess
 import signal
+import queue
+import sqlite3
+import argparse
+import heapq
+import pstats
+import cProfile
+import threading
+import multiprocessing
+import concurrent.futures
 import psutil
 from pathlib import Path
 
+# The copy methods of the files are shared with the Basic, Advanced and Advanced Plus versions
+import CopyBackends
+from CopyBackends import BUFFERED_COPY_BLOCK_SIZE, copy_file, throttle_transfer
+
 
 #Base exception for the application errors.
 class AppError(Exception):
@@ -162,381 +187,3004 @@ def signal_handler(sig, frame, isRecursiveExecution, sourceDirectory):
 
 
 
-# From here the script's task is carried out
-# All the code will be inside a try block, so that if any command fails, the error is handled eficiently
-try :
 
-    # LOGFILE and LOGERRORFILE are the name of the file where the logs will be stored, it is created in the current directory and overwritten if it already exists
-    # Taking from the script name changing the extension to .log; the error file adds the string Error to the file name
-    base_name, _ = os.path.splitext(Path(sys.argv[0]))
-    LOGFILE = f"{base_name}.log"
-    LOGERRORFILE = f"{base_name}Error.log"
+# Names of the statistics kept for every synchronized directory, they are the same counters that the script has always printed at the end of each directory
+# They are grouped in a dictionary so that the statistics of a directory can be returned by the function that synchronizes it and accumulated for the whole tree
+STATISTICS_NAMES = ( "foundFilesAndDir", "foundFiles", "foundDirectories",
+                     "copiedFoundFiles", "notCopiedFoundFiles", "copiedNotFoundFiles",
+                     "targetFoundFilesAndDir", "targetFoundFiles", "targetFoundDirectories",
+                     "targetFoundFilesNotInSource", "targetFoundDirNotInSource", "targetDeletedFilesAndDir",
+                     "targetRenamedFilesAndDir", "linkedFiles",
+                     "smallLaneFiles", "smallLaneBytes", "smallLaneSeconds", "smallLaneMaxQueue",
+                     "largeLaneFiles", "largeLaneBytes", "largeLaneSeconds", "largeLaneMaxQueue" )
 
-    # We initialize the variable that will hold the new environment with our custom brand name, which is used to check if the script is being executed recursively. 
-    new_env = None
+# Statistics that keep the maximum value of the directories instead of their sum
+MAXIMUM_STATISTICS_NAMES = ( "smallLaneMaxQueue", "largeLaneMaxQueue" )
 
-    # Our custom brand name to check if the script is being executed recursively, it is stored in an environment variable that we will check at the beginning of the script
-    VAR_RECURSION = "QUICKFOLDERSYNCHRO_RECURSION"
-    # Boolean variable to indicate if the script is being executed recursively, it is initialized to False and will be set to True if the environment variable is detected
-    isRecursiveExecution = False
 
-    # If the environment variable is not detected, it means that we are in the parent execution of the script, and we need to create a new environment with our custom brand name to pass it to the child executions of the script. 
-    # If the environment variable is detected, it means that we are in a child execution of the script
-    if not os.environ.get(VAR_RECURSION) == "1":
+# Function that creates the dictionary of statistics of a directory, with all the counters initialized to zero
+def new_statistics() :
+    """ Creates the dictionary of statistics of a directory, with all the counters initialized to zero """
+    return dict.fromkeys(STATISTICS_NAMES, 0)
 
-        # We created a copy of the current environment and added our branding.
-        new_env = os.environ.copy()
-        new_env[VAR_RECURSION] = "1"
 
-        # the father process creates the logs files
-        try :
-            with open(LOGFILE, 'w') : pass
-            with open(LOGERRORFILE, 'w') : pass
-        except Exception as error : general_exception_handler("Continuing without creating or resetting log files : " + error)
-            
+# Function that adds the statistics of a directory to the accumulated statistics of the tree
+def add_statistics(totalStatistics, statistics) :
+    """ Adds the statistics of a directory to the accumulated statistics of the tree """
 
-    # We set the boolean variable to indicate that we are in a recursive execution
-    else : isRecursiveExecution = True
+    for name in STATISTICS_NAMES :
+        if name in MAXIMUM_STATISTICS_NAMES : totalStatistics[name] = max(totalStatistics[name], statistics[name])
+        else : totalStatistics[name] += statistics[name]
 
 
-    # Variables for task statistics
+# Function that writes in the log file the statistics of the source directory and of the target directory
+# The text is the same that the script has always written at the end of each directory, so the log file keeps its format
+def write_source_statistics(file, sourceDirectory, statistics) :
+    """ Writes in the log file the statistics of the source directory """
+    file.write(f"\nSTATISTICS FOR {sourceDirectory} : \n")
+    file.write(f"Number of total items found in source directory: {statistics['foundFilesAndDir']}\n")
+    file.write(f"Number of files found in source directory: {statistics['foundFiles']}\n")
+    file.write(f"Number of directories found in source directory: {statistics['foundDirectories']}\n")
+    file.write(f"Number of source files found in target directory: {statistics['copiedFoundFiles'] + statistics['notCopiedFoundFiles']}\n")
+    file.write(f"Number of source files copied to target directory: {statistics['copiedFoundFiles'] + statistics['copiedNotFoundFiles']}\n")
+    file.write(f"Number of source files found in target not copied to target directory: {statistics['notCopiedFoundFiles']}\n")
+    if statistics["linkedFiles"] > 0 : file.write(f"Number of source files hard linked in target directory: {statistics['linkedFiles']}\n")
 
-    # In source Directory
-    foundFilesAndDir=0
-    foundFiles=0
-    foundDirectories=0
 
-    # In source Directory and target directory
-    copiedFoundFiles=0
-    notCopiedFoundFiles=0
-    copiedNotFoundFiles=0
+def write_target_statistics(file, targetDirectory, statistics) :
+    """ Writes in the log file the statistics of the target directory """
+    file.write(f"\nSTATISTICS FOR {targetDirectory} : \n")
+    file.write(f"Total files and directories in target directory: {statistics['targetFoundFilesAndDir']}\n")
+    file.write(f"Files found in target directory: {statistics['targetFoundFiles']}\n")
+    file.write(f"Directories found in target directory: {statistics['targetFoundDirectories']}\n")
+    file.write(f"Files found in target directory but not in source directory then deleted : {statistics['targetFoundFilesNotInSource']}\n")
+    file.write(f"Directories found in target directory but not in source directory then deleted : {statistics['targetFoundDirNotInSource']}\n")
+    file.write(f"Files and directories deleted from source directory: {statistics['targetDeletedFilesAndDir']}\n")
+    if statistics["targetRenamedFilesAndDir"] > 0 : file.write(f"Files and directories renamed in target directory: {statistics['targetRenamedFilesAndDir']}\n")
 
-    # In target Directory
-    targetFoundFilesAndDir=0
-    targetFoundFiles=0
-    targetFoundDirectories=0
 
-    # In target Directory but not in source Directory
-    targetFoundFilesNotInSource=0
-    targetFoundDirNotInSource=0
-    targetDeletedFilesAndDir=0    
+# Function that writes in the log file the statistics of the copy lanes of --large-file-mb: the files and bytes copied by each lane, its throughput while it had copies in flight and its maximum queue depth
+# With --jobs the seconds of the lanes of all the processes are added, so the throughput is the one of a lane of a process
+def write_lane_statistics(file, statistics) :
+    """ Writes in the log file the statistics of the copy lanes """
 
-    #The LOGFILE file is opened for writing during execution
-    with open(LOGFILE, 'a') as file :
+    for lane in ("small", "large") :
+        seconds = statistics[f"{lane}LaneSeconds"]
+        throughput = statistics[f"{lane}LaneBytes"] / seconds / (1024 * 1024) if seconds > 0 else 0
+        file.write(f"Files copied by the {lane} files lane: {statistics[f'{lane}LaneFiles']} ({statistics[f'{lane}LaneBytes']} bytes in {seconds:.2f} seconds busy, {throughput:.2f} MB/s), maximum queue depth: {statistics[f'{lane}LaneMaxQueue']}\n")
 
-        # Wrong arguments...
-        if not isRecursiveExecution and len(sys.argv) != 3 :
-            errorCode = 1
-            errorText = "Wrong arguments"
-            raise AppError(errorText, errorCode)
-        
-        # The source and target directories are extracted from the command line arguments, and they are stored in variables for later use. 
-        # These variables are used throughout the script to refer to the source and target directories, and they are also used in the log messages to indicate which directories are being processed. 
-        # This way, we can keep track of the source and target directories throughout the script, and we can provide useful information to the user about which directories are being processed at each step of the synchronization process.
-        sourceDirectory = sys.argv[1]
-        targetDirectory = sys.argv[2]
-
-        # Showing the source and target directories
-        # print("SOURCE Directory :", sourceDirectory)
-        file.write("SOURCE Directory : " + sourceDirectory + "\n")
-        # print("TARGET Directory :", targetDirectory)
-        file.write("TARGET Directory : " + targetDirectory + "\n")
-
-        # Setting the signal handler function, passing him whether we are in the father or in one of its child processes and the sourceDirectory managed by the process
-        signal.signal(signal.SIGTERM, lambda s, f: signal_handler(s, f, isRecursiveExecution, sourceDirectory))
-        signal.signal(signal.SIGINT, lambda s, f: signal_handler(s, f, isRecursiveExecution, sourceDirectory))
-        
-        # It is detected that we are in the father process
-        if not isRecursiveExecution :
 
-            # We request confirmation that the destination directory is correct.
-            resp = input(f"Confirm that {targetDirectory} is correct? Answer Yes to continue, No to cancel : ");
-            while resp != "Yes" :
-                if resp == "No" : 
-                    errorCode = 2
-                    errorText = "Aborted by the user does not confirm that the destination directory is correct."
-                    raise AppError(errorText, errorCode)
-                resp = input(f"Confirm that {targetDirectory} is correct? Answer Yes to continue, No to cancel : ")
+# Files with square brackets cause problems, so they are replaced with hyphens
+SQUARE_BRACKETS_TABLE = str.maketrans("[]", "--")
 
-        # The source directory does not exist.
-        if not os.path.exists(sourceDirectory) :
-            # If the source directory does not exist, we print an error message and raise an exception with an appropriate error code, since the synchronization process cannot continue if the source directory does not exist, and it is important to provide useful information to the user about what went wrong, so that they can fix the problem and run the script again successfully.
-            errorCode = 3
-            errorText = f"The source directory {sourceDirectory} does not exist" 
-            raise AppError(errorText, errorCode)
-        
-        # The destination directory does not exist.
-        if not os.path.exists(targetDirectory) :
 
-            if isRecursiveExecution :
+# Function that lists a directory with os.scandir and returns its entries sorted by name
+# Each DirEntry knows if it is a directory without another system call on most filesystems, and it keeps the result of its stat, so the size and the modification time are obtained with a single stat per entry
+def scan_directory(directory) :
+    """ Lists a directory and returns its DirEntry objects sorted by name """
+    with os.scandir(directory) as iterator :
+        return sorted(iterator, key=lambda entry : entry.name)
 
-                # If the destination directory does not exist, we print a message indicating that it does not exist and that it is being created, both in the console and in the log file, and then we create the destination directory, since it is necessary for the synchronization process to continue, and it is better to create the destination directory if it does not exist than to raise an error and stop the synchronization process
-                print(f"The destination directory {targetDirectory} does not exist, it is created")
-                file.write(f"\nThe destination directory {targetDirectory} does not exist, it is created\n")
-                os.mkdir(targetDirectory)
 
-            else :
 
-                # If the destination directory does not exist, we print an error message and raise an exception with an appropriate error code, since the synchronization process cannot continue if the destination directory does not exist, and it is important to provide useful information to the user about what went wrong, so that they can fix the problem and run the script again successfully.
-                errorCode = 4
-                errorText = f"The destination directory {targetDirectory} does not exist" 
-                raise AppError(errorText, errorCode)
-        
-        # print(f"\nSEARCHING FOR FILES IN {sourceDirectory} :" )
-        file.write(f"\nSEARCHING FOR FILES IN {sourceDirectory} : \n")
+# Function that traverses together the entries of the source directory and the entries of the destination directory, both sorted by name, as a merge join
+# It yields (sourceEntry, targetEntry) for each name, with None in the side where the name does not exist
+# The name of a source entry is compared without square brackets, since it is renamed that way before being copied, so the source entries must be sorted by that name
+def merge_entries(sourceEntries, targetEntries) :
+    """ Yields (sourceEntry, targetEntry) for each name of the two sorted listings, with None in the side where it does not exist """
+
+    sourceIndex = 0
+    targetIndex = 0
+
+    while sourceIndex < len(sourceEntries) or targetIndex < len(targetEntries) :
+
+        sourceName = sourceEntries[sourceIndex].name.translate(SQUARE_BRACKETS_TABLE) if sourceIndex < len(sourceEntries) else None
+        targetName = targetEntries[targetIndex].name if targetIndex < len(targetEntries) else None
 
-        # If there are no files in the source directory, we print a message and skip to the next step, which is to check the destination directory for files that do not exist in the source directory. 
-        # Otherwise, we continue with the synchronization process. 
-        if len(os.listdir(sourceDirectory)) == 0 :
+        if targetName is None or (sourceName is not None and sourceName < targetName) :
+            yield sourceEntries[sourceIndex], None
+            sourceIndex += 1
 
-            #print(f"There are no files in {sourceDirectory} :" )
-            file.write(f"There are no files in {sourceDirectory} : \n")     
+        elif sourceName is None or sourceName > targetName :
+            yield None, targetEntries[targetIndex]
+            targetIndex += 1
 
         else :
+            yield sourceEntries[sourceIndex], targetEntries[targetIndex]
+            sourceIndex += 1
+            targetIndex += 1
 
-            # For each file item in source directory
-            for fileItem in sorted(os.listdir(sourceDirectory)) :
 
-                try :
 
-                    # Incrementing the total number of files and directories found in the source directory, including directories, which will be processed later in the script. 
-                    # This variable is used for statistics at the end of the script.
-                    foundFilesAndDir += 1
-
-                    # For each SOURCE file, the name, size, and modification date are extracted.
-                    sourceName = fileItem
-                    sourcePath = os.path.join(sourceDirectory, sourceName)
-                    sourceFileSize = os.path.getsize(sourcePath)
-                    sourceFileModificationTime = os.path.getmtime(sourcePath)
-
-                    # Files with square brackets cause problems, so they are replaced with hyphens. also applies to directories, since they will be processed later in the script, and if they have square brackets, they will cause problems when trying to access them. 
-                    # This is done before processing the files, so we are sure that all the files and directories that we process do not have square brackets, and we do not have to worry about them later in the script. 
-                    # If we did this after processing the files, we would have to worry about files and directories with square brackets that we have already processed, which would complicate the script and make it less efficient.
-                    table = str.maketrans("[]", "--")
-                    sourceNameModified = sourceName.translate(table)
-                    if sourceName != sourceNameModified :
-                        print(f"File {sourceName} contains square brackets, it is renamed to {sourceNameModified}")
-                        file.write(f"File {sourceName} contains square brackets, it is renamed to {sourceNameModified}\n")
-                        os.rename(sourcePath, os.path.join(sourceDirectory, sourceNameModified))
-                        sourceName = sourceNameModified
-                        sourcePath = os.path.join(sourceDirectory, sourceName)
-
-                    # The path of the file in the destination directory is constructed, and it is checked if it exists. 
-                    # If it exists, the number of files found in the destination directory is incremented, and its size and modification date are compared with those of the source file. 
-                    # If they are the same, it is not copied, and the number of files not copied is incremented. 
-                    # If they are different, it is copied, and the number of files copied is incremented. 
-                    # If it does not exist, it is copied, and the number of files copied is incremented.
-                    targetPath = os.path.join(targetDirectory, sourceName)
-
-                    # If the file is not a directory, otherswise it will be processed later in the script
-                    if not os.path.isdir(sourcePath) :
-
-                        # Incrementing the number of files found in the source directory, excluding directories, this variable is used for statistics at the end of the script.
-                        foundFiles += 1
-
-                        # If the file exists in the destination directory, we check if it has the same size and modification date as the source file. 
-                        # If it does, it is not copied. 
-                        # If it does not, it is copied. 
-                        # In both cases, a message is printed indicating what happened, and the corresponding statistics are updated.
-                        if os.path.exists(targetPath) :  
-
-                            # If the file exists in the destination directory...
-                            targetFileSize = os.path.getsize(targetPath)
-                            targetFileModificationTime = os.path.getmtime(targetPath)
-
-                            # If the file exists in the destination directory and has the same size and modification date as the source file...
-                            if sourceFileSize == targetFileSize and sourceFileModificationTime == targetFileModificationTime :
-
-                                #print(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory with the same size and modification time, it is not copied")
-                                file.write(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory with the same size and modification time, it is not copied\n")
-                                notCopiedFoundFiles += 1
+# Class that limits a rate with a token bucket: the tokens are refilled at rate per second up to the rate of one second, and a caller that takes more tokens than there are waits until the debt is refilled
+# It is shared by the threads of the process
+class TokenBucket :
+    """ Token bucket that limits a rate per second """
 
-                            else :
+    def __init__(self, rate) :
+        self.rate = rate
+        self.tokens = rate
+        self.lastTime = time.monotonic()
+        self.lock = threading.Lock()
 
-                                # The file exists in the destination directory but has a different size or modification date...
-                                print(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory but with different size or modification time, it is copied")
-                                file.write(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory but with different size or modification time, it is copied\n")
-                                shutil.copy2(sourcePath, targetPath)
-                                copiedFoundFiles += 1
+    # Method that takes an amount of tokens, waiting if the bucket does not have them
+    def acquire(self, amount) :
+        """ Takes an amount of tokens, waiting until the rate allows it """
 
-                        else :
+        with self.lock :
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.lastTime) * self.rate) - amount
+            self.lastTime = now
+            waitTime = -self.tokens / self.rate if self.tokens < 0 else 0
 
-                            # The file does not exist in the destination directory, it is copied, and a message is printed indicating that it does not exist in the destination directory, so it is copied. 
-                            print(f"{sourceDirectory.upper()} : File {sourcePath} does not exist in the destination directory, it is copied")
-                            file.write(f"{sourceDirectory.upper()} : File {sourcePath} does not exist in the destination directory, it is copied\n")
-                            shutil.copy2(sourcePath, targetPath)
-                            copiedNotFoundFiles += 1
-                    
-                    # Incrementing the number of directories found in the source directory, excluding files, this variable is used for statistics at the end of the script.
-                    else : foundDirectories += 1
-
-                except AppError as error :
-                    AppError_handler(error)
-                    continue
-                
+        if waitTime > 0 : time.sleep(waitTime)
+
+
+# Class that applies the limits of --bwlimit and --opslimit to the copies and the deletions of the process
+# Each process of the pool gets its share of the limits, so the limits apply to the whole run
+class IOThrottle :
+    """ Limits of bytes per second and operations per second of the process """
+
+    def __init__(self, bytesPerSecond, operationsPerSecond) :
+        self.bytesBucket = TokenBucket(bytesPerSecond) if bytesPerSecond else None
+        self.operationsBucket = TokenBucket(operationsPerSecond) if operationsPerSecond else None
+
+    # Method called before each copy or deletion of a file or directory
+    def operation(self) :
+        if self.operationsBucket is not None : self.operationsBucket.acquire(1)
+
+    # Method called after each block of data written
+    def transfer(self, size) :
+        if self.bytesBucket is not None : self.bytesBucket.acquire(size)
+
+
+# Throttle of the copies and the deletions of the process, None without --bwlimit and --opslimit
+ioThrottle = None
+
+
+# Function that sets the throttle of the process from the options, the limits are shared by the processes of the pool
+def set_io_throttle(options) :
+    """ Sets the throttle of the copies and the deletions of the process """
+
+    global ioThrottle
+    if options.bwlimit is None and options.opslimit is None : return
+    ioThrottle = IOThrottle(options.bwlimit * 1024 * 1024 / options.jobs if options.bwlimit else None, options.opslimit / options.jobs if options.opslimit else None)
+    CopyBackends.set_throttle(ioThrottle)
+
+
+# Function that deletes a file, counted in the throttle of the process
+# With directoryDescriptor the path is relative to that directory (unlinkat), so its full path is not resolved again
+def remove_file(path, directoryDescriptor=None) :
+    """ Deletes a file """
+
+    if ioThrottle is not None : ioThrottle.operation()
+    os.unlink(path, dir_fd=directoryDescriptor)
+
+
+# Function that deletes an empty directory, counted in the throttle of the process
+# A symbolic link to a directory is listed as a directory, it is deleted as a file
+# It returns True if a directory was deleted and False if it was a symbolic link
+def remove_directory(path, directoryDescriptor=None) :
+    """ Deletes an empty directory and returns True, or a symbolic link and returns False """
+
+    if ioThrottle is not None : ioThrottle.operation()
+    try :
+        os.rmdir(path, dir_fd=directoryDescriptor)
+        return True
+    except NotADirectoryError :
+        os.unlink(path, dir_fd=directoryDescriptor)
+        return False
+
+
+# The deletion engine needs os.fwalk and the functions relative to a directory descriptor (unlinkat, Linux and the other POSIX systems), otherwise the directories are deleted by their paths
+IS_FD_DELETION_SUPPORTED = hasattr(os, "fwalk") and os.unlink in os.supports_dir_fd and os.rmdir in os.supports_dir_fd and os.scandir in os.supports_fd
+
+# Flags of the directories opened by the deletion engine, a symbolic link is never followed out of the deleted tree
+DIRECTORY_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_NOFOLLOW", 0)
+
+
+# Class that deletes the directories of the destination directory that do not exist in the source directory, replacing shutil.rmtree
+# The files of the directory are deleted relative to its descriptor, and each of its subdirectories is deleted by a thread of the pool with os.fwalk from the bottom up, so the deletions of the subtrees progress at the same time and no full path is resolved for each file
+# It returns the number of files and directories deleted, so the statistics count all the contents of the deleted directory and not only the directory itself
+class TreeRemover :
+    """ Deletes directories and all their contents in a pool of threads """
+
+    def __init__(self, threads) :
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads) if threads > 1 and IS_FD_DELETION_SUPPORTED else None
+
+    # Method that deletes a directory and all its contents, it returns the number of files and directories deleted, the directory included
+    def remove(self, path) :
+        """ Deletes a directory and all its contents and returns (files, directories) deleted """
+
+        if not IS_FD_DELETION_SUPPORTED : return self._remove_by_path(path)
+
+        deletedFiles = 0
+        deletedDirectories = 0
+        subdirectories = []
+
+        directoryDescriptor = os.open(path, DIRECTORY_OPEN_FLAGS)
+        try :
+
+            with os.scandir(directoryDescriptor) as entries :
+                for entry in entries :
+                    if entry.is_dir(follow_symlinks=False) : subdirectories.append(entry.name)
+                    else :
+                        remove_file(entry.name, directoryDescriptor)
+                        deletedFiles += 1
+
+            # The subtrees are deleted in parallel, the first error is raised once all of them have finished
+            if self.executor is not None and len(subdirectories) > 1 :
+                futures = [ self.executor.submit(self._remove_subtree, name, directoryDescriptor) for name in subdirectories ]
+                concurrent.futures.wait(futures)
+                results = [ future.result() for future in futures ]
+            else : results = [ self._remove_subtree(name, directoryDescriptor) for name in subdirectories ]
+
+        finally :
+            os.close(directoryDescriptor)
+
+        for subtreeFiles, subtreeDirectories in results :
+            deletedFiles += subtreeFiles
+            deletedDirectories += subtreeDirectories
+
+        remove_directory(path)
+
+        return deletedFiles, deletedDirectories + 1
+
+    # Method that deletes a subdirectory of a directory opened by its descriptor, from the bottom up
+    def _remove_subtree(self, name, parentDescriptor) :
+        deletedFiles = 0
+        deletedDirectories = 0
+
+        for _, directoryNames, fileNames, directoryDescriptor in os.fwalk(name, topdown=False, dir_fd=parentDescriptor) :
+            for fileName in fileNames : remove_file(fileName, directoryDescriptor)
+            deletedFiles += len(fileNames)
+            for directoryName in directoryNames :
+                if remove_directory(directoryName, directoryDescriptor) : deletedDirectories += 1
+                else : deletedFiles += 1
+
+        remove_directory(name, parentDescriptor)
+        return deletedFiles, deletedDirectories + 1
+
+    # Method that deletes a directory by the paths of its contents, when the system does not have the functions relative to a directory descriptor
+    def _remove_by_path(self, path) :
+        deletedFiles = 0
+        deletedDirectories = 0
+
+        for directory, directoryNames, fileNames in os.walk(path, topdown=False) :
+            for fileName in fileNames : remove_file(os.path.join(directory, fileName))
+            deletedFiles += len(fileNames)
+            for directoryName in directoryNames :
+                if remove_directory(os.path.join(directory, directoryName)) : deletedDirectories += 1
+                else : deletedFiles += 1
+
+        remove_directory(path)
+        return deletedFiles, deletedDirectories + 1
+
+    # Method that finishes the threads of the pool
+    def shutdown(self) :
+        if self.executor is not None : self.executor.shutdown(wait=True)
+
+
+
+# Class that moves the entries of the destination directory that do not exist in the source directory to the trash directory of the run with the --trash option, instead of deleting them
+# The trash directory is inside the destination directory, so an entry is renamed into it without copying anything however big it is, and it keeps the path it had in the destination directory, so it can be restored by hand
+# An entry in another filesystem (a mount point under the destination directory) cannot be renamed, it is deleted as without --trash
+# With --trash purge, a thread of the process deletes the entries as they are moved, out of the loop of the directories; with --trash keep they are kept until the next run
+class TrashDirectory :
+    """ Trash directory of the run, the obsolete entries of the destination directory are renamed into it """
+
+    def __init__(self, path, targetRoot, treeRemover, isPurged) :
+        self.path = path
+        self.targetRoot = targetRoot
+        self.treeRemover = treeRemover
+        self.purgeQueue = queue.Queue() if isPurged else None
+        self.purgeThread = None
+        if isPurged :
+            self.purgeThread = threading.Thread(target=self._purge, daemon=True)
+            self.purgeThread.start()
+
+    # Method that moves an entry of the destination directory to the trash, it returns its path in the trash, or None if the entry is in another filesystem
+    def move(self, targetPath) :
+        """ Renames an entry of the destination directory into the trash and returns its new path """
+
+        trashPath = os.path.join(self.path, os.path.relpath(targetPath, self.targetRoot))
+
+        # An entry with the same path may have been moved before in this run, with --watch
+        if os.path.lexists(trashPath) : trashPath = f"{trashPath}.{time.time_ns()}"
+
+        if ioThrottle is not None : ioThrottle.operation()
+        os.makedirs(os.path.dirname(trashPath), exist_ok=True)
+        try :
+            os.rename(targetPath, trashPath)
+        except OSError as error :
+            if error.errno == errno.EXDEV : return None
+            raise
+
+        if self.purgeQueue is not None : self.purgeQueue.put(trashPath)
+        return trashPath
+
+    # Method of the purge thread, it deletes the entries moved to the trash until it receives None
+    def _purge(self) :
+        while True :
+            trashPath = self.purgeQueue.get()
+            if trashPath is None : return
+            try :
+                if os.path.isdir(trashPath) and not os.path.islink(trashPath) : self.treeRemover.remove(trashPath)
+                else : remove_file(trashPath)
+            except Exception as error :
+                general_exception_handler(error)
+
+    # Method that waits until the purge thread has deleted the entries moved to the trash
+    def close(self) :
+        if self.purgeThread is not None :
+            self.purgeQueue.put(None)
+            self.purgeThread.join()
+
+
+# Function that deletes the trash directories of the previous runs of --trash, kept in the destination directory, except the one of this run
+# It is run by a thread while the tree is synchronized, and the trash directory is deleted if it is left empty
+# It returns the number of files and directories deleted
+def purge_trash(trashRoot, currentTrash, threads) :
+    """ Deletes the trash directories of the previous runs and returns (files, directories) deleted """
+
+    treeRemover = TreeRemover(threads)
+    deletedFiles = 0
+    deletedDirectories = 0
+
+    for entry in scan_directory(trashRoot) :
+        if entry.path == currentTrash : continue
+        try :
+            if entry.is_dir(follow_symlinks=False) :
+                trashFiles, trashDirectories = treeRemover.remove(entry.path)
+                deletedFiles += trashFiles
+                deletedDirectories += trashDirectories
+            else :
+                remove_file(entry.path)
+                deletedFiles += 1
+        except Exception as error :
+            general_exception_handler(error)
+
+    treeRemover.shutdown()
+
+    try :
+        os.rmdir(trashRoot)
+    except OSError :
+        pass
+
+    return deletedFiles, deletedDirectories
+
+
+# Function that returns the temporary name of the copy of a file, in the same directory so that it is renamed to the file without copying it again
+def temporary_path(targetPath) :
+    """ Returns the temporary name of the copy of a file """
+    return targetPath + ".QuickFolderSynchro.part"
+
+
+# Function that returns the temporary name of a file rebuilt by the delta transfer, in the same directory so that it is renamed to the file
+def rebuilt_path(targetPath) :
+    """ Returns the temporary name of a file rebuilt by the delta transfer """
+    return targetPath + ".QuickFolderSynchro.delta"
+
+
+# Function that copies a file to its temporary name and renames it to the file once the copy is complete, the destination file is never left half copied
+# It is used by the --checkpoint option, an interrupted copy leaves the previous version of the file and a temporary file that the next run with --resume deletes
+def copy_file_to_temporary(sourcePath, targetPath) :
+    """ Copies a file through its temporary name and returns the description of the copy """
+
+    temporaryPath = temporary_path(targetPath)
+    try :
+        description = copy_file(sourcePath, temporaryPath)
+        os.replace(temporaryPath, targetPath)
+    except BaseException :
+        if os.path.exists(temporaryPath) : os.remove(temporaryPath)
+        raise
+
+    return description
+
+
+# The C library, loaded the first time a filesystem is flushed with syncfs
+libc = None
+
+
+# Function that flushes to the disk the filesystem of a directory, with syncfs in Linux and sync in the other POSIX systems
+# It returns False if the system cannot flush the filesystems (Windows), then each file must be flushed with fsync
+def sync_filesystem(directory) :
+    """ Flushes to the disk the filesystem of a directory """
+
+    global libc
+
+    if sys.platform.startswith("linux") :
+        if libc is None : libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        directoryDescriptor = os.open(directory, os.O_RDONLY)
+        try :
+            if libc.syncfs(directoryDescriptor) != 0 :
+                errorNumber = ctypes.get_errno()
+                raise OSError(errorNumber, os.strerror(errorNumber), directory)
+        finally :
+            os.close(directoryDescriptor)
+        return True
+
+    if hasattr(os, "sync") :
+        os.sync()
+        return True
+
+    return False
+
+
+# Function that flushes to the disk a file or a directory with fsync
+def fsync_path(path, flags=os.O_RDWR) :
+    """ Flushes a file or a directory to the disk """
+
+    fileDescriptor = os.open(path, flags)
+    try :
+        os.fsync(fileDescriptor)
+    finally :
+        os.close(fileDescriptor)
+
+
+# Levels of the --durability option:
+#   none    the copies are not flushed to the disk, the operating system writes them when it decides, as the script has always done
+#   batch   the files are copied to temporary names, and once per --sync-batch files or per directory the filesystem is flushed with syncfs and then the files are renamed, so a file is never renamed before its data is on the disk
+#   strict  the files are copied to temporary names, each one is flushed with fsync before it is renamed and its directory is flushed after the rename
+DURABILITY_LEVELS = ("none", "batch", "strict")
+
+
+# Class that copies the files with the durability of the levels batch and strict of the --durability option
+# With batch the renames of the copies are kept until the batch is full or its directory has been copied, then the filesystem is flushed once for the whole batch, which costs much less than a fsync for each file
+# The copies are done by the threads of the copy stage, the batch is flushed by the thread that fills it and by the loop of the directory once its copies have finished
+class DurableCopier :
+    """ Copies files to temporary names and renames them once their data is on the disk """
+
+    def __init__(self, level, batchSize) :
+        self.level = level
+        self.batchSize = batchSize
+        self.pendingRenames = []
+        self.syncDirectory = None
+        self.lock = threading.Lock()
+        self.flushLock = threading.Lock()
+
+    # Method with the interface of copy_file, it copies a file to its temporary name and renames it now (strict) or when its batch is flushed (batch)
+    def copy(self, sourcePath, targetPath) :
+        """ Copies a file through its temporary name and returns the description of the copy """
+
+        temporaryPath = temporary_path(targetPath)
+        try :
+            description = copy_file(sourcePath, temporaryPath)
+            if self.level == "strict" :
+                fsync_path(temporaryPath)
+                os.replace(temporaryPath, targetPath)
+                if os.name == "posix" : fsync_path(os.path.dirname(targetPath) or os.curdir, os.O_RDONLY)
+                return description
+        except BaseException :
+            if os.path.exists(temporaryPath) : os.remove(temporaryPath)
+            raise
+
+        with self.lock :
+            self.pendingRenames.append((temporaryPath, targetPath))
+            isBatchFull = len(self.pendingRenames) >= self.batchSize
+        if isBatchFull : self.flush()
+
+        return description
+
+    # Method that flushes the copies of the batch to the disk and renames them to their names, it returns the number of renames that failed
+    def flush(self) :
+        """ Flushes the batch to the disk, renames its files and returns the number of failed renames """
+
+        with self.flushLock :
+
+            with self.lock :
+                renames = self.pendingRenames
+                self.pendingRenames = []
+
+            if not renames : return 0
+
+            directory = os.path.dirname(renames[0][1]) or os.curdir
+            if not sync_filesystem(directory) :
+                for temporaryPath, _ in renames : fsync_path(temporaryPath)
+
+            failedRenames = 0
+            for temporaryPath, targetPath in renames :
+                try :
+                    os.replace(temporaryPath, targetPath)
                 except Exception as error :
                     general_exception_handler(error)
+                    failedRenames += 1
+
+            # The renames are flushed with the next batch, or when the copier is closed
+            self.syncDirectory = directory
+
+            return failedRenames
+
+    # Method that flushes the last batch and the renames done
+    def close(self) :
+        self.flush()
+        if self.syncDirectory is not None : sync_filesystem(self.syncDirectory)
+
+
+
+# Function that updates in place a file of the destination directory with the same size as the source file, writing only the blocks that differ
+# Both files are mapped in memory and compared block by block, which reads the files but only writes the pages of the blocks that changed, the usual case of the tools that rewrite files with a fixed layout
+# The modification time of the source file is applied at the end, since writing the file changes it
+# It returns the description of the copy written in the log file
+def in_place_update_file(sourcePath, targetPath, blockSize) :
+    """ Updates a file of the same size writing only the blocks that differ, and returns the description of the update """
+
+    changedBlocks = 0
+
+    with open(sourcePath, 'rb') as sourceFile, open(targetPath, 'r+b') as targetFile :
+
+        sourceStat = os.fstat(sourceFile.fileno())
+        size = sourceStat.st_size
+
+        # The file could have changed its size since it was listed, then it is copied
+        if size != os.fstat(targetFile.fileno()).st_size :
+            copy_file(sourcePath, targetPath)
+            return "copied, the sizes are different"
+
+        if size > 0 :
+
+            with mmap.mmap(sourceFile.fileno(), 0, access=mmap.ACCESS_READ) as source, mmap.mmap(targetFile.fileno(), 0, access=mmap.ACCESS_WRITE) as target :
+
+                # The memory views compare the blocks without copying them
+                sourceView = memoryview(source)
+                targetView = memoryview(target)
+                try :
+                    for offset in range(0, size, blockSize) :
+                        if sourceView[offset:offset + blockSize] != targetView[offset:offset + blockSize] :
+                            targetView[offset:offset + blockSize] = sourceView[offset:offset + blockSize]
+                            changedBlocks += 1
+                            throttle_transfer(blockSize)
+                finally :
+                    sourceView.release()
+                    targetView.release()
+
+                if changedBlocks > 0 : target.flush()
+
+    os.utime(targetPath, ns=(sourceStat.st_atime_ns, sourceStat.st_mtime_ns))
+
+    return f"updated in place, {changedBlocks} of {-(-size // blockSize)} blocks written"
+
+
+# Blocks of literal data after which the delta transfer is abandoned if no block of the destination file has been found yet, a file rewritten from its start is copied at once
+# They are also the blocks searched after the last match when a block is not found, and the blocks of the source file where they are searched, to find the blocks shifted by an insertion or a deletion
+DELTA_PROBE_BLOCKS = 8
+
+# Bytes of the start of each block of the destination file searched in the source file to find the blocks shifted by an insertion or a deletion
+DELTA_ANCHOR_BYTES = 64
+
+# Offsets where the start of a block is found that are checked with the checksums of the block, so that a block that starts with repeated bytes (zeros) does not check every offset
+DELTA_ANCHOR_CANDIDATES = 8
+
+
+# Function that computes the signatures of the blocks of the file of the destination directory for the delta transfer
+# Each complete block has a weak checksum (Adler-32) and a strong checksum (BLAKE2b), the blocks are indexed by their weak checksum, and also listed by their index, to compare the block at the same offset first, with the first bytes of the block, to find the shifted blocks
+def block_signatures(path, blockSize) :
+    """ Returns {weak checksum: [(block index, strong checksum)]} and [(weak checksum, strong checksum, first bytes)] of the complete blocks of a file """
+
+    signatures = {}
+    blocks = []
+
+    with open(path, 'rb') as file :
+        while True :
+            block = file.read(blockSize)
+            if len(block) < blockSize : break
+            weakChecksum = zlib.adler32(block)
+            strongChecksum = hashlib.blake2b(block, digest_size=16).digest()
+            signatures.setdefault(weakChecksum, []).append((len(blocks), strongChecksum))
+            blocks.append((weakChecksum, strongChecksum, block[:DELTA_ANCHOR_BYTES]))
+
+    return signatures, blocks
+
+
+# Function that searches in the source file of the delta transfer the blocks of the destination file expected after the last match, shifted by an insertion or a deletion
+# The first bytes of each block are searched with mmap.find, which traverses the source file at the speed of memchr instead of rolling a checksum one byte at a time in Python, and the offsets found are checked with the checksums of the block
+# It returns the first offset between start and end where one of the blocks is found, or None
+def find_shifted_block(source, blocks, firstIndex, start, end, blockSize) :
+    """ Returns the first offset of the source file where a block expected after the last match starts, or None """
+
+    foundOffset = None
+    for index in range(firstIndex, min(firstIndex + DELTA_PROBE_BLOCKS, len(blocks))) :
+        weakChecksum, strongChecksum, anchor = blocks[index]
+        offset = start
+        for _ in range(DELTA_ANCHOR_CANDIDATES) :
+            offset = source.find(anchor, offset, end + len(anchor) if foundOffset is None else foundOffset + len(anchor))
+            if offset < 0 : break
+            block = source[offset:offset + blockSize]
+            if zlib.adler32(block) == weakChecksum and hashlib.blake2b(block, digest_size=16).digest() == strongChecksum :
+                foundOffset = offset
+                break
+            offset += 1
+
+    return foundOffset
+
+
+# Function that writes to a file a range of the source file of the delta transfer, in blocks of BUFFERED_COPY_BLOCK_SIZE counted in the throttle of the process, so --bwlimit also applies while a big range is written
+def write_throttled(file, source, offset, length) :
+    """ Writes a range of a buffer to a file counting it in the throttle """
+
+    for blockOffset in range(offset, offset + length, BUFFERED_COPY_BLOCK_SIZE) :
+        blockEnd = min(blockOffset + BUFFERED_COPY_BLOCK_SIZE, offset + length)
+        file.write(source[blockOffset:blockEnd])
+        throttle_transfer(blockEnd - blockOffset)
+
+
+# Function that copies a modified file with the rsync algorithm, reading only the differences from the source file
+# The source file is traversed looking for the blocks of the file of the destination directory by their weak checksum, the checksum of the next block is computed at once after a match
+# At the offsets of the blocks, the block of the destination file at the same offset is compared first, which is the only match of the files modified in place
+# When the block at the offset of a block differs but the next one is at its same offset, the block was modified in place and the search continues at the next block
+# Otherwise the blocks expected after the last match are searched by their first bytes in the next DELTA_PROBE_BLOCKS blocks, once for each run of literal data, which finds the blocks shifted by an insertion or a deletion
+# The search is done for every run of literal data, so the scattered insertions of a big file are all found, and without rolling a checksum in Python its time is that of reading the file
+# If it does not find them, the source file is traversed one block at a time from the next offset of a block
+# If the first DELTA_PROBE_BLOCKS blocks of literal data do not find any block, or more than half of the source file is literal data, the delta transfer is not worthwhile and the file is copied
+# The result is a list of operations: blocks of the destination file found in the source file, and literal data of the source file
+# If every block found is at its same offset, the file of the destination directory is updated in place, writing only the literal data, which is the usual case of the files modified in place (disk images, databases)
+# Otherwise the file is rebuilt in a temporary file from the blocks of the destination file and the literal data, and it replaces the destination file
+# Every byte written (the literal data, and the blocks of the destination file copied to the rebuilt file) is counted in the throttle of --bwlimit
+# It returns the description of the copy written in the log file
+def delta_copy_file(sourcePath, targetPath, blockSize) :
+    """ Copies a modified file transferring only the blocks that differ, and returns the description of the copy """
+
+    signatures, blocks = block_signatures(targetPath, blockSize)
+
+    # Operations as (sourceOffset, length, blockIndex), blockIndex is None for the literal data
+    operations = []
+    literalBytes = 0
+    matchedBlocks = 0
+
+    with open(sourcePath, 'rb') as sourceFile :
+
+        sourceSize = os.fstat(sourceFile.fileno()).st_size
+        if sourceSize == 0 or not signatures :
+            copy_file(sourcePath, targetPath)
+            return "copied, no blocks to compare"
+
+        with mmap.mmap(sourceFile.fileno(), 0, access=mmap.ACCESS_READ) as source :
+
+            offset = 0
+            literalStart = 0
+            nextIndex = 0
+            isShiftSearched = False
+
+            while offset + blockSize <= sourceSize :
+
+                block = source[offset:offset + blockSize]
+                weakChecksum = zlib.adler32(block)
+
+                # The block at the same offset is compared first, the strong checksum is only computed when the weak checksum matches
+                matchedIndex = None
+                strongChecksum = None
+                if offset % blockSize == 0 and offset // blockSize < len(blocks) and blocks[offset // blockSize][0] == weakChecksum :
+                    strongChecksum = hashlib.blake2b(block, digest_size=16).digest()
+                    if blocks[offset // blockSize][1] == strongChecksum : matchedIndex = offset // blockSize
+
+                candidates = signatures.get(weakChecksum) if matchedIndex is None else None
+                if candidates :
+                    if strongChecksum is None : strongChecksum = hashlib.blake2b(block, digest_size=16).digest()
+                    for index, candidateChecksum in candidates :
+                        if candidateChecksum == strongChecksum :
+                            matchedIndex = index
+                            break
+
+                if matchedIndex is not None :
+
+                    if literalStart < offset :
+                        operations.append((literalStart, offset - literalStart, None))
+                        literalBytes += offset - literalStart
+                    operations.append((offset, blockSize, matchedIndex))
+                    matchedBlocks += 1
+                    offset += blockSize
+                    literalStart = offset
+                    nextIndex = matchedIndex + 1
+                    isShiftSearched = False
                     continue
 
-        # Printing the statistics for the source directory, including the total number of files and directories found in the source directory, the number of files found in the source directory, the number of files found in the source directory that already exist in the destination directory, the number of files found in the source directory that already exist in the destination directory but are not copied because they have the same size and modification date, and the number of files found in the source directory that are copied to the destination directory. 
-        # These statistics are printed only in the log file.
-        file.write(f"\nSTATISTICS FOR {sourceDirectory} : \n")
-        file.write(f"Number of total items found in source directory: {foundFilesAndDir}\n")
-        file.write(f"Number of files found in source directory: {foundFiles}\n")
-        file.write(f"Number of directories found in source directory: {foundDirectories}\n")
-        file.write(f"Number of source files found in target directory: {copiedFoundFiles + notCopiedFoundFiles}\n")
-        file.write(f"Number of source files copied to target directory: {copiedFoundFiles + copiedNotFoundFiles}\n")
-        file.write(f"Number of source files found in target not copied to target directory: {notCopiedFoundFiles}\n")
-            
-         
-        # The destination is traversed to remove files that do not exist in the source.
-        # print(f"\nSEARCHING FOR FILES IN {targetDirectory} : " )
-        file.write(f"\nSEARCHING FOR FILES IN {targetDirectory} : \n")
+                # A block modified in place, the next block is at its same offset
+                nextOffset = offset + blockSize
+                shiftedOffset = None
+                if offset % blockSize == 0 and nextOffset + blockSize <= sourceSize and nextOffset // blockSize < len(blocks) and blocks[nextOffset // blockSize][1] == hashlib.blake2b(source[nextOffset:nextOffset + blockSize], digest_size=16).digest() :
+                    offset = nextOffset
+
+                # The blocks expected after the last match are searched once for each run of literal data, the search continues where one of them is found or at the next offset of a block
+                else :
+                    if not isShiftSearched :
+                        shiftedOffset = find_shifted_block(source, blocks, nextIndex, offset + 1, min(literalStart + DELTA_PROBE_BLOCKS * blockSize, sourceSize - blockSize), blockSize)
+                        isShiftSearched = True
+                    offset = shiftedOffset if shiftedOffset is not None else (offset // blockSize + 1) * blockSize
+
+                # Once per block of literal data it is checked if the delta transfer is still worthwhile
+                if shiftedOffset is None :
+                    pendingLiteralBytes = literalBytes + min(offset, sourceSize) - literalStart
+                    if (matchedBlocks == 0 and pendingLiteralBytes >= DELTA_PROBE_BLOCKS * blockSize) or pendingLiteralBytes > sourceSize // 2 :
+                        copy_file(sourcePath, targetPath)
+                        return "copied, the delta transfer was not worthwhile"
+
+            if literalStart < sourceSize : operations.append((literalStart, sourceSize - literalStart, None))
+
+            literalBytes = sum(length for _, length, blockIndex in operations if blockIndex is None)
+            if literalBytes > sourceSize // 2 :
+                copy_file(sourcePath, targetPath)
+                return "copied, the delta transfer was not worthwhile"
+
+            isInPlace = all(blockIndex is None or blockIndex * blockSize == sourceOffset for sourceOffset, _, blockIndex in operations)
+
+            if isInPlace :
+
+                # Only the literal data is written, the blocks found are already at their offsets
+                with open(targetPath, 'r+b') as targetFile :
+                    for sourceOffset, length, blockIndex in operations :
+                        if blockIndex is None :
+                            targetFile.seek(sourceOffset)
+                            write_throttled(targetFile, source, sourceOffset, length)
+                    targetFile.truncate(sourceSize)
+                shutil.copystat(sourcePath, targetPath)
 
-        # If there are no files in the destination directory, we print a message and skip to the end of the script, which is to print the statistics. 
-        # Otherwise, we continue with the synchronization process.
-        if len(os.listdir(targetDirectory)) == 0 :
+            else :
+
+                # The file is rebuilt in a temporary file of the destination directory, which replaces the destination file at once
+                temporaryPath = rebuilt_path(targetPath)
+                try :
+                    with open(targetPath, 'rb') as targetFile, open(temporaryPath, 'wb') as temporaryFile :
+                        for sourceOffset, length, blockIndex in operations :
+                            if blockIndex is None : write_throttled(temporaryFile, source, sourceOffset, length)
+                            else :
+                                targetFile.seek(blockIndex * blockSize)
+                                temporaryFile.write(targetFile.read(blockSize))
+                                throttle_transfer(blockSize)
+                    shutil.copystat(sourcePath, temporaryPath)
+                    os.replace(temporaryPath, targetPath)
+                except BaseException :
+                    if os.path.exists(temporaryPath) : os.remove(temporaryPath)
+                    raise
+
+    return f"delta transfer {'in place' if isInPlace else 'rebuilt'}, {literalBytes} literal bytes, {sourceSize - literalBytes} bytes found in the destination file"
+
+
+
+# Class that copies the files of one size class (a lane) in a pool of threads, so that a directory with many small files is not copied one file at a time
+# The copy of a file releases the GIL while it reads and writes, so several copies progress at the same time on SSD and NVMe targets
+# The bytes of the copies submitted but not finished are limited, so that the copies of huge files are not all started at once
+# With a single thread the files are copied in the calling thread, as the script has always done, unless the lane is asynchronous
+# Without a limit of bytes in flight the copies are queued without waiting, the lane copies as many files at a time as it has threads
+# The lane counts the files and bytes it copies, the seconds it has copies in flight and the maximum number of copies submitted but not finished (its queue depth), they are added to the statistics of the directory
+class CopyLane :
+    """ Copies the files of one size class in a pool of threads with a limit of bytes in flight """
+
+    def __init__(self, name, threads, maxInFlightBytes, isAsynchronous=False) :
+        self.name = name
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads) if threads > 1 or isAsynchronous else None
+        self.maxInFlightBytes = maxInFlightBytes
+        self.inFlightBytes = 0
+        self.condition = threading.Condition()
+        self.queuedCopies = 0
+        self.busySince = 0
+        self.reset_counters()
+
+    # Method that resets the counters of the lane once they have been added to the statistics
+    def reset_counters(self) :
+        self.copiedFiles = 0
+        self.copiedBytes = 0
+        self.busySeconds = 0.0
+        self.maxQueuedCopies = 0
+
+    # Method that submits the copy of a file and returns its future
+    # It waits while the bytes in flight exceed the limit, but a file bigger than the limit is copied when nothing else is in flight
+    def submit(self, sourcePath, targetPath, size, copyFunction) :
+        """ Submits the copy of a file and returns its future """
+
+        with self.condition :
+            if self.executor is not None and self.maxInFlightBytes is not None :
+                while self.inFlightBytes > 0 and self.inFlightBytes + size > self.maxInFlightBytes :
+                    self.condition.wait()
+            self.inFlightBytes += size
+            if self.queuedCopies == 0 : self.busySince = time.monotonic()
+            self.queuedCopies += 1
+            self.maxQueuedCopies = max(self.maxQueuedCopies, self.queuedCopies)
+
+        if self.executor is None :
+            future = concurrent.futures.Future()
+            try :
+                future.set_result(copyFunction(sourcePath, targetPath))
+            except Exception as error :
+                future.set_exception(error)
+            self._copy_finished(size, future)
+            return future
+
+        future = self.executor.submit(copyFunction, sourcePath, targetPath)
+        future.add_done_callback(lambda future, size=size : self._copy_finished(size, future))
+        return future
+
+    # Method called when a copy finishes, it releases its bytes and counts the copy if it finished without errors
+    def _copy_finished(self, size, future) :
+        with self.condition :
+            self.inFlightBytes -= size
+            self.queuedCopies -= 1
+            if self.queuedCopies == 0 : self.busySeconds += time.monotonic() - self.busySince
+            if future.exception() is None :
+                self.copiedFiles += 1
+                self.copiedBytes += size
+            self.condition.notify_all()
+
+    # Method that adds the counters of the lane to the statistics, once all its copies have finished
+    def add_to_statistics(self, statistics) :
+        """ Adds the counters of the lane to the statistics """
+
+        # The result of a future is available before its callback has counted it
+        with self.condition :
+            while self.queuedCopies > 0 : self.condition.wait()
+
+        statistics[f"{self.name}LaneFiles"] += self.copiedFiles
+        statistics[f"{self.name}LaneBytes"] += self.copiedBytes
+        statistics[f"{self.name}LaneSeconds"] += self.busySeconds
+        statistics[f"{self.name}LaneMaxQueue"] = max(statistics[f"{self.name}LaneMaxQueue"], self.maxQueuedCopies)
+        self.reset_counters()
+
+    # Method that finishes the threads of the pool
+    def shutdown(self) :
+        if self.executor is not None : self.executor.shutdown(wait=True)
+
+
+
+# Class that copies the files of a directory through the copy lanes
+# Without --large-file-mb there is a single lane, as the script has always done
+# With --large-file-mb the files of that size or bigger go to a lane of their own with --large-copy-threads threads, so the small files of the directory are not queued behind a huge file: they are copied by the small lane while the large lane copies it
+# The large lane does not use the calling thread even with a single thread and it does not limit its bytes in flight, otherwise the loop of the directory would wait for each large file
+class CopyStage :
+    """ Copies files in the copy lanes, the small files and the large files in different lanes """
+
+    def __init__(self, threads, maxInFlightBytes, largeFileSize=None, largeThreads=1) :
+        self.smallLane = CopyLane("small", threads, maxInFlightBytes)
+        self.largeLane = CopyLane("large", largeThreads, None, True) if largeFileSize is not None else None
+        self.largeFileSize = largeFileSize
+        self.submittedCopies = []
+
+    # Method that submits the copy of a file to its lane, the name of the statistic is incremented when the copy finishes without errors
+    # The copy is done by copyFunction(sourcePath, targetPath), which can return a description of the copy to be written in the log file
+    # It returns the future of the copy, so that the caller can know if it finished without errors once the copies have been waited
+    def submit(self, sourcePath, targetPath, size, statisticName, copyFunction=copy_file) :
+        """ Submits the copy of a file and returns its future """
+
+        lane = self.largeLane if self.largeLane is not None and size >= self.largeFileSize else self.smallLane
+        future = lane.submit(sourcePath, targetPath, size, copyFunction)
+        self.submittedCopies.append((future, targetPath, statisticName))
+        return future
+
+    # Method that waits until all the submitted copies have finished, updates the statistics and writes in the log file the description of the copies that have one
+    # The copy errors are managed by the general exception handler, as they were when the copy was done in the loop
+    # It returns the number of copies that failed
+    def wait(self, statistics, file) :
+        """ Waits for the submitted copies, updates the statistics and returns the number of failed copies """
+
+        failedCopies = 0
+
+        for future, targetPath, statisticName in self.submittedCopies :
+            try :
+                description = future.result()
+                if description : file.write(f"File {targetPath} : {description}\n")
+                statistics[statisticName] += 1
+            except Exception as error :
+                general_exception_handler(error)
+                failedCopies += 1
+
+        self.submittedCopies = []
+
+        if self.largeLane is not None :
+            self.smallLane.add_to_statistics(statistics)
+            self.largeLane.add_to_statistics(statistics)
+
+        return failedCopies
+
+    # Method that finishes the threads of the lanes
+    def shutdown(self) :
+        self.smallLane.shutdown()
+        if self.largeLane is not None : self.largeLane.shutdown()
+
+
+
+# Class that writes the plan of a synchronization with the --plan option: the operations that the synchronization would do, instead of doing them
+# It replaces the copy stage, so the copies decided in the directories are written to the plan, and it also receives the directories to create and the files and directories to delete
+# The plan is a text file with one operation per line, each line is a JSON array, so any name can be written:
+#   [ "mkdir", targetPath ]
+#   [ "copy", bytes, sourcePath, targetPath ]          a file that does not exist in the destination directory
+#   [ "update", bytes, sourcePath, targetPath ]        a file that exists in the destination directory but is different
+#   [ "delete", bytes, targetPath, isDirectory ]       a file or a directory that does not exist in the source directory, bytes is the size of all its files
+#   [ "rename", sourcePath, renamedPath ]              a file or a directory of the source directory with square brackets in its name, renamed before the copies
+# The source paths are written with the square brackets of their directories replaced, as they are once the renames of the plan are done
+# The first line is a JSON object with the source and destination directories of the plan, the paths of the operations are relative to them, so a plan does not depend on the working directory where it is made or applied
+# The lines are written in blocks with a single write to a file opened to append, so the processes of the pool can write to the same plan
+class SyncPlan :
+    """ Writes the operations of a synchronization to a plan instead of doing them """
+
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, path, sourceDirectory, targetDirectory) :
+        self.fileDescriptor = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        self.sourceDirectory = os.path.abspath(sourceDirectory)
+        self.targetDirectory = os.path.abspath(targetDirectory)
+        self.buffer = []
+        self.bufferSize = 0
+        self.submittedCopies = []
+
+    def _add(self, operation) :
+        line = json.dumps(operation) + "\n"
+        self.buffer.append(line)
+        self.bufferSize += len(line)
+        if self.bufferSize >= self.BUFFER_SIZE : self.flush()
+
+    # Method that writes the pending lines to the plan
+    def flush(self) :
+        """ Writes the pending lines to the plan """
+
+        if self.buffer : os.write(self.fileDescriptor, "".join(self.buffer).encode("utf-8"))
+        self.buffer = []
+        self.bufferSize = 0
+
+    # Method that returns the path of a file of the source directory relative to it, as it is once the renames of the plan are done
+    def _source_path(self, sourcePath) :
+        return os.path.relpath(os.path.abspath(sourcePath), self.sourceDirectory).translate(SQUARE_BRACKETS_TABLE)
+
+    # Method with the interface of CopyStage.submit, the copy is written to the plan and its future is already finished
+    def submit(self, sourcePath, targetPath, size, statisticName, copyFunction=None) :
+        """ Writes a copy to the plan and returns its future """
+
+        self._add([ "update" if statisticName == "copiedFoundFiles" else "copy", size, self._source_path(sourcePath), os.path.relpath(os.path.abspath(targetPath), self.targetDirectory) ])
+        future = concurrent.futures.Future()
+        future.set_result(None)
+        self.submittedCopies.append(statisticName)
+        return future
+
+    # Method with the interface of CopyStage.wait, the copies written to the plan are counted in the statistics
+    def wait(self, statistics, file) :
+        """ Updates the statistics with the copies written to the plan """
+
+        for statisticName in self.submittedCopies : statistics[statisticName] += 1
+        self.submittedCopies = []
+        return 0
+
+    # Method that writes to the plan a directory of the destination directory to create
+    def mkdir(self, targetPath) :
+        """ Writes to the plan a directory to create """
+        self._add([ "mkdir", os.path.relpath(os.path.abspath(targetPath), self.targetDirectory) ])
+
+    # Method that writes to the plan a file or directory of the source directory to rename, its directory is already renamed when the plan is applied
+    def rename(self, sourcePath, renamedName) :
+        """ Writes to the plan a file or directory of the source directory to rename """
+
+        directory = os.path.dirname(self._source_path(sourcePath))
+        self._add([ "rename", os.path.join(directory, os.path.basename(sourcePath)), os.path.join(directory, renamedName) ])
+
+    # Method that writes to the plan a file or directory of the destination directory to delete, with the size of all its files
+    def delete(self, targetPath, isDirectory) :
+        """ Writes to the plan a file or directory to delete """
+
+        size = 0
+        if not isDirectory : size = os.lstat(targetPath).st_size
+        else :
+            for directory, _, fileNames, directoryDescriptor in os.fwalk(targetPath) :
+                size += sum(os.stat(name, dir_fd=directoryDescriptor, follow_symlinks=False).st_size for name in fileNames)
+        self._add([ "delete", size, os.path.relpath(os.path.abspath(targetPath), self.targetDirectory), isDirectory ])
+
+    def shutdown(self) :
+        self.flush()
+        os.close(self.fileDescriptor)
 
-            # print(f"There are no files in {targetDirectory} : " )
-            file.write(f"There are no files in {targetDirectory} : \n")  
 
-        else:
-            
-            # For each file item in the destination directory, the name is extracted, and it is checked if it exists in the source directory. 
-            # If it does not exist, it is deleted. 
-            # If it exists, it is not deleted. 
-            # In both cases, a message is printed indicating what happened, and the corresponding statistics are updated.
-            for fileItem in sorted(os.listdir(targetDirectory)) :
+
+# Function that returns the number of operations and bytes of each type of operation of a plan, read from its file
+def summarize_plan(path) :
+    """ Returns the header of a plan and {operation: [count, bytes]} """
+
+    summary = { operation : [0, 0] for operation in ("rename", "mkdir", "copy", "update", "delete") }
+
+    with open(path, encoding="utf-8") as file :
+        header = json.loads(file.readline())
+        for line in file :
+            operation = json.loads(line)
+            summary[operation[0]][0] += 1
+            if operation[0] not in ("rename", "mkdir") : summary[operation[0]][1] += operation[1]
+
+    return header, summary
+
+
+# Function that writes the summary of a plan on screen and in the log file
+def write_plan_summary(path, summary, file) :
+    """ Writes the summary of a plan """
+
+    text = (f"\nPLAN {path} : \n"
+            f"Files to copy: {summary['copy'][0]} ({summary['copy'][1]} bytes)\n"
+            f"Files to update: {summary['update'][0]} ({summary['update'][1]} bytes)\n"
+            f"Files and directories to delete: {summary['delete'][0]} ({summary['delete'][1]} bytes)\n"
+            f"Directories to create: {summary['mkdir'][0]}\n"
+            f"Source files and directories with square brackets to rename: {summary['rename'][0]}\n")
+    print(text, end='')
+    file.write(text)
+
+
+
+# Class that replaces a DirEntry when the listing of a directory is taken from the manifest instead of listing the directory
+# The entries make a real stat of the file the first time it is needed, in the source and in the destination directory, so that the files modified in place (which do not change the modification time of their directory) are still detected
+# An entry whose stat is already known (a file renamed by --detect-renames) is created with it
+class ManifestEntry :
+    """ Entry of a directory taken from the manifest, with the interface of a DirEntry """
+
+    def __init__(self, directory, name, isDirectory, currentStat=None) :
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self.isDirectory = isDirectory
+        self.currentStat = currentStat
+
+    def is_dir(self) :
+        return self.isDirectory
+
+    def stat(self) :
+        if self.currentStat is None : self.currentStat = os.stat(self.path)
+        return self.currentStat
+
+
+
+# Class that keeps, in a SQLite database next to LOGFILE, the state of each directory at the end of the last run in which it was synchronized without errors
+# For each pair of directories it records the modification time of both directories and the name and type of the entries of the source directory, which are the same in the destination directory once synchronized
+# The modification time of a directory only changes when an entry is created, deleted or renamed inside it, so if both directories keep their recorded modification times the listings are taken from the manifest and the directories are not listed
+# The files of both directories are still read with a stat, since a file modified in place, in the source or directly in the destination directory, does not change the modification time of its directory
+# The record of a directory that has changed is deleted and written again when it finishes without errors, and the record of a directory with errors is deleted, so a run interrupted or with errors repairs the manifest in the next run
+# A record is only written for the files synchronized, and the files are always compared with a real stat, so an old record never hides a file that was not copied
+# The manifest also keeps the granularity of the timestamps of the filesystem of each destination directory, with its device, so the probe file that detects it does not change the modification time of the destination directory in each run
+# Each process of the pool opens its own connection, so each change is committed at once in a short transaction that takes the lock of the database when it starts, a transaction kept open while the directories are synchronized would block the other processes
+# In WAL mode with synchronous=NORMAL a commit does not wait for the disk, the manifest only has to survive the crashes of the process
+class SyncManifest :
+    """ Persistent manifest of the synchronized directories """
+
+    def __init__(self, path) :
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level="IMMEDIATE")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS directories (sourceDirectory TEXT, targetDirectory TEXT, sourceMtimeNs INTEGER, targetMtimeNs INTEGER, PRIMARY KEY (sourceDirectory, targetDirectory))")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS entries (sourceDirectory TEXT, targetDirectory TEXT, name TEXT, isDirectory INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entriesByDirectory ON entries (sourceDirectory, targetDirectory)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS filesystems (targetDirectory TEXT PRIMARY KEY, device INTEGER, granularityNs INTEGER)")
+        self.connection.commit()
+
+    # Method that returns the granularity of the timestamps of the filesystem of a destination directory, detected with a probe file only if the manifest does not have it for its device
+    def timestamp_granularity(self, targetDirectory) :
+        """ Returns the granularity of the timestamps of the filesystem of a destination directory """
+
+        key = os.path.abspath(targetDirectory)
+        device = os.stat(targetDirectory).st_dev
+        row = self.connection.execute("SELECT granularityNs FROM filesystems WHERE targetDirectory = ? AND device = ?", (key, device)).fetchone()
+        if row is not None : return row[0]
+
+        granularity = detect_timestamp_granularity(targetDirectory)
+        self.connection.execute("INSERT OR REPLACE INTO filesystems VALUES (?, ?, ?)", (key, device, granularity))
+        self.connection.commit()
+        return granularity
+
+    # Method that returns the listings of both directories taken from the manifest if both directories keep their recorded modification times
+    # Otherwise the record of the directory is deleted and it returns None, the record will be written again if the directory is synchronized without errors
+    def lookup(self, sourceDirectory, targetDirectory, sourceMtimeNs) :
+        """ Returns (sourceEntries, targetEntries) taken from the manifest, or None if the directories have changed """
+
+        key = (os.path.abspath(sourceDirectory), os.path.abspath(targetDirectory))
+        row = self.connection.execute("SELECT sourceMtimeNs, targetMtimeNs FROM directories WHERE sourceDirectory = ? AND targetDirectory = ?", key).fetchone()
+
+        sourceEntries = None
+        targetEntries = None
+
+        if row is not None and row[0] == sourceMtimeNs and row[1] == os.stat(targetDirectory).st_mtime_ns :
+
+            records = sorted(self.connection.execute("SELECT name, isDirectory FROM entries WHERE sourceDirectory = ? AND targetDirectory = ?", key))
+            sourceEntries = [ ManifestEntry(sourceDirectory, name, bool(isDirectory)) for name, isDirectory in records ]
+            targetEntries = [ ManifestEntry(targetDirectory, name, bool(isDirectory)) for name, isDirectory in records ]
+
+        if sourceEntries is None :
+            if row is not None : self.forget(sourceDirectory, targetDirectory)
+            return None
+
+        return sourceEntries, targetEntries
+
+    # Method that records a directory synchronized without errors, with the modification time of the source directory taken before it was listed
+    # Each entry is (name, isDirectory)
+    def record(self, sourceDirectory, targetDirectory, sourceMtimeNs, entries) :
+        """ Records the state of a directory synchronized without errors """
+
+        key = (os.path.abspath(sourceDirectory), os.path.abspath(targetDirectory))
+        self._delete(key)
+        self.connection.execute("INSERT INTO directories VALUES (?, ?, ?, ?)", (*key, sourceMtimeNs, os.stat(targetDirectory).st_mtime_ns))
+        self.connection.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)", [ (*key, name, isDirectory) for name, isDirectory in entries ])
+        self.connection.commit()
+
+    # Method that deletes the record of a directory
+    def forget(self, sourceDirectory, targetDirectory) :
+        """ Deletes the record of a directory """
+
+        self._delete((os.path.abspath(sourceDirectory), os.path.abspath(targetDirectory)))
+        self.connection.commit()
+
+    def _delete(self, key) :
+        self.connection.execute("DELETE FROM directories WHERE sourceDirectory = ? AND targetDirectory = ?", key)
+        self.connection.execute("DELETE FROM entries WHERE sourceDirectory = ? AND targetDirectory = ?", key)
+
+    # Method that deletes the records of a directory of the destination directory that has been deleted and of all its subdirectories
+    def forget_tree(self, sourceDirectory, targetDirectory) :
+        """ Deletes the records of a deleted directory and its subdirectories """
+
+        key = (os.path.abspath(sourceDirectory), os.path.abspath(targetDirectory))
+        for table in ("directories", "entries") :
+            self.connection.execute(f"DELETE FROM {table} WHERE (sourceDirectory = ? OR substr(sourceDirectory, 1, ?) = ?) AND (targetDirectory = ? OR substr(targetDirectory, 1, ?) = ?)",
+                (key[0], len(key[0]) + 1, key[0] + os.sep, key[1], len(key[1]) + 1, key[1] + os.sep))
+        self.connection.commit()
+
+    # Method that closes the database
+    def close(self) :
+        self.connection.close()
+
+
+
+# Class that computes the digests of the files compared by the --checksum option and keeps them in a SQLite database next to LOGFILE, so that a file that has not changed is not read again in the next runs
+# A digest is valid while the file keeps its device, inode, size and modification and change times in nanoseconds, a file modified or replaced changes some of them and it is read again (the change time also detects the files rewritten in place keeping their modification time)
+# When a file found different is copied, the digest of its source file is recorded for the copy, so the copy is not read again in the next run
+# The digests are computed by a pool of threads while the directory is being listed and compared, the connection to the database is shared by the threads with a lock
+# Each digest is committed at once, as the records of the manifest, so that the processes of the pool do not block each other
+class HashCache :
+    """ Digests of the files computed by a pool of threads and kept between runs """
+
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, path, threads) :
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level="IMMEDIATE", check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS digests (device INTEGER, inode INTEGER, size INTEGER, mtimeNs INTEGER, ctimeNs INTEGER, digest BLOB, PRIMARY KEY (device, inode)) WITHOUT ROWID")
+        self.connection.commit()
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(threads)
+
+    # Method that submits the computation of the digest of a file and returns its future
+    def submit(self, path) :
+        """ Returns the future of the digest of a file """
+        return self.executor.submit(self._digest, path)
+
+    # Method that returns the digest of a file, taken from the database if the file has not changed since it was computed
+    def _digest(self, path) :
+
+        fileStat = os.stat(path)
+
+        with self.lock :
+            row = self.connection.execute("SELECT size, mtimeNs, ctimeNs, digest FROM digests WHERE device = ? AND inode = ?", (fileStat.st_dev, fileStat.st_ino)).fetchone()
+        if row is not None and row[:3] == (fileStat.st_size, fileStat.st_mtime_ns, fileStat.st_ctime_ns) : return row[3]
+
+        digest = hashlib.blake2b()
+        buffer = bytearray(self.BLOCK_SIZE)
+        view = memoryview(buffer)
+        with open(path, 'rb') as file :
+            while True :
+                readBytes = file.readinto(buffer)
+                if not readBytes : break
+                digest.update(view[:readBytes])
+
+        with self.lock :
+            self.connection.execute("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)", (fileStat.st_dev, fileStat.st_ino, fileStat.st_size, fileStat.st_mtime_ns, fileStat.st_ctime_ns, digest.digest()))
+            self.connection.commit()
+
+        return digest.digest()
+
+    # Method called when the copy of a file found different has finished, used as a callback of its future
+    # The digest of the source file is recorded for the copy, if the copy failed or is not at its name yet (--durability batch renames it later) the record of the destination file is deleted instead
+    def record_copy(self, path, digest, isAtItsName, future) :
+        """ Records the digest of a file copied """
+
+        try :
+            fileStat = os.stat(path)
+        except OSError :
+            return
+
+        with self.lock :
+            if isAtItsName and not future.cancelled() and future.exception() is None :
+                self.connection.execute("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)", (fileStat.st_dev, fileStat.st_ino, fileStat.st_size, fileStat.st_mtime_ns, fileStat.st_ctime_ns, digest))
+            else : self.connection.execute("DELETE FROM digests WHERE device = ? AND inode = ?", (fileStat.st_dev, fileStat.st_ino))
+            self.connection.commit()
+
+    # Method that waits for the pending digests and closes the database
+    def close(self) :
+        self.executor.shutdown()
+        self.connection.close()
+
+
+
+# Class that keeps the checkpoint journal of the --checkpoint option: the directories already synchronized and the copies started in the directories not finished yet
+# The journal is a SQLite database next to LOGFILE, written by all the processes of the pool, with a commit for each change, so an interrupted run (SIGINT, SIGTERM, a crash) leaves it up to date
+# A run with --resume skips the directories already synchronized, without listing them, and continues with their subdirectories, which are kept in the journal
+# The copies are done to temporary names, the copies of the interrupted run are only temporary files, which are deleted before resuming, and their directories are synchronized again
+# The journal is deleted when the whole tree has been synchronized
+class SyncCheckpoint :
+    """ Checkpoint journal of the synchronized directories and the copies in flight """
+
+    def __init__(self, path) :
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level="IMMEDIATE")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS run (sourceDirectory TEXT, targetDirectory TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS directories (sourceDirectory TEXT PRIMARY KEY, subdirectories TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS copies (targetDirectory TEXT, targetPath TEXT)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS copiesByDirectory ON copies (targetDirectory)")
+        self.connection.commit()
+
+    # Method that returns the source and destination directories of the run of the journal, or None if the journal is new
+    def run(self) :
+        """ Returns (sourceDirectory, targetDirectory) of the run of the journal """
+        return self.connection.execute("SELECT sourceDirectory, targetDirectory FROM run").fetchone()
+
+    # Method that starts the journal of a new run
+    def start(self, sourceDirectory, targetDirectory) :
+        """ Starts the journal of a new run """
+
+        self.connection.execute("DELETE FROM run")
+        self.connection.execute("INSERT INTO run VALUES (?, ?)", (os.path.abspath(sourceDirectory), os.path.abspath(targetDirectory)))
+        self.connection.commit()
+
+    # Method that deletes the temporary files of the copies in flight of the interrupted run and returns their number, the copies and the files rebuilt by the delta transfer
+    def clean_copies(self) :
+        """ Deletes the temporary files of the copies in flight and returns their number """
+
+        deletedFiles = 0
+        for (targetPath,) in self.connection.execute("SELECT targetPath FROM copies").fetchall() :
+            for temporaryPath in (temporary_path(targetPath), rebuilt_path(targetPath)) :
+                if os.path.lexists(temporaryPath) :
+                    os.remove(temporaryPath)
+                    deletedFiles += 1
+        self.connection.execute("DELETE FROM copies")
+        self.connection.commit()
+
+        return deletedFiles
+
+    # Method that returns the subdirectories of a directory already synchronized, as (sourcePath, targetPath), or None if the directory has not been synchronized
+    def lookup(self, sourceDirectory) :
+        """ Returns the subdirectories of a directory already synchronized, or None """
+
+        row = self.connection.execute("SELECT subdirectories FROM directories WHERE sourceDirectory = ?", (os.path.abspath(sourceDirectory),)).fetchone()
+        return None if row is None else [ tuple(subdirectory) for subdirectory in json.loads(row[0]) ]
+
+    # Method that records a copy before it is submitted
+    def start_copy(self, targetPath) :
+        """ Records a copy in flight """
+
+        self.connection.execute("INSERT INTO copies VALUES (?, ?)", (os.path.abspath(os.path.dirname(targetPath)), targetPath))
+        self.connection.commit()
+
+    # Method that records a directory synchronized without errors, with its subdirectories, its copies are not in flight anymore
+    def complete(self, sourceDirectory, targetDirectory, subdirectories) :
+        """ Records a directory synchronized without errors """
+
+        self.connection.execute("INSERT OR REPLACE INTO directories VALUES (?, ?)", (os.path.abspath(sourceDirectory), json.dumps(subdirectories)))
+        self.connection.execute("DELETE FROM copies WHERE targetDirectory = ?", (os.path.abspath(targetDirectory),))
+        self.connection.commit()
+
+    # Method that closes the database
+    def close(self) :
+        self.connection.close()
+
+
+
+# Class that keeps, for the --hard-links option, the file of the destination directory of each inode with more than one link found in the source tree during the run
+# The map is a SQLite database next to LOGFILE instead of a dictionary, so a tree with tens of millions of links does not have to fit in memory, and it is shared by the processes of the pool
+# The first file of an inode is copied and the others are linked to it; the database is created again at the start of each run
+# The claims of the files of a directory are kept by the process until the directory has finished its copies, and then they are written in a single transaction if it has no errors
+# So the other processes of the pool never link their files to a file whose copy is not at its name yet (they would link the previous file), until then they copy the files of the inode
+class HardLinkMap :
+    """ File of the destination directory of each inode with more than one link of the source tree """
+
+    def __init__(self, path) :
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level="IMMEDIATE")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS links (device INTEGER, inode INTEGER, targetPath TEXT, PRIMARY KEY (device, inode)) WITHOUT ROWID")
+        self.connection.commit()
+        self.pendingClaims = {}
+
+    # Method that claims the inode of a file of the source directory for its file of the destination directory
+    # It returns None if the inode had not been found yet, and otherwise the file of the destination directory that claimed it, in a directory already finished or in the directory being synchronized
+    def claim(self, sourceStat, targetPath) :
+        """ Returns the file of the destination directory of the inode of a file, or None if it is the first file of the inode """
+
+        key = (sourceStat.st_dev, sourceStat.st_ino)
+        if key in self.pendingClaims : return self.pendingClaims[key]
+
+        row = self.connection.execute("SELECT targetPath FROM links WHERE device = ? AND inode = ?", key).fetchone()
+        if row is not None : return row[0]
+
+        self.pendingClaims[key] = os.path.abspath(targetPath)
+        return None
+
+    # Method called once the copies of a directory are at their names, it records the claims of its files if the directory has no errors, otherwise their inodes can be claimed again
+    def commit(self, hasErrors) :
+        """ Records the claims of the files of a directory whose copies have finished """
+
+        if not hasErrors and self.pendingClaims :
+            self.connection.executemany("INSERT OR IGNORE INTO links VALUES (?, ?, ?)", [ (*key, targetPath) for key, targetPath in self.pendingClaims.items() ])
+            self.connection.commit()
+        self.pendingClaims = {}
+
+    # Method that closes the database
+    def close(self) :
+        self.connection.close()
+
+
+
+# Modification times set on the probe file that detects the granularity of the timestamps of a filesystem: the last nanosecond of an odd second and the first nanosecond of an even second
+# A filesystem that truncates the times to its granularity moves the first one back by the granularity minus one nanosecond, and a filesystem that rounds them up moves the second one forward by the same amount
+TIMESTAMP_PROBES_NS = ( 1704067201 * 1000000000 + 999999999, 1704067202 * 1000000000 + 1 )
+
+
+# Function that sets the I/O scheduling class of the process (ioprio_set in Linux), through psutil
+# best-effort uses the lowest priority (7) of the normal class, in Windows both classes use the very low priority
+def set_io_class(ioClass) :
+    """ Sets the I/O scheduling class of the process """
+
+    process = psutil.Process()
+    if sys.platform.startswith("linux") :
+        if ioClass == "idle" : process.ionice(psutil.IOPRIO_CLASS_IDLE)
+        else : process.ionice(psutil.IOPRIO_CLASS_BE, 7)
+    elif sys.platform == "win32" : process.ionice(psutil.IOPRIO_VERYLOW)
+
+
+
+# Function that detects the granularity of the timestamps of the filesystem of a directory, setting the modification time of a probe file and reading it back
+# It returns the biggest difference in nanoseconds between the time set and the time kept, two files are not different if their modification times differ up to that difference
+# If the probe file cannot be created (the directory does not exist or it is read only) it returns 0, the exact comparison
+def detect_timestamp_granularity(directory) :
+    """ Returns the difference in nanoseconds up to which the filesystem of a directory can change a modification time """
+
+    probePath = os.path.join(directory, f".QuickFolderSynchroProbe{os.getpid()}")
+    granularity = 0
+
+    try :
+        with open(probePath, 'wb') : pass
+        for probeNs in TIMESTAMP_PROBES_NS :
+            os.utime(probePath, ns=(probeNs, probeNs))
+            granularity = max(granularity, abs(os.stat(probePath).st_mtime_ns - probeNs))
+        os.remove(probePath)
+    except OSError :
+        if os.path.exists(probePath) : os.remove(probePath)
+        return 0
+
+    return granularity
+
+
+
+# Function that returns the seconds since the current process was created
+# In Linux the start of the process is read from /proc/self/stat, in clock ticks (usually 10 ms); psutil counts from the boot time rounded to the second
+def process_age() :
+    """ Returns the seconds since the process was created """
+
+    if sys.platform.startswith("linux") and hasattr(time, "CLOCK_BOOTTIME") :
+        try :
+            with open("/proc/self/stat") as file : fields = file.read().rsplit(")", 1)[1].split()
+            return time.clock_gettime(time.CLOCK_BOOTTIME) - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError) :
+            pass
+
+    return time.time() - psutil.Process().create_time()
+
+
+# Phases of the synchronization measured by --profile:
+#   startup  start of the processes: from the creation of the main process to the synchronization (without the time waiting for the confirmation), and from the launch of each worker of the pool to its first directory
+#   listdir  listing of the source and destination directories, or reading their listings from the manifest
+#   stat     stat of the files to compare their sizes and modification times
+#   compare  comparison of the entries and the rest of the work of each directory not included in another phase, also the wait for the digests of --checksum
+#   copy     submission of the copies and wait until the copies of the directory have finished, the links of --hard-links and the flushes of --durability
+#   delete   deletion of the files and directories that are not in the source directory, or their move to the trash
+#   logging  writes to the log file and to the screen
+PROFILE_PHASES = ("startup", "listdir", "stat", "compare", "copy", "delete", "logging")
+
+
+# Class of a phase being measured by the profiler, used in a with statement
+# With a path, the seconds of the phase are also recorded for that file
+class ProfilePhase :
+    """ Phase of the synchronization measured by the profiler """
+
+    __slots__ = ("profiler", "name", "path", "startTime")
+
+    def __init__(self, profiler, name, path) :
+        self.profiler = profiler
+        self.name = name
+        self.path = path
+
+    def __enter__(self) :
+        self.startTime = self.profiler.enter_phase(self.name)
+        return self
+
+    def __exit__(self, *exception) :
+        endTime = self.profiler.exit_phase()
+        if self.path is not None : self.profiler.record_file(self.path, self.name, endTime - self.startTime)
+        return False
+
+
+# Class that writes to a file (the log file or the screen) measuring the time of the writes in the phase logging of the profiler
+# The rest of the attributes are the ones of the file
+class ProfiledWriter :
+    """ File whose writes are measured by the profiler """
+
+    def __init__(self, file, profiler) :
+        self.file = file
+        self.profiler = profiler
+
+    def write(self, text) :
+        with self.profiler.phase("logging") : return self.file.write(text)
+
+    def __getattr__(self, name) :
+        return getattr(self.file, name)
+
+
+# Class that measures where the time of the synchronization is spent, with the --profile and --cprofile options
+# The phases are measured with a monotonic clock in the thread that synchronizes the directories, and a phase inside another one is not counted in the outer phase, so the seconds of the phases add up to the time of the process
+# The copies are done by the threads of the copy stage: their phase is the time that the directory waits for them, and the time of each copy is recorded for its file
+# For each directory the seconds of each phase are kept, and only the slowest directories and files are remembered, so the memory does not grow with the tree
+# With --cprofile the directories of a subtree are also profiled with cProfile, the statistics are saved to CPROFILEFILE
+# Each process (the main one and each worker of the pool) has its own profiler, the workers send their results to the main process, which merges them
+class SyncProfiler :
+    """ Measures the time of each phase of the synchronization, of the slowest directories and files, and profiles a subtree with cProfile """
+
+    def __init__(self, options) :
+        self.isEnabled = options.profile
+        self.top = options.profile_top
+        self.phaseSeconds = dict.fromkeys(PROFILE_PHASES, 0.0)
+        self.phaseStack = []
+        self.phaseStart = 0.0
+        self.threadId = threading.get_ident()
+        self.slowestDirectories = []
+        self.slowestFiles = []
+        self.lock = threading.Lock()
+        self.profileDirectory = os.path.abspath(options.cprofile) if options.cprofile is not None else None
+        self.profile = None
+        self.profilePaths = []
+
+    # Method that returns the phase to use in a with statement, it does nothing without --profile or in the threads that do not synchronize the directories
+    def phase(self, name, path=None) :
+        """ Returns the phase to measure in a with statement """
+
+        if not self.isEnabled or threading.get_ident() != self.threadId : return NULL_PROFILE_PHASE
+        return ProfilePhase(self, name, path)
+
+    # Method that starts a phase, the time until now is counted in the phase that contains it
+    def enter_phase(self, name) :
+        now = time.perf_counter()
+        if self.phaseStack : self.phaseSeconds[self.phaseStack[-1]] += now - self.phaseStart
+        self.phaseStack.append(name)
+        self.phaseStart = now
+        return now
+
+    # Method that finishes the current phase, the phase that contains it is measured again from now
+    def exit_phase(self) :
+        now = time.perf_counter()
+        self.phaseSeconds[self.phaseStack.pop()] += now - self.phaseStart
+        self.phaseStart = now
+        return now
+
+    # Method that adds seconds measured outside the phases, the startup of the processes
+    def add_seconds(self, name, seconds) :
+        if self.isEnabled : self.phaseSeconds[name] += seconds
+
+    # Method that records the seconds of a phase of a file, only the slowest ones are kept
+    # It is called by the threads of the copy stage, several records of a file are merged in the report
+    def record_file(self, path, name, seconds) :
+        with self.lock :
+            if len(self.slowestFiles) < self.top * len(PROFILE_PHASES) : heapq.heappush(self.slowestFiles, (seconds, path, name))
+            elif seconds > self.slowestFiles[0][0] : heapq.heapreplace(self.slowestFiles, (seconds, path, name))
+
+    # Method that returns the copy function given, measuring the time of each copy for its file
+    def timed_copy(self, copyFunction) :
+        """ Returns the copy function measured for the report of the slowest files """
+
+        if not self.isEnabled : return copyFunction
+
+        def copy(sourcePath, targetPath) :
+            startTime = time.perf_counter()
+            try :
+                return copyFunction(sourcePath, targetPath)
+            finally :
+                self.record_file(sourcePath, "copy", time.perf_counter() - startTime)
+
+        return copy
+
+    # Method that measures the synchronization of a directory, used in a with statement around it
+    # The work of the directory not included in another phase is counted as compare, and the directory is profiled with cProfile if it is in the subtree of --cprofile
+    @contextlib.contextmanager
+    def directory(self, sourceDirectory) :
+        """ Measures the synchronization of a directory """
+
+        isProfiled = self.profileDirectory is not None and (os.path.abspath(sourceDirectory) + os.sep).startswith(self.profileDirectory.rstrip(os.sep) + os.sep)
+        if isProfiled :
+            if self.profile is None : self.profile = cProfile.Profile()
+            self.profile.enable()
+
+        if not self.isEnabled :
+            try :
+                yield
+            finally :
+                if isProfiled : self.profile.disable()
+            return
+
+        startSeconds = dict(self.phaseSeconds)
+        with self.phase("compare") as directoryPhase :
+            try :
+                yield
+            finally :
+                if isProfiled : self.profile.disable()
+
+        seconds = time.perf_counter() - directoryPhase.startTime
+        phaseSeconds = { name : self.phaseSeconds[name] - startSeconds[name] for name in PROFILE_PHASES }
+        if len(self.slowestDirectories) < self.top : heapq.heappush(self.slowestDirectories, (seconds, sourceDirectory, phaseSeconds))
+        elif seconds > self.slowestDirectories[0][0] : heapq.heapreplace(self.slowestDirectories, (seconds, sourceDirectory, phaseSeconds))
+
+    # Method that returns the results of the profiler of a process, so that the main process can merge them
+    # The statistics of cProfile are saved to a file of the process
+    def results(self) :
+        """ Returns the results of the profiler to merge them in the main process """
+
+        if self.profile is not None :
+            path = f"{CPROFILEFILE}.{os.getpid()}"
+            self.profile.dump_stats(path)
+            self.profilePaths.append(path)
+            self.profile = None
+
+        return { "phaseSeconds" : self.phaseSeconds, "slowestDirectories" : self.slowestDirectories, "slowestFiles" : self.slowestFiles, "profilePaths" : self.profilePaths }
+
+    # Method that merges the results of the profiler of a worker of the pool
+    def merge(self, results) :
+        """ Merges the results of the profiler of another process """
+
+        for name in PROFILE_PHASES : self.phaseSeconds[name] += results["phaseSeconds"][name]
+        for directory in results["slowestDirectories"] :
+            if len(self.slowestDirectories) < self.top : heapq.heappush(self.slowestDirectories, directory)
+            elif directory[0] > self.slowestDirectories[0][0] : heapq.heapreplace(self.slowestDirectories, directory)
+        for seconds, path, name in results["slowestFiles"] : self.record_file(path, name, seconds)
+        self.profilePaths.extend(results["profilePaths"])
+
+    # Method that writes the report of the run in the log file: the seconds of each phase, the slowest directories and files with their dominant phase, and the functions that took more time in the subtree of --cprofile
+    def write_report(self, file) :
+        """ Writes the report of the profiler in the log file """
+
+        results = self.results()
+
+        if self.isEnabled :
+
+            totalSeconds = sum(self.phaseSeconds.values())
+            file.write(f"\nPROFILE OF THE RUN : {totalSeconds:.3f} seconds measured in the processes\n")
+            for name in PROFILE_PHASES :
+                file.write(f"Phase {name} : {self.phaseSeconds[name]:.3f} seconds ({self.phaseSeconds[name] / totalSeconds * 100 if totalSeconds > 0 else 0:.1f}%)\n")
+
+            file.write(f"\nTHE {len(self.slowestDirectories)} SLOWEST DIRECTORIES :\n")
+            for seconds, directory, phaseSeconds in sorted(self.slowestDirectories, reverse=True) :
+                dominantPhase = max(PROFILE_PHASES, key=lambda name : phaseSeconds[name])
+                file.write(f"{seconds:.3f} seconds : {directory} (dominant phase {dominantPhase}, {phaseSeconds[dominantPhase]:.3f} seconds)\n")
+
+            # The seconds of the phases of each file are added, and its dominant phase is the one with more seconds
+            files = {}
+            for seconds, path, name in self.slowestFiles :
+                phaseSeconds = files.setdefault(path, {})
+                phaseSeconds[name] = phaseSeconds.get(name, 0.0) + seconds
+            slowestFiles = sorted(files.items(), key=lambda item : sum(item[1].values()), reverse=True)[:self.top]
+            file.write(f"\nTHE {len(slowestFiles)} SLOWEST FILES :\n")
+            for path, phaseSeconds in slowestFiles :
+                dominantPhase = max(phaseSeconds, key=phaseSeconds.get)
+                file.write(f"{sum(phaseSeconds.values()):.3f} seconds : {path} (dominant phase {dominantPhase}, {phaseSeconds[dominantPhase]:.3f} seconds)\n")
+
+        # The statistics of cProfile of all the processes are merged in a single file
+        if results["profilePaths"] :
+            statistics = pstats.Stats(*results["profilePaths"], stream=file)
+            statistics.dump_stats(CPROFILEFILE)
+            for path in results["profilePaths"] : os.remove(path)
+            file.write(f"\nPROFILE OF THE SUBTREE {self.profileDirectory} SAVED TO {CPROFILEFILE}, THE FUNCTIONS WITH MORE CUMULATIVE TIME :\n")
+            statistics.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(CPROFILE_REPORT_LINES)
+            print(f"The profile of the subtree {self.profileDirectory} has been saved to {CPROFILEFILE}")
+
+        elif self.profileDirectory is not None :
+            file.write(f"\nNo directory of the subtree {self.profileDirectory} has been synchronized, there is no profile\n")
+
+
+# Phase that measures nothing, used without --profile
+NULL_PROFILE_PHASE = contextlib.nullcontext()
+
+# Number of functions of the statistics of cProfile written in the log file
+CPROFILE_REPORT_LINES = 30
+
+
+
+# Class that holds the options of the command line and the resources of the process used to synchronize the directories
+# Each process (the main one and each worker of the pool) creates its own context, since the threads and files cannot be shared between processes
+class SynchronizationContext :
+    """ Options of the command line and resources of the process used to synchronize the directories """
+
+    def __init__(self, options) :
+        self.options = options
+        set_io_throttle(options)
+        # With --plan, the copies are written to the plan instead of being done
+        self.plan = SyncPlan(options.plan, options.sourceDirectory, options.targetDirectory) if options.plan is not None else None
+        # With --durability batch or strict, the whole copies of the files are flushed to the disk before they are renamed to their names
+        self.durableCopier = DurableCopier(options.durability, options.sync_batch) if options.durability != "none" and self.plan is None else None
+        # With --large-file-mb, the copy stage has a lane for the small files and another for the large files
+        largeFileSize = options.large_file_mb * 1024 * 1024 if options.large_file_mb is not None else None
+        self.copyStage = self.plan if self.plan is not None else CopyStage(options.copy_threads, options.inflight_mb * 1024 * 1024, largeFileSize, options.large_copy_threads)
+        self.manifest = SyncManifest(MANIFESTFILE) if options.manifest else None
+        self.hashCache = HashCache(HASHCACHEFILE, options.hash_threads) if options.checksum else None
+        self.hardLinks = HardLinkMap(HARDLINKSFILE) if options.hard_links else None
+        self.checkpoint = SyncCheckpoint(CHECKPOINTFILE) if options.checkpoint else None
+        self.treeRemover = TreeRemover(options.delete_threads)
+        # With --trash, the obsolete entries are moved to the trash directory of the run instead of being deleted, nothing is moved with --plan
+        self.trash = TrashDirectory(options.trash_directory, options.targetDirectory, self.treeRemover, options.trash == "purge") if options.trash is not None and self.plan is None else None
+        # With --profile and --cprofile, the time of the phases of the synchronization is measured
+        self.profiler = SyncProfiler(options)
+
+    # Method that frees the resources of the process
+    def close(self) :
+        self.copyStage.shutdown()
+        if self.durableCopier is not None : self.durableCopier.close()
+        if self.trash is not None : self.trash.close()
+        self.treeRemover.shutdown()
+        if self.manifest is not None : self.manifest.close()
+        if self.hashCache is not None : self.hashCache.close()
+        if self.hardLinks is not None : self.hardLinks.close()
+        if self.checkpoint is not None : self.checkpoint.close()
+
+
+
+# Function that submits the copy of a file that exists in the destination directory but is different, with the copy chosen by the options
+# With --in-place, the files with the same size are updated writing only the blocks that differ
+# With --delta, the big files are copied transferring only the blocks that differ
+def submit_modified_file_copy(sourcePath, targetPath, sourceFileSize, targetFileSize, context) :
+    """ Submits the copy of a modified file and returns its future """
+
+    if context.options.in_place and sourceFileSize == targetFileSize :
+        with context.profiler.phase("copy") : return context.copyStage.submit(sourcePath, targetPath, sourceFileSize, "copiedFoundFiles", context.profiler.timed_copy(functools.partial(in_place_update_file, blockSize=context.options.in_place_block_kb * 1024)))
+    if context.options.delta and sourceFileSize >= context.options.delta_threshold_mb * 1024 * 1024 :
+        if context.checkpoint is not None : context.checkpoint.start_copy(targetPath)
+        with context.profiler.phase("copy") : return context.copyStage.submit(sourcePath, targetPath, sourceFileSize, "copiedFoundFiles", context.profiler.timed_copy(functools.partial(delta_copy_file, blockSize=context.options.delta_block_kb * 1024)))
+    return submit_file_copy(sourcePath, targetPath, sourceFileSize, "copiedFoundFiles", context)
+
+
+# Function that submits the whole copy of a file to the copy stage and returns its future
+# With --checkpoint the copy is recorded in the journal and done to a temporary name, and with --durability it is flushed to the disk before it is renamed
+def submit_file_copy(sourcePath, targetPath, sourceFileSize, statisticName, context) :
+    """ Submits the copy of a file and returns its future """
+
+    if context.plan is not None : return context.copyStage.submit(sourcePath, targetPath, sourceFileSize, statisticName)
+
+    # With --durability batch or strict the copy is done by the durable copier, which also uses a temporary name
+    copyFunction = copy_file
+    if context.durableCopier is not None : copyFunction = context.durableCopier.copy
+    elif context.checkpoint is not None : copyFunction = copy_file_to_temporary
+
+    if context.checkpoint is not None : context.checkpoint.start_copy(targetPath)
+    with context.profiler.phase("copy") : return context.copyStage.submit(sourcePath, targetPath, sourceFileSize, statisticName, context.profiler.timed_copy(copyFunction))
+
+
+
+# Function that returns the names of the files and subdirectories of a directory with the size of the files, used to compare the contents of two directories when the renames are detected
+def directory_signature(path) :
+    """ Returns the set of (name, size) of the entries of a directory, the size of the subdirectories is None """
+    return { (entry.name.translate(SQUARE_BRACKETS_TABLE), None if entry.is_dir() else entry.stat().st_size) for entry in scan_directory(path) }
+
+
+# Function that detects the files and directories renamed in the source directory, and renames them in the destination directory before they are compared, instead of copying them with the new name and deleting them with the old name
+# Only the entries that are only in the source directory or only in the destination directory are candidates: a file matches a file of the destination directory with the same size and modification time, confirmed by their digests with --checksum
+# A directory matches the directory of the destination directory that shares more entries (name and size) with it, at least half of them, the differences are synchronized when the directory is processed
+# It returns the entries of the destination directory after the renames, sorted by name, and the number of renames
+def detect_renames(sourceDirectory, targetDirectory, sourceEntries, targetEntries, file, context) :
+    """ Renames in the destination directory the entries renamed in the source directory and returns (targetEntries, renames) """
+
+    sourceOnlyEntries = []
+    targetOnlyEntries = []
+    for sourceEntry, targetEntry in merge_entries(sourceEntries, targetEntries) :
+        if targetEntry is None : sourceOnlyEntries.append(sourceEntry)
+        elif sourceEntry is None : targetOnlyEntries.append(targetEntry)
+
+    if not sourceOnlyEntries or not targetOnlyEntries : return targetEntries, 0
+
+    # The files of the destination directory are indexed by their size, and the directories are listed only if there is a directory to match
+    targetFilesBySize = {}
+    targetDirectories = []
+    for targetEntry in targetOnlyEntries :
+        if targetEntry.is_dir() : targetDirectories.append(targetEntry)
+        else : targetFilesBySize.setdefault(targetEntry.stat().st_size, []).append(targetEntry)
+    targetSignatures = {}
+
+    renamedEntries = {}
+
+    for sourceEntry in sourceOnlyEntries :
+
+        try :
+
+            matchedEntry = None
+
+            if not sourceEntry.is_dir() :
+
+                sourceStat = sourceEntry.stat()
+                for targetEntry in targetFilesBySize.get(sourceStat.st_size, []) :
+                    if abs(sourceStat.st_mtime_ns - targetEntry.stat().st_mtime_ns) > context.options.mtime_tolerance_ns : continue
+                    if context.hashCache is not None and context.hashCache.submit(sourceEntry.path).result() != context.hashCache.submit(targetEntry.path).result() : continue
+                    matchedEntry = targetEntry
+                    targetFilesBySize[sourceStat.st_size].remove(targetEntry)
+                    break
+
+            elif targetDirectories :
+
+                sourceSignature = directory_signature(sourceEntry.path)
+                bestMatches = 0
+                for targetEntry in targetDirectories :
+                    if targetEntry.path not in targetSignatures : targetSignatures[targetEntry.path] = directory_signature(targetEntry.path)
+                    matches = len(sourceSignature & targetSignatures[targetEntry.path])
+                    if matches > bestMatches and matches * 2 >= len(sourceSignature) :
+                        matchedEntry = targetEntry
+                        bestMatches = matches
+                if matchedEntry is not None : targetDirectories.remove(matchedEntry)
+
+            if matchedEntry is None : continue
+
+            # The entry of the destination directory takes the name that the entry of the source directory will have, without square brackets
+            targetName = sourceEntry.name.translate(SQUARE_BRACKETS_TABLE)
+            targetPath = os.path.join(targetDirectory, targetName)
+            kind = "Directory" if sourceEntry.is_dir() else "File"
+            print(f"{targetDirectory.upper()} : {kind} {matchedEntry.path} was renamed to {sourceEntry.name} in the source directory, it is renamed to {targetPath}")
+            file.write(f"{targetDirectory.upper()} : {kind} {matchedEntry.path} was renamed to {sourceEntry.name} in the source directory, it is renamed to {targetPath}\n")
+            os.rename(matchedEntry.path, targetPath)
+
+            # The records of the manifest of a directory renamed are kept with its old path, they are deleted
+            if sourceEntry.is_dir() and context.manifest is not None : context.manifest.forget_tree(os.path.join(sourceDirectory, matchedEntry.name), matchedEntry.path)
+
+            # The renamed entry keeps the stat of the file, which does not change with the rename
+            renamedEntries[matchedEntry.name] = ManifestEntry(targetDirectory, targetName, matchedEntry.is_dir(), None if matchedEntry.is_dir() else matchedEntry.stat())
+
+        except AppError as error :
+            AppError_handler(error)
+
+        except Exception as error :
+            general_exception_handler(error)
+
+    if not renamedEntries : return targetEntries, 0
+
+    targetEntries = [ renamedEntries.get(targetEntry.name, targetEntry) for targetEntry in targetEntries ]
+    return sorted(targetEntries, key=lambda entry : entry.name), len(renamedEntries)
+
+
+
+# Function that synchronizes a single directory, it is the work that each child process of the script used to do for its directory
+# It copies the files of the source directory that are not in the target directory or that are different, and it deletes from the target directory the files and directories that are not in the source directory
+# It does not go down into the subdirectories, it returns them so that the caller decides how to process them, together with the statistics of the directory
+# The argument isRootDirectory indicates if the directory is the one received from the command line, in that case the target directory must exist; otherwise it is created as the child processes did
+def synchronize_directory(sourceDirectory, targetDirectory, isRootDirectory, file, context) :
+    """ Synchronizes a single directory and returns its statistics and the list of (sourcePath, targetPath) of its subdirectories """
+
+    # Variables for task statistics
+    statistics = new_statistics()
+
+    # List of the subdirectories of the source directory, they are returned so that they are processed after this directory
+    subdirectories = []
+
+    # With --plan nothing is done, the messages tell what would be done
+    operationVerb = "would be" if context.plan is not None else "is"
+
+    # The source directory does not exist.
+    if not os.path.exists(sourceDirectory) :
+        # If the source directory does not exist, we print an error message and raise an exception with an appropriate error code, since the synchronization process cannot continue if the source directory does not exist, and it is important to provide useful information to the user about what went wrong, so that they can fix the problem and run the script again successfully.
+        errorCode = 3
+        errorText = f"The source directory {sourceDirectory} does not exist"
+        raise AppError(errorText, errorCode)
+
+    # The destination directory does not exist.
+    isTargetCreated = False
+    if not os.path.exists(targetDirectory) :
+
+        if not isRootDirectory :
+
+            # If the destination directory does not exist, we print a message indicating that it does not exist and that it is being created, both in the console and in the log file, and then we create the destination directory, since it is necessary for the synchronization process to continue, and it is better to create the destination directory if it does not exist than to raise an error and stop the synchronization process
+            print(f"The destination directory {targetDirectory} does not exist, it {operationVerb} created")
+            file.write(f"\nThe destination directory {targetDirectory} does not exist, it {operationVerb} created\n")
+            if context.plan is not None : context.plan.mkdir(targetDirectory)
+            else : os.mkdir(targetDirectory)
+            isTargetCreated = True
+
+        else :
+
+            # If the destination directory does not exist, we print an error message and raise an exception with an appropriate error code, since the synchronization process cannot continue if the destination directory does not exist, and it is important to provide useful information to the user about what went wrong, so that they can fix the problem and run the script again successfully.
+            errorCode = 4
+            errorText = f"The destination directory {targetDirectory} does not exist"
+            raise AppError(errorText, errorCode)
+
+    # print(f"\nSEARCHING FOR FILES IN {sourceDirectory} :" )
+    file.write(f"\nSEARCHING FOR FILES IN {sourceDirectory} : \n")
+
+    # With the manifest, the modification time of the source directory is taken before it is listed, and if both directories have not changed since the last run the listings are taken from the manifest
+    # The entries of the directory are collected to record them in the manifest if the directory is synchronized without errors
+    with context.profiler.phase("listdir") :
+        sourceMtimeNs = os.stat(sourceDirectory).st_mtime_ns if context.manifest is not None else None
+        recordedListings = context.manifest.lookup(sourceDirectory, targetDirectory, sourceMtimeNs) if context.manifest is not None and not isTargetCreated else None
+    manifestEntries = []
+    hasErrors = False
+
+    # Each side is listed once, the source entries are sorted by their name without square brackets, which is the name they will have in the destination directory
+    # A directory of the destination directory just created is empty, so it is not listed
+    if recordedListings is not None : sourceEntries, targetEntries = recordedListings
+    else :
+        with context.profiler.phase("listdir") :
+            sourceEntries = sorted(scan_directory(sourceDirectory), key=lambda entry : entry.name.translate(SQUARE_BRACKETS_TABLE))
+            targetEntries = scan_directory(targetDirectory) if not isTargetCreated else []
+
+        # The trash directory of --trash is not part of the destination tree
+        if os.path.normpath(targetDirectory) == os.path.normpath(context.options.targetDirectory) :
+            targetEntries = [ entry for entry in targetEntries if entry.name != TRASHDIRECTORYNAME ]
+
+        # With --detect-renames, the entries renamed in the source directory are renamed in the destination directory before the copies and the deletions
+        if context.options.detect_renames and not isTargetCreated :
+            targetEntries, statistics["targetRenamedFilesAndDir"] = detect_renames(sourceDirectory, targetDirectory, sourceEntries, targetEntries, file, context)
+
+    # Entries of the destination directory once the files have been copied, in name order, as the destination directory was listed again after the copies
+    # Each item is (name, path, isDirectory, existsInSource, copy), where copy is the pending copy of a file that did not exist in the destination directory, it is only listed if the copy finishes without errors
+    targetItems = []
+
+    # Files with the same size and modification date in both directories whose digests are being computed, with --checksum
+    pendingComparisons = []
+
+    # Files to link to the file of the destination directory of their inode once the copies have finished, with --hard-links
+    pendingLinks = []
+
+    # If there are no files in the source directory, we print a message and skip to the next step, which is to check the destination directory for files that do not exist in the source directory.
+    # Otherwise, we continue with the synchronization process.
+    if len(sourceEntries) == 0 :
+
+        #print(f"There are no files in {sourceDirectory} :" )
+        file.write(f"There are no files in {sourceDirectory} : \n")
+
+    # Both sorted listings are traversed together, so that each name is found in one side, in the other side or in both without looking for it
+    # The copies, the directories to process and the files and directories to delete are decided in this single pass
+    for sourceEntry, targetEntry in merge_entries(sourceEntries, targetEntries) :
+
+        # The entries of the destination directory are listed in its pass, the ones that are not in the source directory will be deleted
+        if targetEntry is not None : targetItems.append((targetEntry.name, targetEntry.path, targetEntry.is_dir(), sourceEntry is not None, None))
+
+        # The entry only exists in the destination directory
+        if sourceEntry is None : continue
+
+        try :
+
+            # Incrementing the total number of files and directories found in the source directory, including directories, which will be processed later in the script.
+            # This variable is used for statistics at the end of the script.
+            statistics["foundFilesAndDir"] += 1
+
+            # For each SOURCE file, the name and the path are extracted, the size and modification date are only needed for the files
+            # They are taken from a single stat of the entry, before it is renamed, since the entry keeps its old path
+            sourceName = sourceEntry.name
+            sourcePath = sourceEntry.path
+            isSourceDirectory = sourceEntry.is_dir()
+            if not isSourceDirectory :
+                with context.profiler.phase("stat", sourcePath) : sourceStat = sourceEntry.stat()
+            else : sourceStat = None
+
+            # Files with square brackets cause problems, so they are replaced with hyphens. also applies to directories, since they will be processed later in the script, and if they have square brackets, they will cause problems when trying to access them.
+            # This is done before processing the files, so we are sure that all the files and directories that we process do not have square brackets, and we do not have to worry about them later in the script.
+            # If we did this after processing the files, we would have to worry about files and directories with square brackets that we have already processed, which would complicate the script and make it less efficient.
+            # With --plan the rename is written to the plan, which --apply does before the copies, and until then the file keeps its name in the source directory
+            sourceNameModified = sourceName.translate(SQUARE_BRACKETS_TABLE)
+            if sourceName != sourceNameModified :
+                print(f"File {sourceName} contains square brackets, it {operationVerb} renamed to {sourceNameModified}")
+                file.write(f"File {sourceName} contains square brackets, it {operationVerb} renamed to {sourceNameModified}\n")
+                if context.plan is None :
+                    os.rename(sourcePath, os.path.join(sourceDirectory, sourceNameModified))
+                    sourcePath = os.path.join(sourceDirectory, sourceNameModified)
+                else : context.plan.rename(sourcePath, sourceNameModified)
+                sourceName = sourceNameModified
+
+            # The path of the file in the destination directory is constructed, and it is checked if it exists.
+            # If it exists, the number of files found in the destination directory is incremented, and its size and modification date are compared with those of the source file.
+            # If they are the same, it is not copied, and the number of files not copied is incremented.
+            # If they are different, it is copied, and the number of files copied is incremented.
+            # If it does not exist, it is copied, and the number of files copied is incremented.
+            targetPath = os.path.join(targetDirectory, sourceName)
+
+            # If the file is not a directory, otherswise it will be processed later in the script
+            if not isSourceDirectory :
+
+                # Incrementing the number of files found in the source directory, excluding directories, this variable is used for statistics at the end of the script.
+                statistics["foundFiles"] += 1
+
+                sourceFileSize = sourceStat.st_size
+                sourceFileModificationTime = sourceStat.st_mtime_ns
+
+                # With --hard-links, a file with more than one link whose inode has already been found in this run is linked to the file of the destination directory of that inode, instead of being copied
+                # The link is done once the copies of the directory have finished, the first file of the inode could be one of them
+                linkedPath = context.hardLinks.claim(sourceStat, targetPath) if context.hardLinks is not None and sourceStat.st_nlink > 1 else None
+
+                if linkedPath is not None :
+
+                    link = concurrent.futures.Future()
+                    pendingLinks.append((sourcePath, targetPath, linkedPath, targetEntry is not None, link))
+                    if targetEntry is None : targetItems.append((sourceName, targetPath, False, True, link))
+
+                # If the file exists in the destination directory, we check if it has the same size and modification date as the source file.
+                # If it does, it is not copied.
+                # If it does not, it is copied.
+                # In both cases, a message is printed indicating what happened, and the corresponding statistics are updated.
+                elif targetEntry is not None :
+
+                    # If the file exists in the destination directory...
+                    with context.profiler.phase("stat", sourcePath) : targetStat = targetEntry.stat()
+                    targetFileSize = targetStat.st_size
+                    targetFileModificationTime = targetStat.st_mtime_ns
+
+                    # The modification dates are compared in nanoseconds, and they are the same if they differ up to the tolerance, by default the granularity of the timestamps of the destination filesystem (2 seconds in FAT, 10 ms in exFAT...)
+                    isSameFile = sourceFileSize == targetFileSize and abs(sourceFileModificationTime - targetFileModificationTime) <= context.options.mtime_tolerance_ns
+
+                    # If the file exists in the destination directory and has the same size and modification date as the source file...
+                    # With --checksum, their contents are compared once the digests of both files have been computed by the threads of the hash cache
+                    if isSameFile and context.hashCache is not None :
+
+                        pendingComparisons.append((sourcePath, targetPath, sourceFileSize, context.hashCache.submit(sourcePath), context.hashCache.submit(targetPath)))
+
+                    elif isSameFile :
+
+                        #print(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory with the same size and modification time, it is not copied")
+                        file.write(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory with the same size and modification time, it is not copied\n")
+                        statistics["notCopiedFoundFiles"] += 1
+
+                    else :
+
+                        # The file exists in the destination directory but has a different size or modification date...
+                        print(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory but with different size or modification time, it {operationVerb} copied")
+                        file.write(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory but with different size or modification time, it {operationVerb} copied\n")
+                        submit_modified_file_copy(sourcePath, targetPath, sourceFileSize, targetFileSize, context)
+
+                else :
+
+                    # The file does not exist in the destination directory, it is copied, and a message is printed indicating that it does not exist in the destination directory, so it is copied.
+                    # The new file will be listed in the pass of the destination directory if its copy finishes without errors
+                    print(f"{sourceDirectory.upper()} : File {sourcePath} does not exist in the destination directory, it {operationVerb} copied")
+                    file.write(f"{sourceDirectory.upper()} : File {sourcePath} does not exist in the destination directory, it {operationVerb} copied\n")
+                    copy = submit_file_copy(sourcePath, targetPath, sourceFileSize, "copiedNotFoundFiles", context)
+                    targetItems.append((sourceName, targetPath, False, True, copy))
+
+            # Incrementing the number of directories found in the source directory, excluding files, this variable is used for statistics at the end of the script.
+            # The directory is stored to be processed after this directory, as the child processes of the script used to do
+            else :
+                statistics["foundDirectories"] += 1
+                subdirectories.append((sourcePath, targetPath))
+
+            manifestEntries.append((sourceName, isSourceDirectory))
+
+        except AppError as error :
+            AppError_handler(error)
+            continue
+
+        except Exception as error :
+            general_exception_handler(error)
+            hasErrors = True
+            continue
+
+    # With --checksum, the files with the same size and modification date are copied if their digests are different
+    for sourcePath, targetPath, sourceFileSize, sourceDigest, targetDigest in pendingComparisons :
+
+        try :
+
+            with context.profiler.phase("compare", sourcePath) : isSameContents = sourceDigest.result() == targetDigest.result()
+
+            if isSameContents :
+
+                file.write(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory with the same size, modification time and contents, it is not copied\n")
+                statistics["notCopiedFoundFiles"] += 1
+
+            else :
+
+                print(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory with the same size and modification time but different contents, it {operationVerb} copied")
+                file.write(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory with the same size and modification time but different contents, it {operationVerb} copied\n")
+                future = submit_modified_file_copy(sourcePath, targetPath, sourceFileSize, sourceFileSize, context)
+                if context.plan is None :
+                    isAtItsName = context.durableCopier is None or context.durableCopier.level == "strict"
+                    future.add_done_callback(functools.partial(context.hashCache.record_copy, targetPath, sourceDigest.result(), isAtItsName))
+
+        except Exception as error :
+            general_exception_handler(error)
+            hasErrors = True
+
+    # Printing the statistics for the source directory, including the total number of files and directories found in the source directory, the number of files found in the source directory, the number of files found in the source directory that already exist in the destination directory, the number of files found in the source directory that already exist in the destination directory but are not copied because they have the same size and modification date, and the number of files found in the source directory that are copied to the destination directory.
+    # The copies of the directory must be finished before its statistics are printed
+    # These statistics are printed only in the log file.
+    with context.profiler.phase("copy") :
+        if context.copyStage.wait(statistics, file) > 0 : hasErrors = True
+
+        # With --durability batch, the copies of the directory are flushed to the disk and renamed before the directory is finished
+        if context.durableCopier is not None and context.durableCopier.flush() > 0 : hasErrors = True
+
+    # With --hard-links, the inodes claimed by the files of the directory are recorded now that their copies are at their names
+    if context.hardLinks is not None : context.hardLinks.commit(hasErrors)
+
+    # With --hard-links, the files whose inode was already found are linked, unless they are already a link of the same file
+    # If the first file of the inode does not exist in the destination directory (its copy failed, or another process of the pool has not copied it yet) the file is copied
+    for sourcePath, targetPath, linkedPath, isTargetFound, link in pendingLinks :
+
+        try :
+
+            if isTargetFound and os.path.samefile(targetPath, linkedPath) :
+
+                file.write(f"{sourceDirectory.upper()} : File {sourcePath} already exists in the destination directory as a hard link of {linkedPath}, it is not linked\n")
+                statistics["notCopiedFoundFiles"] += 1
+
+            else :
 
                 try :
 
-                    # Printing a message indicating that the file is being processed, both in the console and in the log file.
-                    #print(f"Processing {targetDirectory.upper()} : {fileItem}")
-                    file.write(f"Processing {targetDirectory.upper()} : {fileItem}\n")
+                    print(f"{sourceDirectory.upper()} : File {sourcePath} is a hard link of a file already found, it is linked to {linkedPath}")
+                    file.write(f"{sourceDirectory.upper()} : File {sourcePath} is a hard link of a file already found, it is linked to {linkedPath}\n")
+                    temporaryPath = targetPath + ".QuickFolderSynchro.link"
+                    with context.profiler.phase("copy", sourcePath) :
+                        os.link(linkedPath, temporaryPath)
+                        os.replace(temporaryPath, targetPath)
+                    statistics["linkedFiles"] += 1
+
+                except FileNotFoundError :
 
-                    # Incrementing the total number of files and directories found in the destination directory, including directories, which will be processed later in the script. 
-                    # This variable is used for statistics at the end of the script.
-                    targetFoundFilesAndDir += 1
+                    print(f"{sourceDirectory.upper()} : File {linkedPath} does not exist, the file {sourcePath} is copied")
+                    file.write(f"{sourceDirectory.upper()} : File {linkedPath} does not exist, the file {sourcePath} is copied\n")
+                    with context.profiler.phase("copy", sourcePath) : description = copy_file(sourcePath, targetPath)
+                    file.write(f"File {targetPath} : {description}\n")
+                    statistics["copiedFoundFiles" if isTargetFound else "copiedNotFoundFiles"] += 1
 
-                    # For each TARGET file, the name is extracted
-                    targetName = fileItem
-                    targetPath = os.path.join(targetDirectory, targetName)                    
+            link.set_result(None)
 
-                    # Changing variables for statistics
-                    if not os.path.isdir(targetPath) : targetFoundFiles += 1
-                    else : targetFoundDirectories += 1
+        except Exception as error :
+            general_exception_handler(error)
+            hasErrors = True
+            link.set_exception(error)
 
-                    # The path of the file in the source directory is constructed...
-                    sourcePath = os.path.join(sourceDirectory, targetName)
+    write_source_statistics(file, sourceDirectory, statistics)
 
-                    # If the file does not exist in the source directory...
-                    if not os.path.exists(sourcePath) :
 
-                        # Incrementing the number of files and directories deleted from the destination directory, this variable is used for statistics at the end of the script.
-                        targetDeletedFilesAndDir += 1
+    # The destination is traversed to remove files that do not exist in the source.
+    # print(f"\nSEARCHING FOR FILES IN {targetDirectory} : " )
+    file.write(f"\nSEARCHING FOR FILES IN {targetDirectory} : \n")
 
-                        # If the file is not a directory, otherwise it will be processed later in the script, it is checked if it exists in the source directory.
-                        if not os.path.isdir(targetPath) :
+    # The files whose copy failed are not in the destination directory
+    targetItems = [ item for item in targetItems if item[4] is None or item[4].exception() is None ]
 
-                            # Incrementing the number of files found in the destination directory but not in the source directory, this variable is used for statistics at the end of the script.
-                            targetFoundFilesNotInSource += 1
+    # If there are no files in the destination directory, we print a message and skip to the end of the script, which is to print the statistics.
+    # Otherwise, we continue with the synchronization process.
+    if len(targetItems) == 0 :
 
-                            # Printing a message indicating that the file exists in the destination directory but does not exist in the source directory, so it is deleted, both in the console and in the log file.
-                            print(f"{targetDirectory.upper()} : File {targetPath} exists in the destination directory but does not exist in the source directory, it is deleted")
-                            file.write(f"{targetDirectory.upper()} : File {targetPath} exists in the destination directory but does not exist in the source directory, it is deleted\n")
+        # print(f"There are no files in {targetDirectory} : " )
+        file.write(f"There are no files in {targetDirectory} : \n")
 
-                            # Deleting the file in the destination directory, since it does not exist in the source directory
-                            os.remove(targetPath)
+    # For each file item in the destination directory, it is known from the merged listings if it exists in the source directory.
+    # If it does not exist, it is deleted.
+    # If it exists, it is not deleted.
+    # In both cases, a message is printed indicating what happened, and the corresponding statistics are updated.
+    for targetName, targetPath, isTargetDirectory, existsInSource, _ in targetItems :
+
+        try :
 
+            # Printing a message indicating that the file is being processed, both in the console and in the log file.
+            #print(f"Processing {targetDirectory.upper()} : {targetName}")
+            file.write(f"Processing {targetDirectory.upper()} : {targetName}\n")
+
+            # Incrementing the total number of files and directories found in the destination directory, including directories, which will be processed later in the script.
+            # This variable is used for statistics at the end of the script.
+            statistics["targetFoundFilesAndDir"] += 1
+
+            # Changing variables for statistics
+            if not isTargetDirectory : statistics["targetFoundFiles"] += 1
+            else : statistics["targetFoundDirectories"] += 1
+
+            # If the file does not exist in the source directory...
+            if not existsInSource :
+
+                # Incrementing the number of files and directories deleted from the destination directory, this variable is used for statistics at the end of the script.
+                statistics["targetDeletedFilesAndDir"] += 1
+
+                # If the file is not a directory, otherwise it will be processed later in the script, it is checked if it exists in the source directory.
+                if not isTargetDirectory :
+
+                    # Incrementing the number of files found in the destination directory but not in the source directory, this variable is used for statistics at the end of the script.
+                    statistics["targetFoundFilesNotInSource"] += 1
+
+                    # Printing a message indicating that the file exists in the destination directory but does not exist in the source directory, so it is deleted, both in the console and in the log file.
+                    print(f"{targetDirectory.upper()} : File {targetPath} exists in the destination directory but does not exist in the source directory, it {operationVerb} deleted")
+                    file.write(f"{targetDirectory.upper()} : File {targetPath} exists in the destination directory but does not exist in the source directory, it {operationVerb} deleted\n")
+
+                    # Deleting the file in the destination directory, since it does not exist in the source directory
+                    # With --trash, the file is moved to the trash directory of the run
+                    with context.profiler.phase("delete", targetPath) :
+                        trashPath = context.trash.move(targetPath) if context.trash is not None else None
+                        if trashPath is not None : file.write(f"{targetDirectory.upper()} : File {targetPath} is moved to {trashPath}\n")
+                        elif context.plan is not None : context.plan.delete(targetPath, False)
+                        else : remove_file(targetPath)
+
+                else :
+
+                    # Printing a message indicating that the directory exists in the destination directory but does not exist in the source directory, so it is deleted
+                    print(f"Directory {targetPath} exists in the destination directory but does not exist in the source directory, it {operationVerb} deleted")
+                    file.write(f"{targetDirectory.upper()} : Directory {targetPath} exists in the destination directory but does not exist in the source directory, it {operationVerb} deleted\n")
+
+                    # Deleting the directory in the destination directory, and its records in the manifest
+                    # The files and directories deleted inside it are added to the numbers of files and directories found in the destination directory but not in the source directory, and to the number of deleted files and directories, these variables are used for statistics at the end of the script.
+                    # With --trash, the directory is moved to the trash directory of the run, and only the directory is counted
+                    with context.profiler.phase("delete", targetPath + os.sep) :
+                        trashPath = context.trash.move(targetPath) if context.trash is not None else None
+                        if trashPath is not None :
+                            file.write(f"{targetDirectory.upper()} : Directory {targetPath} is moved to {trashPath}\n")
+                            statistics["targetFoundDirNotInSource"] += 1
+                        elif context.plan is not None :
+                            context.plan.delete(targetPath, True)
+                            statistics["targetFoundDirNotInSource"] += 1
                         else :
+                            deletedFiles, deletedDirectories = context.treeRemover.remove(targetPath)
+                            statistics["targetFoundFilesNotInSource"] += deletedFiles
+                            statistics["targetFoundDirNotInSource"] += deletedDirectories
+                            statistics["targetDeletedFilesAndDir"] += deletedFiles + deletedDirectories - 1
+                        if context.manifest is not None : context.manifest.forget_tree(os.path.join(sourceDirectory, targetName), targetPath)
 
-                            # Incrementing the number of directories found in the destination directory but not in the source directory, this variable is used for statistics at the end of the script.
-                            targetFoundDirNotInSource += 1
+        except AppError as error :
+            AppError_handler(error)
+            continue
 
-                            # Printing a message indicating that the directory exists in the destination directory but does not exist in the source directory, so it is deleted
-                            print(f"Directory {targetPath} exists in the destination directory but does not exist in the source directory, it is deleted")
-                            file.write(f"{targetDirectory.upper()} : Directory {targetPath} exists in the destination directory but does not exist in the source directory, it is deleted\n")
+        except Exception as error :
+            general_exception_handler(error)
+            hasErrors = True
+            continue
 
-                            # Deleting the directory in the destination directory
-                            shutil.rmtree(targetPath)
 
-                except AppError as error :
-                    AppError_handler(error)
-                    continue
-                
-                except Exception as error :
-                    general_exception_handler(error)
-                    continue
-                        
-
-        # Printing the statistics for the destination directory, including the total number of files and directories found in the destination directory, the number of files found in the destination directory, the number of files found in the destination directory but not in the source directory, the number of directories found in the destination directory but not in the source directory, and the number of files and directories deleted from the destination directory. 
-        # These statistics are printed only in the log file.
-        file.write(f"\nSTATISTICS FOR {targetDirectory} : \n")
-        file.write(f"Total files and directories in target directory: {targetFoundFilesAndDir}\n")
-        file.write(f"Files found in target directory: {targetFoundFiles}\n")
-        file.write(f"Directories found in target directory: {targetFoundDirectories}\n")
-        file.write(f"Files found in target directory but not in source directory then deleted : {targetFoundFilesNotInSource}\n")
-        file.write(f"Directories found in target directory but not in source directory then deleted : {targetFoundDirNotInSource}\n")
-        file.write(f"Files and directories deleted from source directory: {targetDeletedFilesAndDir}\n")
-
-
-        # We trace the origin in search of directories
-        # The directory exists in Destination, already verified
-        # This is done after processing the files, so we are sure that the directories in the destination directory that do not exist in the source directory have already been deleted, so we can be sure that all the directories that exist in the destination directory also exist in the source directory, and we can process them without worrying about deleting them later. 
-        # If we did this before processing the files, we would have to worry about deleting directories that do not exist in the source directory but exist in the destination directory, which would complicate the script and make it less efficient.
-        # The recursive execution of the script for the directories is done at the end of the script, so we have already processed all the files in the source and destination directories
-        # It has been taken outside the with statement because we want to be sure that the log file is closed before we start the recursive execution of the script for the directories, since the recursive execution of the script for the directories will also write to the log file, and if we do not close the log file before starting the recursive execution of the script for the directories, we may have problems with concurrent access to the log file, which could cause errors or inconsistencies in the log file. 
-        # By closing the log file before starting the recursive execution of the script for the directories, we can be sure that there are no problems with concurrent access to the log file, and we can be sure that all the log messages are written correctly to the log file.
-        for fileItem in sorted(os.listdir(sourceDirectory)) :
+    # Printing the statistics for the destination directory, including the total number of files and directories found in the destination directory, the number of files found in the destination directory, the number of files found in the destination directory but not in the source directory, the number of directories found in the destination directory but not in the source directory, and the number of files and directories deleted from the destination directory.
+    # These statistics are printed only in the log file.
+    write_target_statistics(file, targetDirectory, statistics)
+
+    # The directory synchronized without errors is recorded in the manifest, unless its listings were taken from the manifest and nothing has been copied or deleted, then its record is still valid
+    # The record of a directory with errors is deleted
+    if context.manifest is not None :
+        isChanged = recordedListings is None or statistics["copiedFoundFiles"] + statistics["copiedNotFoundFiles"] + statistics["linkedFiles"] + statistics["targetDeletedFilesAndDir"] > 0
+        if hasErrors : context.manifest.forget(sourceDirectory, targetDirectory)
+        elif isChanged : context.manifest.record(sourceDirectory, targetDirectory, sourceMtimeNs, manifestEntries)
+
+    # With --checkpoint, the directory synchronized without errors is recorded in the journal, a run with --resume will not synchronize it again
+    if context.checkpoint is not None and not hasErrors : context.checkpoint.complete(sourceDirectory, targetDirectory, subdirectories)
+
+    return statistics, subdirectories
+
+
+
+
+
+# Function that processes one directory of the tree, writing first the header that the child processes wrote in the log file when it is a subdirectory
+# An AppError or any other exception in the root directory ends the script as always, so it is raised again
+# In a subdirectory it only ended its child process, so the error is shown and empty statistics are returned, so that the rest of the tree is processed
+def process_directory(sourcePath, targetPath, isRootDirectory, isSubdirectory, file, context) :
+    """ Processes one directory of the tree and returns its statistics and its subdirectories """
+
+    # The global variable is updated so that the signal handler can show the directory that is being processed
+    global currentSourceDirectory
+    currentSourceDirectory = sourcePath
+
+    try :
+
+        # The subdirectories write the same header that the child processes wrote in the log file
+        if isSubdirectory :
+
+            # The next directory is going to be processed
+            #print(f"The directory {sourcePath} is going to be processed")
+            file.write(f"\nThe directory {sourcePath} is going to be processed\n")
+            file.write("SOURCE Directory : " + sourcePath + "\n")
+            file.write("TARGET Directory : " + targetPath + "\n")
+
+        # With --resume, a directory synchronized by the interrupted run is not listed again, only its subdirectories are processed
+        if context.checkpoint is not None and context.options.resume :
+            subdirectories = context.checkpoint.lookup(sourcePath)
+            if subdirectories is not None :
+                file.write(f"The directory {sourcePath} was synchronized by the interrupted run, it is skipped\n")
+                return new_statistics(), subdirectories
+
+        with context.profiler.directory(sourcePath) : return synchronize_directory(sourcePath, targetPath, isRootDirectory, file, context)
+
+    except AppError as error :
+        if isRootDirectory : raise
+        general_exception_handler(error)
+
+    except Exception as error :
+        if isRootDirectory : raise
+        general_exception_handler(error)
+
+    return new_statistics(), []
+
+
+
+# Function executed by each worker process of the pool when the script is launched with --jobs N
+# Each worker keeps its own stack of directories and traverses its subtrees depth first, as the sequential execution does
+# When a worker runs out of directories it announces that it is idle and waits for a directory in the shared queue, and the busy workers give away the bottom of their stacks (the shallowest directories, which usually hold the biggest subtrees) while there are idle workers
+# This way a huge subtree is shared among all the workers instead of leaving the rest of them idle
+# The number of directories found but not processed yet is shared by all the workers, the worker that processes the last one sends the end mark to all the workers
+# The log messages of each directory are stored in memory and written at once, so that the messages of different workers are not mixed inside a directory
+def pool_worker(taskQueue, resultQueue, pendingCount, idleWorkers, options) :
+    """ Worker process of the pool, it synchronizes directories until the whole tree is processed and sends its statistics to the parent """
+
+    # The workers behave as the child processes of the script when a signal is received, the parent process is the one that cleans up the children
+    signal.signal(signal.SIGTERM, lambda s, f: signal_handler(s, f, True, currentSourceDirectory))
+    signal.signal(signal.SIGINT, lambda s, f: signal_handler(s, f, True, currentSourceDirectory))
+
+    # Accumulated statistics of all the directories processed by this worker
+    totalStatistics = new_statistics()
+
+    # The worker creates its own resources to synchronize the directories
+    context = SynchronizationContext(options)
+
+    # With --profile, the startup of the worker is the time since the pool was launched, and the writes to the screen are measured
+    context.profiler.add_seconds("startup", time.monotonic() - options.pool_launch_time)
+    if options.profile : sys.stdout = ProfiledWriter(sys.stdout, context.profiler)
+
+    # Stack of directories owned by this worker
+    localDirectories = []
+
+    with open(LOGFILE, 'a') as logFile :
+
+        file = ProfiledWriter(logFile, context.profiler) if options.profile else logFile
+
+        while True :
+
+            # Without directories of its own the worker waits for a directory given away by another worker, or for the end mark
+            if not localDirectories :
+
+                with idleWorkers.get_lock() : idleWorkers.value += 1
+                task = taskQueue.get()
+                with idleWorkers.get_lock() : idleWorkers.value -= 1
+
+                if task is None : break
+                localDirectories.append(task)
+
+            sourcePath, targetPath = localDirectories.pop()
+
+            # The messages of the directory are stored in memory and written in the log file at once
+            buffer = io.StringIO()
+            statistics, subdirectories = process_directory(sourcePath, targetPath, False, True, ProfiledWriter(buffer, context.profiler) if options.profile else buffer, context)
+            file.write(buffer.getvalue())
+            file.flush()
+            add_statistics(totalStatistics, statistics)
+
+            # The subdirectories are pushed in reverse order so that they are popped sorted by name
+            if subdirectories :
+                with pendingCount.get_lock() : pendingCount.value += len(subdirectories)
+                localDirectories.extend(reversed(subdirectories))
+
+            # One directory is given away to each idle worker, always keeping the next directory of this worker
+            givenAway = min(idleWorkers.value, len(localDirectories) - 1)
+            if givenAway > 0 :
+                for task in localDirectories[:givenAway] : taskQueue.put(task)
+                del localDirectories[:givenAway]
+
+            # The directory is finished, if it was the last one of the tree the end mark is sent to all the workers
+            with pendingCount.get_lock() :
+                pendingCount.value -= 1
+                isTreeFinished = pendingCount.value == 0
+
+            if isTreeFinished :
+                for _ in range(options.jobs) : taskQueue.put(None)
+
+    context.close()
+    resultQueue.put((totalStatistics, context.profiler.results()))
+
+
+
+# Start method of the worker processes of the pool
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+# Function that synchronizes the subdirectories of the root directory in a pool of worker processes and returns their accumulated statistics
+# The workers are daemon processes, so they are finished if the parent process exits, and they are found by the signal handler of the parent process as its children
+# If a worker ends unexpectedly, the directories that it owned would never be finished, so the synchronization is aborted with an error
+# The results of the profilers of the workers are merged in the profiler given
+def synchronize_in_pool(subdirectories, options, profiler) :
+    """ Synchronizes the subdirectories in a pool of worker processes and returns their accumulated statistics """
+
+    # The workers are not forked from this process, which may already have threads (the copy and hash threads, the purge of the trash) holding locks that would stay locked in the children
+    # They are started by the fork server (a clean process started for the pool) where it is available, or as new interpreters on Windows
+    poolContext = multiprocessing.get_context(POOL_START_METHOD)
+
+    # Shared queue of directories waiting for a worker, and queue where the workers send their statistics
+    taskQueue = poolContext.Queue()
+    resultQueue = poolContext.Queue()
+
+    # Number of directories found but not processed yet, and number of workers waiting for a directory
+    pendingCount = poolContext.Value('q', len(subdirectories))
+    idleWorkers = poolContext.Value('i', 0)
+
+    # The subdirectories of the root directory are the first directories to be shared, in name order
+    for task in subdirectories : taskQueue.put(task)
+
+    # Empty the buffers before launching the workers, so that the messages keep their order on screen
+    sys.stdout.flush()
+
+    # The workers measure their startup from the launch of the pool
+    options.pool_launch_time = time.monotonic()
+    workers = [ poolContext.Process(target=pool_worker, args=(taskQueue, resultQueue, pendingCount, idleWorkers, options), daemon=True) for _ in range(options.jobs) ]
+    for worker in workers : worker.start()
+
+    # The statistics of the workers are accumulated as they finish
+    totalStatistics = new_statistics()
+    receivedResults = 0
+    while receivedResults < len(workers) :
+
+        try :
+            statistics, profilerResults = resultQueue.get(timeout=1)
+            add_statistics(totalStatistics, statistics)
+            profiler.merge(profilerResults)
+            receivedResults += 1
+
+        except queue.Empty :
+
+            for worker in workers :
+                if worker.exitcode not in (None, 0) :
+                    errorCode = 5
+                    errorText = f"The worker process {worker.pid} ended unexpectedly with code {worker.exitcode}"
+                    raise AppError(errorText, errorCode)
+
+    for worker in workers : worker.join()
+
+    return totalStatistics
+
+
+
+# Function that synchronizes in this process the subtrees of a list of subdirectories and returns their accumulated statistics
+def synchronize_subdirectories(subdirectories, file, context) :
+    """ Synchronizes the subtrees of the subdirectories in this process and returns their accumulated statistics """
+
+    totalStatistics = new_statistics()
+
+    # Stack of directories pending to be processed, pushed in reverse order so that they are popped sorted by name
+    pendingDirectories = list(reversed(subdirectories))
+
+    while pendingDirectories :
+
+        sourcePath, targetPath = pendingDirectories.pop()
+        statistics, subdirectories = process_directory(sourcePath, targetPath, False, True, file, context)
+        add_statistics(totalStatistics, statistics)
+        pendingDirectories.extend(reversed(subdirectories))
+
+    return totalStatistics
+
+
+
+# Function that synchronizes the whole tree, replacing the recursive execution of the script in a child process for each directory
+# Starting an interpreter for each directory took far more time than the copy itself in deep trees, so the directories are now kept in a stack and processed one after another in this process
+# The stack is filled in reverse order, so the directories are processed in the same order (depth first, sorted by name) as the recursive executions did and the log file keeps the same sequence of messages
+# The directories found in a directory are processed after it, so the directories of the target that do not exist in the source have already been deleted when we go down into them
+# With more than one job the root directory is processed here and its subdirectories are shared by the pool of worker processes; the messages of each directory are kept together, but the directories appear in the log file in the order they are finished
+def synchronize_tree(sourceDirectory, targetDirectory, isRecursiveExecution, options) :
+    """ Synchronizes the whole tree and returns the accumulated statistics """
+
+    # Accumulated statistics of all the directories of the tree
+    totalStatistics = new_statistics()
+
+    # Resources of this process to synchronize the directories
+    context = SynchronizationContext(options)
+
+    # With --profile, the startup of the main process measured by the main block is added, and the writes to the screen and to the log file are measured
+    context.profiler.add_seconds("startup", options.startup_seconds)
+    if options.profile : sys.stdout = ProfiledWriter(sys.stdout, context.profiler)
+
+    #The LOGFILE file is opened for writing during execution
+    with open(LOGFILE, 'a') as logFile :
+
+        file = ProfiledWriter(logFile, context.profiler) if options.profile else logFile
+
+        # The directory received from the command line is processed first
+        # When the script is launched as a child (QUICKFOLDERSYNCHRO_RECURSION) its directory is treated as a subdirectory, so the target directory is created if it does not exist
+        statistics, subdirectories = process_directory(sourceDirectory, targetDirectory, not isRecursiveExecution, False, file, context)
+        add_statistics(totalStatistics, statistics)
+
+        if options.jobs > 1 and subdirectories :
+
+            # Empty the buffer before launching the workers, since they write to the same log file
+            file.flush()
+            add_statistics(totalStatistics, synchronize_in_pool(subdirectories, options, context.profiler))
+
+        else : add_statistics(totalStatistics, synchronize_subdirectories(subdirectories, file, context))
+
+        # Printing the accumulated statistics of the whole tree, only in the log file
+        file.write(f"\nSTATISTICS FOR THE WHOLE TREE {sourceDirectory} : \n")
+        write_source_statistics(file, sourceDirectory, totalStatistics)
+        write_target_statistics(file, targetDirectory, totalStatistics)
+        if options.large_file_mb is not None and options.plan is None : write_lane_statistics(file, totalStatistics)
+
+        # With --profile and --cprofile, the report of the profiler of the whole tree, once the copies have finished
+        context.close()
+        if isinstance(sys.stdout, ProfiledWriter) : sys.stdout = sys.stdout.file
+        if options.profile or options.cprofile is not None : context.profiler.write_report(logFile)
+
+    return totalStatistics
+
+
+
+# Number of copies of a plan submitted to the copy stage before waiting for them, so that the futures of a huge plan are not kept in memory
+APPLY_BATCH_SIZE = 1000
+
+
+# Function that returns the path of an operation of a plan joined to the directory it is relative to
+# A path that resolves outside the directory (with .., an absolute path or a symbolic link in its parents) raises an AppError, so a plan modified or made for another tree cannot touch other files
+def resolve_plan_path(directory, relativePath) :
+    """ Returns the path of an operation of a plan inside its directory """
+
+    path = os.path.normpath(os.path.join(directory, relativePath))
+    if path == directory : return path
+
+    # The entry itself is not resolved, a symbolic link of the plan is copied or deleted as a link
+    realDirectory = os.path.realpath(directory)
+    realParent = os.path.realpath(os.path.dirname(path))
+    if not path.startswith(directory.rstrip(os.sep) + os.sep) or (realParent != realDirectory and not realParent.startswith(realDirectory.rstrip(os.sep) + os.sep)) :
+        errorCode = 7
+        errorText = f"The path {relativePath} of the plan is outside {directory}, the operation is not done"
+        raise AppError(errorText, errorCode)
+    return path
+
+
+# Function that applies a plan written by the --plan option, without listing the directories again
+# The operations are done in the order that is best for the throughput, not in the order of the plan: first the renames of the source names with square brackets, the parents before their subdirectories, since the copies use the new names, then the deletions, which free space, then the directories to create, the parents before their subdirectories, and at last the copies, submitted to the copy stage in blocks of APPLY_BATCH_SIZE
+# The files are copied with the copy chosen by the options of this run (--in-place and --delta for the files to update, --durability for all of them)
+# The paths of the operations are joined to the directories of the plan, an operation outside them is not done
+# It returns the statistics of the operations done
+def apply_plan(planPath, sourceDirectory, targetDirectory, options) :
+    """ Applies a plan and returns its statistics """
+
+    header, summary = summarize_plan(planPath)
+    sourceDirectory = os.path.abspath(sourceDirectory)
+    targetDirectory = os.path.abspath(targetDirectory)
+
+    # A plan can only be applied to the directories it was made for
+    if header.get("sourceDirectory") != sourceDirectory or header.get("targetDirectory") != targetDirectory :
+        errorCode = 7
+        errorText = f"The plan {planPath} was made for {header.get('sourceDirectory')} and {header.get('targetDirectory')}"
+        raise AppError(errorText, errorCode)
+
+    statistics = new_statistics()
+    context = SynchronizationContext(options)
+
+    renames = []
+    deletions = []
+    directories = []
+    copies = []
+
+    with open(planPath, encoding="utf-8") as planFile :
+        planFile.readline()
+        for line in planFile :
+            operation = json.loads(line)
+            if operation[0] == "rename" : renames.append(operation)
+            elif operation[0] == "delete" : deletions.append(operation)
+            elif operation[0] == "mkdir" : directories.append(operation)
+            else : copies.append(operation)
+
+    #The LOGFILE file is opened for writing during execution
+    with open(LOGFILE, 'a') as file :
+
+        write_plan_summary(planPath, summary, file)
+
+        for _, sourcePath, renamedPath in sorted(renames, key=lambda operation : operation[1].count(os.sep)) :
+
+            try :
+
+                sourcePath = resolve_plan_path(sourceDirectory, sourcePath)
+                renamedPath = resolve_plan_path(sourceDirectory, renamedPath)
+                print(f"File {sourcePath} contains square brackets, it is renamed to {renamedPath}")
+                file.write(f"File {sourcePath} contains square brackets, it is renamed to {renamedPath}\n")
+                os.rename(sourcePath, renamedPath)
+
+            except Exception as error :
+                general_exception_handler(error)
+
+        for _, _, targetPath, isDirectory in deletions :
 
             try :
 
-                # For each SOURCE file, the name is extracted
-                sourceName = fileItem
-                sourcePath = os.path.join(sourceDirectory, sourceName)
+                targetPath = resolve_plan_path(targetDirectory, targetPath)
+                print(f"{'Directory' if isDirectory else 'File'} {targetPath} is deleted")
+                file.write(f"{'Directory' if isDirectory else 'File'} {targetPath} is deleted\n")
+                trashPath = context.trash.move(targetPath) if context.trash is not None else None
+                if trashPath is not None :
+                    file.write(f"{'Directory' if isDirectory else 'File'} {targetPath} is moved to {trashPath}\n")
+                    deletedFiles, deletedDirectories = (0, 1) if isDirectory else (1, 0)
+                elif isDirectory : deletedFiles, deletedDirectories = context.treeRemover.remove(targetPath)
+                else :
+                    remove_file(targetPath)
+                    deletedFiles, deletedDirectories = 1, 0
+                statistics["targetDeletedFilesAndDir"] += deletedFiles + deletedDirectories
+                statistics["targetFoundFilesNotInSource"] += deletedFiles
+                statistics["targetFoundDirNotInSource"] += deletedDirectories
+
+            except Exception as error :
+                general_exception_handler(error)
+
+        for _, targetPath in sorted(directories, key=lambda operation : operation[1].count(os.sep)) :
 
-                # The path of the directory in the destination directory is constructed
-                targetPath = os.path.join(targetDirectory, sourceName)
+            try :
 
-                # If the file is a directory, we call the script recursively for that directory. 
-                # If it is not a directory, it has already been processed in the previous steps of the script, so it is skipped.
-                if os.path.isdir(sourcePath) :
+                targetPath = resolve_plan_path(targetDirectory, targetPath)
+                print(f"The destination directory {targetPath} is created")
+                file.write(f"The destination directory {targetPath} is created\n")
+                os.makedirs(targetPath, exist_ok=True)
+
+            except Exception as error :
+                general_exception_handler(error)
+
+        for index, (operationName, size, sourcePath, targetPath) in enumerate(copies) :
+
+            try :
+
+                sourcePath = resolve_plan_path(sourceDirectory, sourcePath)
+                targetPath = resolve_plan_path(targetDirectory, targetPath)
+                print(f"File {sourcePath} is copied to {targetPath}")
+                file.write(f"File {sourcePath} is copied to {targetPath}\n")
+                if operationName == "copy" : submit_file_copy(sourcePath, targetPath, size, "copiedNotFoundFiles", context)
+                else : submit_modified_file_copy(sourcePath, targetPath, size, os.path.getsize(targetPath), context)
 
-                    with open(LOGFILE, 'a') as file :
-    
-                        # The next directory is going to be processed
-                        #print(f"The directory {sourcePath} is going to be processed")
-                        file.write(f"\nThe directory {sourcePath} is going to be processed\n")
-
-                        # Important: Empty the buffer before launching the child
-                        file.flush() 
-                        os.fsync(file.fileno())
-
-                    # We call the script recursively for the directory blocking the execution until it finishes, so that we can be sure that the synchronization of the directory is finished before continuing with the next directory, and we can be sure that the statistics are printed at the end of the script, and we do not have to worry about printing them for each recursive execution, which would complicate the script and make it less efficient. 
-                    # If we did this without blocking the execution, we would have to worry about printing the statistics for each recursive execution, which would complicate the script and make it less efficient.
-                    # The call to subprocess.run is done outside the with statement, so we can be sure that the log file is closed before we start the recursive execution of the script for the directories, since the recursive execution of the script for the directories will also write to the log file, and if we do not close the log file before starting the recursive execution of the script for the directories, we may have problems with concurrent access to the log file, which could cause errors or inconsistencies in the log file. 
-                    # By closing the log file before starting the recursive execution of the script for the directories, we can be sure that there are no problems with concurrent access to the log file, and we can be sure that all the log messages are written correctly to the log file.
-                    # And in a new environment with our custom brand name, so that we can check if the script is being executed recursively in the child execution, and we can skip the confirmation of the destination directory and the printing of the statistics in the child execution, since they are only printed at the end of the script, and we want to print them only once at the end of the script, not for each recursive execution.
-                    # Depending on whether the script is running as an executable (PyInstaller) or as a normal .py script, we call it with the appropriate arguments. 
-                    # If it is running as an executable, we call it with sys.executable, which is the path to the executable, and the source and target paths as arguments. 
-                    # If it is running as a normal .py script, we call it with sys.executable, which is the path to the Python interpreter, and sys.argv[0], which is the path to the script, and the source and target paths as arguments. 
-                    # In both cases, we pass the new environment with our custom brand name to indicate that it is a recursive execution, so that we can skip the confirmation of the destination directory and the printing of the statistics in the child execution.
-
-                    # It is running as an executable (PyInstaller)
-                    if getattr(sys, 'frozen', False): subprocess.run([sys.executable, sourcePath, targetPath], env=new_env, stderr=subprocess.DEVNULL)
-                    # It is running as an executable (Niutka)
-                    elif "__compiled__" in globals() : subprocess.run([sys.argv[0], sourcePath, targetPath], env=new_env, stderr=subprocess.DEVNULL)
-                    # It's running as a normal .py script
-                    else: subprocess.run([sys.executable, sys.argv[0], sourcePath, targetPath], env=new_env, stderr=subprocess.DEVNULL)
-
-            except AppError as error :
-                AppError_handler(error)
-                continue
-        
             except Exception as error :
                 general_exception_handler(error)
-                continue
 
-except AppError as error : AppError_handler(error)
+            if (index + 1) % APPLY_BATCH_SIZE == 0 : context.copyStage.wait(statistics, file)
+
+        context.copyStage.wait(statistics, file)
+        if context.durableCopier is not None : context.durableCopier.flush()
+
+        file.write(f"\nSTATISTICS FOR THE PLAN {planPath} : \n")
+        file.write(f"Number of source files copied to target directory: {statistics['copiedFoundFiles'] + statistics['copiedNotFoundFiles']}\n")
+        file.write(f"Files found in target directory but not in source directory then deleted : {statistics['targetFoundFilesNotInSource']}\n")
+        file.write(f"Directories found in target directory but not in source directory then deleted : {statistics['targetFoundDirNotInSource']}\n")
+        if options.large_file_mb is not None : write_lane_statistics(file, statistics)
+
+    context.close()
+
+    return statistics
+
+
+
+# Events of inotify (linux/inotify.h) used by the --watch option
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# Events watched in each directory of the source tree, the ones that change its entries, the contents or the metadata of its files, or the directory itself
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+# Header of each event read from inotify: wd, mask, cookie and the length of the name that follows it
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+# Class that watches the directories of the source tree with the inotify interface of Linux, called through ctypes
+# Each watched directory has a watch descriptor, the events of a directory are reported with its descriptor and the name of the entry that changed
+class InotifyWatcher :
+    """ Watches directories with Linux inotify """
+
+    def __init__(self) :
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0 : raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Watched directories by watch descriptor and watch descriptors by directory
+        self.directories = {}
+        self.descriptors = {}
+
+    # Method that watches a directory, watching again a directory already watched returns its descriptor
+    # When the limit of watches of the user is reached (fs.inotify.max_user_watches) an AppError is raised, since the changes of the tree could not be detected
+    def add_watch(self, directory) :
+        """ Watches a directory """
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0 :
+            errorNumber = ctypes.get_errno()
+            if errorNumber == errno.ENOSPC :
+                errorCode = 6
+                errorText = f"The limit of inotify watches has been reached watching {directory}, increase fs.inotify.max_user_watches"
+                raise AppError(errorText, errorCode)
+            raise OSError(errorNumber, os.strerror(errorNumber), directory)
+
+        self.directories[wd] = directory
+        self.descriptors[directory] = wd
+
+    # Method that watches a directory and all its subdirectories
+    def add_tree(self, directory) :
+        """ Watches a directory and its subdirectories """
+
+        pendingDirectories = [directory]
+        while pendingDirectories :
+            directory = pendingDirectories.pop()
+            try :
+                self.add_watch(directory)
+                pendingDirectories.extend(entry.path for entry in scan_directory(directory) if entry.is_dir(follow_symlinks=False))
+            except FileNotFoundError : continue
+
+    # Method that stops watching a directory that has been moved or deleted and all the directories below it, they will be watched again with their new paths
+    def remove_tree(self, directory) :
+        """ Stops watching a directory and its subdirectories """
+
+        prefix = directory + os.sep
+        for path in [ path for path in self.descriptors if path == directory or path.startswith(prefix) ] :
+            wd = self.descriptors.pop(path)
+            self.directories.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    # Method that returns the events read in timeout seconds (None waits until there is an event), as a list of (directory, mask, name)
+    # The directory is None for the events of a watch descriptor already removed and for the overflow of the queue
+    def read_events(self, timeout) :
+        """ Reads the pending events """
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable : return []
+
+        events = []
+        buffer = os.read(self.fd, 64 * 1024)
+        offset = 0
+
+        while offset < len(buffer) :
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            name = os.fsdecode(buffer[offset + INOTIFY_EVENT.size : offset + INOTIFY_EVENT.size + length].rstrip(b"\0"))
+            offset += INOTIFY_EVENT.size + length
+            events.append((self.directories.get(wd), mask, name))
+
+        return events
+
+    def close(self) :
+        os.close(self.fd)
 
-except Exception as error : general_exception_handler(error)
\ No newline at end of file
+
+
+# Function that keeps the destination directory synchronized with the source directory, applying the changes detected by inotify (only on Linux)
+# The source tree is watched before the initial synchronization, so that no change made during it is lost
+# The events are coalesced by directory: a directory with any change is synchronized again with the same rules as the rest of the script, which only lists that directory and copies or deletes what has changed
+# The events are debounced: once an event arrives, the events are collected until there are none for delay seconds, or for ten times the delay at most, so a file that is being written is copied once
+# A subdirectory that is not watched is new (created or moved into the tree), its whole subtree is synchronized and watched
+# If the queue of inotify overflows, some events have been lost, so the whole tree is synchronized again
+def watch_tree(sourceDirectory, targetDirectory, isRecursiveExecution, options) :
+    """ Synchronizes the tree and then applies the changes detected by inotify until the script is interrupted """
+
+    watcher = InotifyWatcher()
+    watcher.add_tree(sourceDirectory)
+
+    synchronize_tree(sourceDirectory, targetDirectory, isRecursiveExecution, options)
+
+    # Function that returns the path in the destination directory of a directory of the source tree
+    def target_path_of(sourcePath) :
+        relativePath = os.path.relpath(sourcePath, sourceDirectory)
+        return targetDirectory if relativePath == os.curdir else os.path.join(targetDirectory, relativePath)
+
+    # The directories are synchronized in this process
+    context = SynchronizationContext(options)
+
+    with open(LOGFILE, 'a') as file :
+
+        file.write(f"\nWATCHING {sourceDirectory} FOR CHANGES\n")
+        file.flush()
+
+        while True :
+
+            # The first event is waited without limit, and then the events are collected until the source tree is quiet
+            events = watcher.read_events(None)
+            deadline = time.monotonic() + 10 * options.watch_delay
+            while time.monotonic() < deadline :
+                moreEvents = watcher.read_events(options.watch_delay)
+                if not moreEvents : break
+                events.extend(moreEvents)
+
+            changedDirectories = set()
+            isOverflow = False
+
+            for directory, mask, name in events :
+
+                if mask & IN_Q_OVERFLOW : isOverflow = True
+                if directory is None : continue
+
+                # A directory moved or deleted is not watched anymore, the change is applied by its parent directory
+                if mask & (IN_MOVE_SELF | IN_DELETE_SELF) :
+                    watcher.remove_tree(directory)
+                    continue
+
+                if mask & IN_IGNORED : continue
+                changedDirectories.add(directory)
+
+            try :
+
+                if isOverflow :
+
+                    # Some events have been lost, the whole tree is synchronized and watched again
+                    file.write(f"\nThe queue of inotify has overflowed, the whole tree {sourceDirectory} is synchronized again\n")
+                    watcher.add_tree(sourceDirectory)
+                    statistics, subdirectories = process_directory(sourceDirectory, targetDirectory, False, False, file, context)
+                    synchronize_subdirectories(subdirectories, file, context)
+
+                else :
+
+                    file.write(f"\nCHANGES DETECTED IN {len(changedDirectories)} DIRECTORIES\n")
+
+                    for sourcePath in sorted(changedDirectories) :
+
+                        if not os.path.isdir(sourcePath) or sourcePath not in watcher.descriptors : continue
+
+                        statistics, subdirectories = process_directory(sourcePath, target_path_of(sourcePath), False, sourcePath != sourceDirectory, file, context)
+
+                        # The subdirectories that are not watched are new, their subtrees are synchronized and watched
+                        newSubdirectories = [ (subdirectorySourcePath, subdirectoryTargetPath) for subdirectorySourcePath, subdirectoryTargetPath in subdirectories if subdirectorySourcePath not in watcher.descriptors ]
+                        for subdirectorySourcePath, _ in newSubdirectories : watcher.add_tree(subdirectorySourcePath)
+                        synchronize_subdirectories(newSubdirectories, file, context)
+
+            except AppError as error : AppError_handler(error)
+
+            except Exception as error : general_exception_handler(error)
+
+            file.flush()
+
+
+
+# Parser of the command line arguments, the wrong arguments are reported with an AppError as the script has always done, instead of ending the script with the argparse message
+class ArgumentParser(argparse.ArgumentParser) :
+    """ Parser of the command line arguments that raises an AppError for the wrong arguments """
+
+    def error(self, message) :
+        errorCode = 1
+        errorText = f"Wrong arguments : {message}"
+        raise AppError(errorText, errorCode)
+
+
+# Function that parses the command line arguments
+def parse_arguments(arguments) :
+    """ Parses the command line arguments: the source directory, the destination directory and the options """
+
+    parser = ArgumentParser(description="Synchronizes the destination directory with the source directory")
+    parser.add_argument("sourceDirectory", help="source directory")
+    parser.add_argument("targetDirectory", help="destination directory")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N", help="number of worker processes that share the directories of the tree (default 1, no pool)")
+    parser.add_argument("--copy-threads", type=int, default=1, metavar="N", help="number of threads that copy the files of each directory (default 1, files copied one at a time)")
+    parser.add_argument("--manifest", action="store_true", help=f"keep the state of the synchronized directories in {os.path.basename(MANIFESTFILE)} and do not list the directories that have not changed since the last run")
+    parser.add_argument("--inflight-mb", type=int, default=256, metavar="MB", help="maximum megabytes of the copies submitted but not finished (default 256)")
+    parser.add_argument("--large-file-mb", type=float, metavar="MB", help="copy the files of MB megabytes or bigger in a lane of their own, so the small files are not queued behind them")
+    parser.add_argument("--large-copy-threads", type=int, default=1, metavar="N", help="number of threads of the lane of the large files of --large-file-mb (default 1)")
+
+    parser.add_argument("--delete-threads", type=int, default=4, metavar="N", help="number of threads that delete the subdirectories of a directory of the destination directory that does not exist in the source directory (default 4)")
+
+    parser.add_argument("--trash", choices=("keep", "purge"), help=f"move the files and directories to delete to a trash directory of the run inside the destination directory ({TRASHDIRECTORYNAME}) instead of deleting them; keep: they are deleted by the next run with --trash, purge: they are deleted in the background during this run")
+
+    parser.add_argument("--checksum", action="store_true", help=f"compare the contents of the files with the same size and modification time, the digests are kept in {os.path.basename(HASHCACHEFILE)}")
+    parser.add_argument("--hash-threads", type=int, default=4, metavar="N", help="number of threads that compute the digests of --checksum (default 4)")
+    parser.add_argument("--mtime-tolerance", type=float, metavar="SECONDS", help="modification times that differ up to SECONDS are considered equal (default the granularity of the timestamps of the destination filesystem, detected at the start)")
+    parser.add_argument("--detect-renames", action="store_true", help="rename in the destination directory the files and directories renamed in the source directory, instead of copying and deleting them")
+    parser.add_argument("--hard-links", action="store_true", help="recreate in the destination directory the hard links of the source tree, instead of copying each link as a different file")
+    parser.add_argument("--delta", action="store_true", help="copy the modified files bigger than --delta-threshold-mb transferring only the blocks that differ (rsync algorithm)")
+    parser.add_argument("--delta-threshold-mb", type=int, default=64, metavar="MB", help="minimum size of the files copied with --delta (default 64)")
+    parser.add_argument("--delta-block-kb", type=int, default=128, metavar="KB", help="size of the blocks compared by --delta (default 128)")
+    parser.add_argument("--in-place", action="store_true", help="update the modified files that have the same size writing only the blocks that differ")
+    parser.add_argument("--in-place-block-kb", type=int, default=64, metavar="KB", help="size of the blocks compared by --in-place (default 64)")
+    parser.add_argument("--plan", metavar="FILE", help="do not modify anything, write to FILE the operations of the synchronization (directories to create, files to copy, update and delete, with their bytes) and show their totals")
+    parser.add_argument("--apply", metavar="FILE", help="apply the operations of a plan written by --plan, without listing the directories again")
+    parser.add_argument("--bwlimit", type=float, metavar="MB", help="maximum megabytes per second written by the copies of the whole run")
+    parser.add_argument("--opslimit", type=float, metavar="N", help="maximum copies and deletions of files and directories per second of the whole run")
+    parser.add_argument("--io-class", choices=("idle", "best-effort"), help="I/O scheduling class of the process: idle only uses the disk when no other process needs it, best-effort uses the lowest priority of the normal class")
+    parser.add_argument("--durability", choices=DURABILITY_LEVELS, default="none", help="none: the copies are not flushed to the disk (default); batch: the files are copied to temporary names, flushed with syncfs once per --sync-batch files or per directory and then renamed; strict: each file is flushed with fsync before it is renamed")
+    parser.add_argument("--sync-batch", type=int, default=1000, metavar="N", help="maximum number of files copied before the filesystem is flushed with --durability batch (default 1000)")
+    parser.add_argument("--checkpoint", action="store_true", help=f"record in {os.path.basename(CHECKPOINTFILE)} the directories synchronized and the copies in flight, and copy the files to temporary names, so an interrupted run can be resumed with --resume")
+    parser.add_argument("--resume", action="store_true", help="resume the run interrupted with --checkpoint: its temporary files are deleted and the directories it synchronized are skipped (implies --checkpoint)")
+    parser.add_argument("--profile", action="store_true", help="measure the time of each phase of the synchronization (startup, listdir, stat, compare, copy, delete, logging) and write in the log file a report with their totals and the slowest directories and files with the phase that dominated")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N", help="number of slowest directories and files of the report of --profile (default 10)")
+    parser.add_argument("--cprofile", metavar="DIRECTORY", help=f"profile with cProfile the synchronization of the directories of the subtree DIRECTORY of the source directory, the statistics are saved to {os.path.basename(CPROFILEFILE)} and the functions with more time are written in the log file")
+    parser.add_argument("--watch", action="store_true", help="after the synchronization, keep watching the source tree with inotify (Linux only) and apply its changes")
+    parser.add_argument("--watch-delay", type=float, default=2.0, metavar="SECONDS", help="seconds without changes before the changes detected by --watch are applied (default 2)")
+
+    options = parser.parse_args(arguments)
+
+    if options.jobs < 1 : parser.error("--jobs must be at least 1")
+    if options.copy_threads < 1 : parser.error("--copy-threads must be at least 1")
+    if options.inflight_mb < 1 : parser.error("--inflight-mb must be at least 1")
+    if options.large_file_mb is not None and options.large_file_mb <= 0 : parser.error("--large-file-mb must be greater than 0")
+    if options.large_copy_threads < 1 : parser.error("--large-copy-threads must be at least 1")
+    if options.mtime_tolerance is not None and options.mtime_tolerance < 0 : parser.error("--mtime-tolerance cannot be negative")
+    if options.hash_threads < 1 : parser.error("--hash-threads must be at least 1")
+    if options.delete_threads < 1 : parser.error("--delete-threads must be at least 1")
+    if options.sync_batch < 1 : parser.error("--sync-batch must be at least 1")
+    if options.delta_block_kb < 1 : parser.error("--delta-block-kb must be at least 1")
+    if options.in_place_block_kb < 1 : parser.error("--in-place-block-kb must be at least 1")
+    if options.durability != "none" and (options.in_place or options.delta) : parser.error("--in-place and --delta cannot be used with --durability batch or strict, they modify the destination files instead of renaming a copy flushed to the disk")
+    if options.plan is not None and options.apply is not None : parser.error("--plan and --apply cannot be used together")
+    if options.plan is not None and (options.watch or options.manifest or options.detect_renames or options.hard_links) : parser.error("--plan cannot be used with --watch, --manifest, --detect-renames or --hard-links, they modify the destination directory or depend on it")
+    if options.apply is not None and options.watch : parser.error("--apply cannot be used with --watch")
+    if options.bwlimit is not None and options.bwlimit <= 0 : parser.error("--bwlimit must be greater than 0")
+    if options.opslimit is not None and options.opslimit <= 0 : parser.error("--opslimit must be greater than 0")
+    if options.resume : options.checkpoint = True
+    if options.checkpoint and (options.watch or options.plan is not None or options.apply is not None) : parser.error("--checkpoint and --resume cannot be used with --watch, --plan or --apply")
+    if options.watch and not sys.platform.startswith("linux") : parser.error("--watch needs the inotify interface of Linux")
+    if options.watch_delay <= 0 : parser.error("--watch-delay must be greater than 0")
+    if options.profile_top < 1 : parser.error("--profile-top must be at least 1")
+    if (options.profile or options.cprofile is not None) and (options.watch or options.apply is not None) : parser.error("--profile and --cprofile cannot be used with --watch or --apply, the report is written at the end of the synchronization of the tree")
+
+    return options
+
+
+
+# LOGFILE and LOGERRORFILE are the name of the file where the logs will be stored, it is created in the current directory and overwritten if it already exists
+# Taking from the script name changing the extension to .log; the error file adds the string Error to the file name
+# They are defined at module level, so that the worker processes of the pool also know them
+base_name, _ = os.path.splitext(Path(sys.argv[0]))
+LOGFILE = f"{base_name}.log"
+LOGERRORFILE = f"{base_name}Error.log"
+
+# MANIFESTFILE is the SQLite database used by the --manifest option, next to LOGFILE and kept between runs
+MANIFESTFILE = f"{base_name}Manifest.db"
+
+# HASHCACHEFILE is the SQLite database with the digests of the files compared by the --checksum option, next to LOGFILE and kept between runs
+HASHCACHEFILE = f"{base_name}Hashes.db"
+
+# HARDLINKSFILE is the SQLite database with the inodes found by the --hard-links option, it is only valid during a run
+HARDLINKSFILE = f"{base_name}Links.db"
+
+# TRASHDIRECTORYNAME is the directory of the destination directory where the --trash option moves the files and directories to delete, with a directory for each run
+TRASHDIRECTORYNAME = f".{os.path.basename(base_name)}Trash"
+
+# CHECKPOINTFILE is the SQLite database with the checkpoint journal of the --checkpoint option, it is deleted when a run finishes
+CHECKPOINTFILE = f"{base_name}Checkpoint.db"
+
+# CPROFILEFILE is the file with the statistics of cProfile of the --cprofile option, it can be read with the pstats module
+CPROFILEFILE = f"{base_name}.prof"
+
+# Directory that is being processed, it is updated while the tree is traversed and shown by the signal handler
+currentSourceDirectory = None
+
+
+# From here the script's task is carried out
+# It is only done in the main module, since the worker processes of the pool import this script again on Windows
+if __name__ == "__main__" :
+
+    # Needed by the executables (PyInstaller) to launch the worker processes of the pool
+    multiprocessing.freeze_support()
+
+    # All the code will be inside a try block, so that if any command fails, the error is handled eficiently
+    try :
+
+        # Our custom brand name to check if the script is being executed recursively, it is stored in an environment variable that we will check at the beginning of the script
+        # The script does not launch itself anymore, but a script launched by a previous version as a child still gets this variable, and then it must behave as a child: no confirmation and no reset of the log files
+        VAR_RECURSION = "QUICKFOLDERSYNCHRO_RECURSION"
+        # Boolean variable to indicate if the script is being executed recursively, it is initialized to False and will be set to True if the environment variable is detected
+        isRecursiveExecution = False
+
+        # If the environment variable is not detected, it means that we are in the parent execution of the script
+        # If the environment variable is detected, it means that we are in a child execution of the script
+        if not os.environ.get(VAR_RECURSION) == "1":
+
+            # the father process creates the logs files
+            try :
+                with open(LOGFILE, 'w') : pass
+                with open(LOGERRORFILE, 'w') : pass
+            except Exception as error : general_exception_handler("Continuing without creating or resetting log files : " + error)
+
+
+        # We set the boolean variable to indicate that we are in a recursive execution
+        else : isRecursiveExecution = True
+
+        # Wrong arguments are reported by the parser with an AppError
+        options = parse_arguments(sys.argv[1:])
+
+        # The source and target directories are extracted from the command line arguments, and they are stored in variables for later use.
+        # These variables are used throughout the script to refer to the source and target directories, and they are also used in the log messages to indicate which directories are being processed.
+        # This way, we can keep track of the source and target directories throughout the script, and we can provide useful information to the user about which directories are being processed at each step of the synchronization process.
+        sourceDirectory = options.sourceDirectory
+        targetDirectory = options.targetDirectory
+        currentSourceDirectory = sourceDirectory
+
+        #The LOGFILE file is opened to write the header of the execution
+        with open(LOGFILE, 'a') as file :
+
+            # Showing the source and target directories
+            # print("SOURCE Directory :", sourceDirectory)
+            file.write("SOURCE Directory : " + sourceDirectory + "\n")
+            # print("TARGET Directory :", targetDirectory)
+            file.write("TARGET Directory : " + targetDirectory + "\n")
+
+        # Setting the signal handler function, passing him whether we are in the father or in one of its child processes and the directory being processed when the signal is received
+        signal.signal(signal.SIGTERM, lambda s, f: signal_handler(s, f, isRecursiveExecution, currentSourceDirectory))
+        signal.signal(signal.SIGINT, lambda s, f: signal_handler(s, f, isRecursiveExecution, currentSourceDirectory))
+
+        # With --profile, the startup of the main process is measured from its creation, the time waiting for the confirmation is not counted
+        startupSeconds = process_age() if options.profile else 0.0
+
+        # It is detected that we are in the father process
+        if not isRecursiveExecution :
+
+            # We request confirmation that the destination directory is correct.
+            resp = input(f"Confirm that {targetDirectory} is correct? Answer Yes to continue, No to cancel : ");
+            while resp != "Yes" :
+                if resp == "No" :
+                    errorCode = 2
+                    errorText = "Aborted by the user does not confirm that the destination directory is correct."
+                    raise AppError(errorText, errorCode)
+                resp = input(f"Confirm that {targetDirectory} is correct? Answer Yes to continue, No to cancel : ")
+
+        setupStartTime = time.perf_counter()
+
+        # With --io-class, the I/O scheduling class is set before any thread or process of the pool is created, they inherit it
+        if options.io_class is not None : set_io_class(options.io_class)
+
+        # The tolerance of the comparison of the modification times is the one of --mtime-tolerance, or the granularity of the timestamps of the destination filesystem, detected once for the whole run
+        # With --plan the destination directory is not touched, so the probe file is not created and the comparison is exact unless --mtime-tolerance is given
+        # With --manifest the granularity is kept in the manifest, the probe file would change the modification time of the destination directory and its record would never be used
+        if options.mtime_tolerance is not None : options.mtime_tolerance_ns = round(options.mtime_tolerance * 1000000000)
+        elif options.plan is not None : options.mtime_tolerance_ns = 0
+        elif options.manifest :
+            manifest = SyncManifest(MANIFESTFILE)
+            options.mtime_tolerance_ns = manifest.timestamp_granularity(targetDirectory)
+            manifest.close()
+        else : options.mtime_tolerance_ns = detect_timestamp_granularity(targetDirectory)
+        with open(LOGFILE, 'a') as file : file.write(f"Modification times that differ up to {options.mtime_tolerance_ns} ns are considered equal\n")
+
+        # The inodes found by --hard-links in a previous run are not valid anymore
+        if options.hard_links and not isRecursiveExecution :
+            for path in (HARDLINKSFILE, HARDLINKSFILE + "-wal", HARDLINKSFILE + "-shm") :
+                if os.path.exists(path) : os.remove(path)
+
+        # The trash directory of this run is named by its start time, with --trash the trash directories of the previous runs are deleted by a thread while the tree is synchronized
+        # A run without --trash keeps them, they are only deleted when the trash is used again
+        trashRoot = os.path.join(targetDirectory, TRASHDIRECTORYNAME)
+        options.trash_directory = os.path.join(trashRoot, time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+        trashPurge = None
+        if options.trash is not None and options.plan is None and not isRecursiveExecution and os.path.isdir(trashRoot) :
+            trashPurge = concurrent.futures.ThreadPoolExecutor(max_workers=1).submit(purge_trash, trashRoot, options.trash_directory, options.delete_threads)
+
+        # With --checkpoint, the journal of a previous run is deleted and a new one is started
+        # With --resume, the journal of the interrupted run is kept if it was made for the same directories, and the temporary files of its copies are deleted
+        if options.checkpoint and not isRecursiveExecution :
+            if not options.resume :
+                for path in (CHECKPOINTFILE, CHECKPOINTFILE + "-wal", CHECKPOINTFILE + "-shm") :
+                    if os.path.exists(path) : os.remove(path)
+            checkpoint = SyncCheckpoint(CHECKPOINTFILE)
+            checkpointRun = checkpoint.run()
+            if checkpointRun is not None and checkpointRun != (os.path.abspath(sourceDirectory), os.path.abspath(targetDirectory)) :
+                checkpoint.close()
+                errorCode = 8
+                errorText = f"The checkpoint {CHECKPOINTFILE} was made for {checkpointRun[0]} and {checkpointRun[1]}"
+                raise AppError(errorText, errorCode)
+            with open(LOGFILE, 'a') as file :
+                if checkpointRun is None :
+                    if options.resume : file.write("There is no interrupted run to resume, the whole tree is synchronized\n")
+                    checkpoint.start(sourceDirectory, targetDirectory)
+                else : file.write(f"The interrupted run is resumed, {checkpoint.clean_copies()} temporary files of its copies have been deleted\n")
+            checkpoint.close()
+
+        # With --plan, the plan starts with the directories it is made for, the processes that synchronize the tree append their operations to it
+        if options.plan is not None and not isRecursiveExecution :
+            with open(options.plan, 'w', encoding="utf-8") as planFile :
+                planFile.write(json.dumps({ "sourceDirectory" : os.path.abspath(sourceDirectory), "targetDirectory" : os.path.abspath(targetDirectory) }) + "\n")
+
+        options.startup_seconds = startupSeconds + time.perf_counter() - setupStartTime
+
+        # The whole tree is synchronized, and with --watch its changes are applied until the script is interrupted
+        # With --apply, the operations of the plan are done instead
+        if options.apply is not None : apply_plan(options.apply, sourceDirectory, targetDirectory, options)
+        elif options.watch : watch_tree(sourceDirectory, targetDirectory, isRecursiveExecution, options)
+        else : synchronize_tree(sourceDirectory, targetDirectory, isRecursiveExecution, options)
+
+        # The whole tree has been synchronized, there is nothing to resume
+        if options.checkpoint and not isRecursiveExecution :
+            for path in (CHECKPOINTFILE, CHECKPOINTFILE + "-wal", CHECKPOINTFILE + "-shm") :
+                if os.path.exists(path) : os.remove(path)
+
+        # The totals of the plan are shown once all its operations have been written
+        if options.plan is not None and not isRecursiveExecution :
+            with open(LOGFILE, 'a') as file : write_plan_summary(options.plan, summarize_plan(options.plan)[1], file)
+
+        # The destination directory is already synchronized, the trash of the previous runs may still be being deleted
+        if trashPurge is not None :
+            if not trashPurge.done() : print(f"Waiting for the trash of the previous runs in {trashRoot} to be deleted")
+            deletedFiles, deletedDirectories = trashPurge.result()
+            with open(LOGFILE, 'a') as file : file.write(f"\nThe trash of the previous runs in {trashRoot} has been deleted : {deletedFiles} files and {deletedDirectories} directories\n")
+
+        # With --trash purge, the entries of the trash of this run have been deleted, only their parent directories are left
+        if options.trash == "purge" and os.path.isdir(options.trash_directory) :
+            TreeRemover(1).remove(options.trash_directory)
+            try :
+                os.rmdir(trashRoot)
+            except OSError :
+                pass
+
+    except AppError as error : AppError_handler(error)
+
+    except Exception as error : general_exception_handler(error)
@@ -0,0 +1,82 @@
+""" Tests of the copy methods of CopyBackends.py """
+
+# Imports...
+import sys
+import os
+import errno
+import tempfile
+import unittest
+
+# The copy of the files is imported from the module of the parent folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CopyBackends import copy_file
+
+
+# Size of the sparse file of the tests and its extents with data, as (offset, bytes of data)
+SPARSE_FILE_SIZE = 64 * 1024 * 1024
+SPARSE_FILE_EXTENTS = ( (0, 4096), (16 * 1024 * 1024, 1024 * 1024), (SPARSE_FILE_SIZE - 100, 100) )
+
+
+# Function that returns True if the filesystem of a directory reports the holes of the files with SEEK_HOLE
+def supports_holes(directory) :
+    """ Returns True if the filesystem of a directory supports SEEK_HOLE """
+
+    if not hasattr(os, "SEEK_HOLE") : return False
+
+    with tempfile.TemporaryFile(dir=directory) as file :
+        file.truncate(1024 * 1024)
+        file.write(b"data")
+        file.flush()
+        try :
+            return os.lseek(file.fileno(), 0, os.SEEK_HOLE) < 1024 * 1024 and os.fstat(file.fileno()).st_blocks * 512 < 1024 * 1024
+        except OSError as error :
+            if error.errno in (errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENXIO) : return False
+            raise
+
+
+class SparseCopyTest(unittest.TestCase) :
+    """ The holes of the sparse files are kept by copy_file """
+
+    def setUp(self) :
+        temporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporaryDirectory.cleanup)
+        self.directory = temporaryDirectory.name
+        if not supports_holes(self.directory) : self.skipTest("the filesystem of the temporary directory does not support SEEK_HOLE")
+
+    def test_holes_are_kept(self) :
+        sourcePath = os.path.join(self.directory, "disk.img")
+        targetPath = os.path.join(self.directory, "copy.img")
+
+        with open(sourcePath, 'wb') as file :
+            for offset, length in SPARSE_FILE_EXTENTS :
+                file.seek(offset)
+                file.write(os.urandom(length))
+            file.truncate(SPARSE_FILE_SIZE)
+
+        description = copy_file(sourcePath, targetPath)
+
+        sourceStat = os.stat(sourcePath)
+        targetStat = os.stat(targetPath)
+        self.assertEqual(targetStat.st_size, SPARSE_FILE_SIZE)
+        self.assertLessEqual(targetStat.st_blocks, sourceStat.st_blocks, description)
+        self.assertLess(targetStat.st_blocks * 512, SPARSE_FILE_SIZE // 4, description)
+        with open(sourcePath, 'rb') as sourceFile, open(targetPath, 'rb') as targetFile :
+            while True :
+                sourceBlock = sourceFile.read(1024 * 1024)
+                self.assertEqual(sourceBlock, targetFile.read(1024 * 1024))
+                if not sourceBlock : break
+
+    def test_file_without_holes(self) :
+        sourcePath = os.path.join(self.directory, "data.bin")
+        targetPath = os.path.join(self.directory, "copy.bin")
+        data = os.urandom(3 * 1024 * 1024 + 17)
+        with open(sourcePath, 'wb') as file : file.write(data)
+
+        copy_file(sourcePath, targetPath)
+
+        with open(targetPath, 'rb') as file : self.assertEqual(file.read(), data)
+        self.assertEqual(os.stat(targetPath).st_mtime_ns, os.stat(sourcePath).st_mtime_ns)
+
+
+if __name__ == "__main__" :
+    unittest.main()
@@ -0,0 +1,101 @@
+""" Tests of the delta transfer of --delta """
+
+# Imports...
+import sys
+import os
+import random
+import tempfile
+import unittest
+
+# The script is imported from the parent folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from QuickFolderSynchro import SyncCheckpoint, delta_copy_file, rebuilt_path, temporary_path
+
+
+# Size of the blocks and of the files of the tests
+BLOCK_SIZE = 64 * 1024
+FILE_SIZE = 16 * 1024 * 1024
+
+
+class DeltaCopyTest(unittest.TestCase) :
+    """ The modified files are rebuilt from the blocks of the destination file """
+
+    def setUp(self) :
+        temporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporaryDirectory.cleanup)
+        self.sourcePath = os.path.join(temporaryDirectory.name, "source.img")
+        self.targetPath = os.path.join(temporaryDirectory.name, "target.img")
+        self.random = random.Random(1)
+        self.data = self.random.randbytes(FILE_SIZE)
+
+    def delta_copy(self, sourceData) :
+        with open(self.targetPath, 'wb') as file : file.write(self.data)
+        with open(self.sourcePath, 'wb') as file : file.write(sourceData)
+
+        description = delta_copy_file(self.sourcePath, self.targetPath, BLOCK_SIZE)
+
+        with open(self.targetPath, 'rb') as file : self.assertEqual(file.read(), sourceData)
+        self.assertFalse(os.path.exists(rebuilt_path(self.targetPath)))
+        return description
+
+    def test_scattered_insertions(self) :
+        sourceData = bytearray(self.data)
+        for offset in sorted(self.random.sample(range(FILE_SIZE), 60), reverse=True) : sourceData[offset:offset] = self.random.randbytes(10)
+
+        description = self.delta_copy(bytes(sourceData))
+
+        self.assertTrue(description.startswith("delta transfer rebuilt"), description)
+
+    def test_scattered_deletions(self) :
+        sourceData = bytearray(self.data)
+        for offset in sorted(self.random.sample(range(FILE_SIZE - 10), 60), reverse=True) : del sourceData[offset:offset + 10]
+
+        description = self.delta_copy(bytes(sourceData))
+
+        self.assertTrue(description.startswith("delta transfer rebuilt"), description)
+
+    def test_insertions_of_several_blocks(self) :
+        sourceData = bytearray(self.data)
+        for offset in sorted(self.random.sample(range(FILE_SIZE), 10), reverse=True) : sourceData[offset:offset] = self.random.randbytes(3 * BLOCK_SIZE + 7)
+
+        description = self.delta_copy(bytes(sourceData))
+
+        self.assertTrue(description.startswith("delta transfer rebuilt"), description)
+
+    def test_modified_in_place(self) :
+        sourceData = bytearray(self.data)
+        for offset in self.random.sample(range(FILE_SIZE - 100), 20) : sourceData[offset:offset + 100] = self.random.randbytes(100)
+
+        description = self.delta_copy(bytes(sourceData))
+
+        self.assertTrue(description.startswith("delta transfer in place"), description)
+
+    def test_rewritten_file_is_copied(self) :
+        description = self.delta_copy(self.random.randbytes(FILE_SIZE))
+
+        self.assertEqual(description, "copied, the delta transfer was not worthwhile")
+
+
+class CheckpointCleanTest(unittest.TestCase) :
+    """ The temporary files of the interrupted copies are deleted before resuming """
+
+    def test_rebuilt_files_are_deleted(self) :
+        temporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporaryDirectory.cleanup)
+        checkpoint = SyncCheckpoint(os.path.join(temporaryDirectory.name, "checkpoint.db"))
+        self.addCleanup(checkpoint.close)
+
+        copiedPath = os.path.join(temporaryDirectory.name, "copied.bin")
+        rebuiltPath = os.path.join(temporaryDirectory.name, "rebuilt.img")
+        for temporaryPath in (temporary_path(copiedPath), rebuilt_path(rebuiltPath)) :
+            with open(temporaryPath, 'wb') as file : file.write(b"partial")
+        checkpoint.start_copy(copiedPath)
+        checkpoint.start_copy(rebuiltPath)
+
+        self.assertEqual(checkpoint.clean_copies(), 2)
+        self.assertFalse(os.path.exists(temporary_path(copiedPath)))
+        self.assertFalse(os.path.exists(rebuilt_path(rebuiltPath)))
+
+
+if __name__ == "__main__" :
+    unittest.main()
@@ -0,0 +1,51 @@
+""" Tests of the hard links of --hard-links """
+
+# Imports...
+import sys
+import os
+import tempfile
+import unittest
+
+# The script is imported from the parent folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from QuickFolderSynchro import HardLinkMap
+
+
+class HardLinkMapTest(unittest.TestCase) :
+    """ The inodes are shared with the other processes once the copies of their directory have finished """
+
+    def setUp(self) :
+        temporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporaryDirectory.cleanup)
+        self.directory = temporaryDirectory.name
+        self.path = os.path.join(self.directory, "links.db")
+        sourcePath = os.path.join(self.directory, "source")
+        with open(sourcePath, 'w') as file : file.write("source")
+        self.sourceStat = os.stat(sourcePath)
+
+    def open_map(self) :
+        hardLinks = HardLinkMap(self.path)
+        self.addCleanup(hardLinks.close)
+        return hardLinks
+
+    def test_claim_is_shared_after_commit(self) :
+        firstProcess = self.open_map()
+        secondProcess = self.open_map()
+
+        self.assertIsNone(firstProcess.claim(self.sourceStat, "/target/a"))
+        self.assertEqual(firstProcess.claim(self.sourceStat, "/target/b"), "/target/a")
+        self.assertIsNone(secondProcess.claim(self.sourceStat, "/target/c"))
+
+        firstProcess.commit(False)
+        self.assertEqual(self.open_map().claim(self.sourceStat, "/target/d"), "/target/a")
+
+    def test_claim_of_directory_with_errors_is_not_recorded(self) :
+        firstProcess = self.open_map()
+
+        self.assertIsNone(firstProcess.claim(self.sourceStat, "/target/a"))
+        firstProcess.commit(True)
+
+        self.assertIsNone(self.open_map().claim(self.sourceStat, "/target/b"))
+
+if __name__ == "__main__" :
+    unittest.main()
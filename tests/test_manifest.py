@@ -0,0 +1,57 @@
+""" Tests of the manifest of --manifest """
+
+# Imports...
+import sys
+import os
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+
+# Folder of the script, which is copied with CopyBackends.py to the working directory of each test so that its log files and its manifest are written there
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ManifestTest(unittest.TestCase) :
+    """ The listings taken from the manifest still detect the changes of the files """
+
+    def setUp(self) :
+        temporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporaryDirectory.cleanup)
+        self.workDirectory = temporaryDirectory.name
+        for name in ("QuickFolderSynchro.py", "CopyBackends.py") : shutil.copy2(os.path.join(REPOSITORY, name), self.workDirectory)
+        self.sourceDirectory = os.path.join(self.workDirectory, "source")
+        self.targetDirectory = os.path.join(self.workDirectory, "target")
+        os.makedirs(os.path.join(self.sourceDirectory, "subdirectory"))
+        os.makedirs(self.targetDirectory)
+        for relativePath in ("file.txt", os.path.join("subdirectory", "file.txt")) :
+            with open(os.path.join(self.sourceDirectory, relativePath), 'w') as file : file.write("source")
+
+    def run_script(self) :
+        command = [ sys.executable, os.path.join(self.workDirectory, "QuickFolderSynchro.py"), "--manifest", self.sourceDirectory, self.targetDirectory ]
+        subprocess.run(command, input="Yes\n", text=True, stdout=subprocess.DEVNULL, cwd=self.workDirectory, check=True)
+
+    def test_destination_is_not_probed_again(self) :
+        self.run_script()
+        targetMtimeNs = os.stat(self.targetDirectory).st_mtime_ns
+
+        self.run_script()
+
+        self.assertEqual(os.stat(self.targetDirectory).st_mtime_ns, targetMtimeNs)
+
+    def test_files_modified_in_the_destination_are_copied(self) :
+        self.run_script()
+        for relativePath in ("file.txt", os.path.join("subdirectory", "file.txt")) :
+            targetPath = os.path.join(self.targetDirectory, relativePath)
+            with open(targetPath, 'w') as file : file.write("target")
+            os.utime(targetPath, ns=(0, 0))
+
+        self.run_script()
+
+        for relativePath in ("file.txt", os.path.join("subdirectory", "file.txt")) :
+            with open(os.path.join(self.targetDirectory, relativePath)) as file : self.assertEqual(file.read(), "source")
+
+
+if __name__ == "__main__" :
+    unittest.main()
@@ -0,0 +1,64 @@
+""" Tests of the plans of --plan and --apply """
+
+# Imports...
+import sys
+import os
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+
+# Folder of the script, which is copied with CopyBackends.py to the working directory of each test so that its log files are written there
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PlanApplyTest(unittest.TestCase) :
+    """ A plan applied leaves the trees as a synchronization would """
+
+    def setUp(self) :
+        temporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporaryDirectory.cleanup)
+        self.workDirectory = temporaryDirectory.name
+        for name in ("QuickFolderSynchro.py", "CopyBackends.py") : shutil.copy2(os.path.join(REPOSITORY, name), self.workDirectory)
+        self.sourceDirectory = os.path.join(self.workDirectory, "source")
+        self.targetDirectory = os.path.join(self.workDirectory, "target")
+        self.planPath = os.path.join(self.workDirectory, "plan.jsonl")
+        os.makedirs(self.targetDirectory)
+
+    def run_script(self, *arguments) :
+        command = [ sys.executable, os.path.join(self.workDirectory, "QuickFolderSynchro.py"), *arguments, self.sourceDirectory, self.targetDirectory ]
+        subprocess.run(command, input="Yes\n", text=True, stdout=subprocess.DEVNULL, cwd=self.workDirectory, check=True)
+
+    def write_file(self, relativePath, contents) :
+        path = os.path.join(self.sourceDirectory, relativePath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file : file.write(contents)
+
+    def tree(self, directory) :
+        files = {}
+        for path, _, fileNames in os.walk(directory) :
+            for fileName in fileNames :
+                with open(os.path.join(path, fileName)) as file : files[os.path.relpath(os.path.join(path, fileName), directory)] = file.read()
+        return files
+
+    def test_square_brackets_are_renamed_when_applied(self) :
+        self.write_file("q[1]", "q")
+        self.write_file(os.path.join("d[2]", "x[3]"), "x")
+        self.write_file(os.path.join("d[2]", "plain"), "plain")
+        self.write_file("plain", "plain")
+
+        self.run_script("--plan", self.planPath)
+
+        self.assertEqual(set(self.tree(self.sourceDirectory)), { "q[1]", os.path.join("d[2]", "x[3]"), os.path.join("d[2]", "plain"), "plain" })
+        self.assertEqual(self.tree(self.targetDirectory), {})
+
+        self.run_script("--apply", self.planPath)
+
+        expectedTree = { "q-1-": "q", os.path.join("d-2-", "x-3-"): "x", os.path.join("d-2-", "plain"): "plain", "plain": "plain" }
+        self.assertEqual(self.tree(self.sourceDirectory), expectedTree)
+        self.assertEqual(self.tree(self.targetDirectory), expectedTree)
+
+
+if __name__ == "__main__" :
+    unittest.main()
@@ -0,0 +1,53 @@
+""" Tests of the trash of --trash """
+
+# Imports...
+import sys
+import os
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+
+# Folder of the script, which is copied with CopyBackends.py to the working directory of each test so that its log files are written there
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Trash directory of the copy of the script, named after it
+TRASHDIRECTORYNAME = ".QuickFolderSynchroTrash"
+
+
+class TrashTest(unittest.TestCase) :
+    """ The trash of the previous runs is only deleted by the runs with --trash """
+
+    def setUp(self) :
+        temporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporaryDirectory.cleanup)
+        self.workDirectory = temporaryDirectory.name
+        for name in ("QuickFolderSynchro.py", "CopyBackends.py") : shutil.copy2(os.path.join(REPOSITORY, name), self.workDirectory)
+        self.sourceDirectory = os.path.join(self.workDirectory, "source")
+        self.targetDirectory = os.path.join(self.workDirectory, "target")
+        self.trashRoot = os.path.join(self.targetDirectory, TRASHDIRECTORYNAME)
+        os.makedirs(self.sourceDirectory)
+        os.makedirs(self.targetDirectory)
+
+    def run_script(self, *arguments) :
+        command = [ sys.executable, os.path.join(self.workDirectory, "QuickFolderSynchro.py"), *arguments, self.sourceDirectory, self.targetDirectory ]
+        subprocess.run(command, input="Yes\n", text=True, stdout=subprocess.DEVNULL, cwd=self.workDirectory, check=True)
+
+    def test_trash_is_kept_without_trash_option(self) :
+        with open(os.path.join(self.targetDirectory, "deleted.txt"), 'w') as file : file.write("deleted")
+
+        self.run_script("--trash", "keep")
+        trashDirectories = os.listdir(self.trashRoot)
+        self.assertEqual(len(trashDirectories), 1)
+        self.assertTrue(os.path.isfile(os.path.join(self.trashRoot, trashDirectories[0], "deleted.txt")))
+
+        self.run_script()
+        self.assertEqual(os.listdir(self.trashRoot), trashDirectories)
+
+        self.run_script("--trash", "keep")
+        self.assertFalse(os.path.exists(self.trashRoot))
+
+
+if __name__ == "__main__" :
+    unittest.main()